@@ -39,6 +39,17 @@ Use
 
         python database_interface.py
 
+    Indexes that have been added to tables that already exist (e.g. the
+    ``rootname`` and ``flag_date`` index of the anomaly tables) are
+    also created then, so the module should be executed again when the
+    package is deployed. They can also be created with:
+
+    ::
+
+        from jwql.database.database_interface import create_indexes
+
+        create_indexes()
+
     Users wishing to interact with the existing database may do so by
     importing various connection objects and database tables, for
     example:
@@ -63,16 +74,21 @@ import socket
 
 import pandas as pd
 from sqlalchemy import Boolean, Column, DateTime, Integer, MetaData, String, Table
+from sqlalchemy import and_
+from sqlalchemy import BigInteger
+from sqlalchemy import bindparam
 from sqlalchemy import create_engine
 from sqlalchemy import Date
 from sqlalchemy import DateTime
 from sqlalchemy import Enum
 from sqlalchemy import Float
+from sqlalchemy import Index
 from sqlalchemy import Integer
 from sqlalchemy import MetaData
 from sqlalchemy import String
 from sqlalchemy import Time
 from sqlalchemy import UniqueConstraint
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.automap import automap_base
 from sqlalchemy.orm import sessionmaker
@@ -80,7 +96,7 @@ from sqlalchemy.orm.query import Query
 from sqlalchemy.types import ARRAY
 
 from jwql.utils.constants import ANOMALIES_PER_INSTRUMENT, FILE_SUFFIX_TYPES, JWST_INSTRUMENT_NAMES
-from jwql.utils.utils import get_config
+from jwql.utils.utils import filename_parser, get_config
 
 ON_JENKINS = '/home/jenkins' in os.path.expanduser('~')
 
@@ -148,6 +164,86 @@ else:
     session, base, engine, meta = load_connection(SETTINGS['connection_string'])
 
 
+class DatabaseStore():
+    """Base class of the stores in which the web application and the
+    monitors keep their state (e.g. the filesystem index) in the
+    ``jwqldb`` database, so that it is shared by every server and
+    process that uses the database.
+
+    Attributes
+    ----------
+    connection : obj
+        Connection to the database
+    engine : obj
+        Engine of the database
+
+    Methods
+    -------
+    close()
+        Close the connection to the database
+    """
+
+    def __init__(self, bind=None):
+        """Initialize the class, connecting to the database.
+
+        Parameters
+        ----------
+        bind : obj
+            The ``SQLAlchemy`` engine of the database. The ``engine``
+            of this module is used if ``None``.
+        """
+        self.engine = engine if bind is None else bind
+        self.connection = self.engine.connect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the connection to the database."""
+        self.connection.close()
+
+
+def upsert(connection, table, rows):
+    """Insert rows into a table, replacing the rows that have the same
+    primary key.
+
+    PostgreSQL replaces the rows with ``INSERT ... ON CONFLICT``. Other
+    databases (e.g. the ``sqlite`` databases used by the tests) delete
+    the rows before inserting them, so this should be called within a
+    transaction.
+
+    Parameters
+    ----------
+    connection : obj
+        Connection to the database
+    table : obj
+        The ``Table`` into which the rows are inserted
+    rows : list
+        A dictionary of the values of the columns of each row. Every
+        row must have the same columns, including the primary key.
+    """
+    if len(rows) == 0:
+        return
+
+    keys = [column.name for column in table.primary_key.columns]
+    if connection.dialect.name == 'postgresql':
+        statement = postgresql.insert(table)
+        values = {name: statement.excluded[name] for name in rows[0] if name not in keys}
+        if len(values) > 0:
+            statement = statement.on_conflict_do_update(index_elements=keys, set_=values)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=keys)
+        connection.execute(statement, rows)
+    else:
+        condition = and_(*[table.c[key] == bindparam('old_{}'.format(key)) for key in keys])
+        connection.execute(table.delete().where(condition),
+                           [{'old_{}'.format(key): row[key] for key in keys} for row in rows])
+        connection.execute(table.insert(), rows)
+
+
 class FilesystemGeneral(base):
     """ORM for the general (non instrument specific) filesystem monitor
     table"""
@@ -208,6 +304,214 @@ class CentralStore(base):
     available = Column(Float, nullable=False)
 
 
+class FilesystemIndexDirectory(base):
+    """ORM for the directories in the filesystem index, with the time
+    at which each was last modified, in nanoseconds"""
+
+    # Name the table
+    __tablename__ = 'filesystem_index_directories'
+
+    # Define the columns
+    path = Column(String(), primary_key=True, nullable=False)
+    mtime = Column(BigInteger, nullable=False)
+
+
+class FilesystemIndexFile(base):
+    """ORM for the files in the filesystem index"""
+
+    # Name the table
+    __tablename__ = 'filesystem_index_files'
+    __table_args__ = (
+        Index('filesystem_index_files_program_idx', 'category', 'program', 'filename'),
+        Index('filesystem_index_files_instrument_idx', 'category', 'instrument'),
+        Index('filesystem_index_files_rootname_idx', 'rootname'),
+        Index('filesystem_index_files_directory_idx', 'directory'),
+    )
+
+    # Define the columns
+    path = Column(String(), primary_key=True, nullable=False)
+    directory = Column(String(), nullable=False)
+    filename = Column(String(), nullable=False)
+    category = Column(String(), nullable=False)
+    program = Column(String(), nullable=True)
+    instrument = Column(String(), nullable=True)
+    rootname = Column(String(), nullable=True)
+    suffix = Column(String(), nullable=True)
+
+
+class FilesystemIndexMetadata(base):
+    """ORM for the version and time of the last update of the
+    filesystem index"""
+
+    # Name the table
+    __tablename__ = 'filesystem_index_metadata'
+
+    # Define the columns
+    key = Column(String(), primary_key=True, nullable=False)
+    value = Column(String(), nullable=False)
+
+
+class FilesystemIndexProposal(base):
+    """ORM for the summary of each proposal of each instrument in the
+    filesystem index"""
+
+    # Name the table
+    __tablename__ = 'filesystem_index_proposals'
+
+    # Define the columns
+    instrument = Column(String(), primary_key=True, nullable=False)
+    program = Column(String(), primary_key=True, nullable=False)
+    num_files = Column(Integer, nullable=False)
+    num_observations = Column(Integer, nullable=False)
+    thumbnail = Column(String(), nullable=True)
+    updated = Column(Float, nullable=False)
+
+
+class PreviewManifestSource(base):
+    """ORM for the source files in the manifest of preview images, with
+    their sizes, modification times, in nanoseconds, and the exposure
+    groups they were processed in"""
+
+    # Name the table
+    __tablename__ = 'preview_manifest_sources'
+    __table_args__ = (Index('preview_manifest_sources_group_id_idx', 'group_id'),)
+
+    # Define the columns
+    filename = Column(String(), primary_key=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mtime = Column(BigInteger, nullable=False)
+    group_id = Column(String(), nullable=False)
+
+
+class PreviewManifestOutput(base):
+    """ORM for the preview images, thumbnails and tile pyramids in the
+    manifest of preview images, by the exposure group they were made
+    from"""
+
+    # Name the table
+    __tablename__ = 'preview_manifest_outputs'
+    __table_args__ = (Index('preview_manifest_outputs_group_id_idx', 'group_id'),)
+
+    # Define the columns
+    id = Column(Integer, primary_key=True, nullable=False)
+    group_id = Column(String(), nullable=False)
+    path = Column(String(), nullable=False)
+    output_type = Column(Enum('preview', 'thumbnail', 'tiles', name='preview_output_type'), nullable=False)
+
+
+class RenderJob(base):
+    """ORM for the queue of preview images to be made in the
+    background"""
+
+    # Name the table
+    __tablename__ = 'render_jobs'
+    __table_args__ = (
+        Index('render_jobs_status_idx', 'status', 'id'),
+        Index('render_jobs_filename_idx', 'filename', 'status'),
+    )
+
+    # Define the columns
+    id = Column(Integer, primary_key=True, nullable=False)
+    filename = Column(String(), nullable=False)
+    preview_output_directory = Column(String(), nullable=False)
+    thumbnail_output_directory = Column(String(), nullable=False)
+    status = Column(Enum('pending', 'running', 'done', 'failed', name='render_job_status'), nullable=False)
+    claim = Column(String(), nullable=True)
+    submitted = Column(Float, nullable=False)
+    started = Column(Float, nullable=True)
+    finished = Column(Float, nullable=True)
+    outputs = Column(String(), nullable=True)
+    error = Column(String(), nullable=True)
+
+
+class MastQueryResult(base):
+    """ORM for the cache of the results of MAST service queries"""
+
+    # Name the table
+    __tablename__ = 'mast_query_results'
+    __table_args__ = (Index('mast_query_results_service_fetched_idx', 'service', 'fetched'),)
+
+    # Define the columns
+    key = Column(String(), primary_key=True, nullable=False)
+    service = Column(String(), nullable=False)
+    params = Column(String(), nullable=False)
+    result = Column(String(), nullable=False)
+    fetched = Column(Float, nullable=False)
+
+
+class FileHeader(base):
+    """ORM for the cache of the headers of the files in the filesystem,
+    with the size and modification time, in nanoseconds, of each file
+    when its headers were read"""
+
+    # Name the table
+    __tablename__ = 'file_headers'
+
+    # Define the columns
+    path = Column(String(), primary_key=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mtime = Column(BigInteger, nullable=False)
+    headers = Column(String(), nullable=False)
+
+
+class MonitorComponent(base):
+    """ORM for the cache of the ``Bokeh`` components of the monitor
+    pages of the web application"""
+
+    # Name the table
+    __tablename__ = 'monitor_components'
+
+    # Define the columns
+    monitor = Column(String(), primary_key=True, nullable=False)
+    instrument = Column(String(), primary_key=True, nullable=False)
+    version = Column(String(), nullable=False)
+    div = Column(String(), nullable=False)
+    script = Column(String(), nullable=False)
+    updated = Column(Float, nullable=False)
+
+
+class ApiResult(base):
+    """ORM for the cache of the results of the ``jwql`` REST API"""
+
+    # Name the table
+    __tablename__ = 'api_results'
+
+    # Define the columns
+    endpoint = Column(String(), primary_key=True, nullable=False)
+    key = Column(String(), primary_key=True, nullable=False)
+    version = Column(String(), nullable=False)
+    items = Column(String(), nullable=False)
+    updated = Column(Float, nullable=False)
+
+
+class RequestProfileRecord(base):
+    """ORM for the profiles of the most recent requests of the web
+    application, with the number and time of the events of each
+    category of ``jwql.utils.request_profile``"""
+
+    # Name the table
+    __tablename__ = 'request_profiles'
+    __table_args__ = (Index('request_profiles_view_wall_idx', 'view', 'wall'),)
+
+    # Define the columns
+    id = Column(Integer, primary_key=True, nullable=False)
+    started = Column(Float, nullable=False)
+    method = Column(String(), nullable=False)
+    path = Column(String(), nullable=False)
+    view = Column(String(), nullable=False)
+    status = Column(Integer, nullable=False)
+    wall = Column(Float, nullable=False)
+    django_count = Column(Integer, nullable=False)
+    django_time = Column(Float, nullable=False)
+    sqlalchemy_count = Column(Integer, nullable=False)
+    sqlalchemy_time = Column(Float, nullable=False)
+    filesystem_count = Column(Integer, nullable=False)
+    filesystem_time = Column(Float, nullable=False)
+    mast_count = Column(Integer, nullable=False)
+    mast_time = Column(Float, nullable=False)
+    events = Column(String(), nullable=False)
+
+
 class Monitor(base):
     """ORM for the ``monitor`` table"""
 
@@ -250,6 +554,12 @@ def anomaly_orm_factory(class_name):
     data_dict['columns'] = instrument_anomalies
     data_dict['names'] = [name.replace('_', ' ') for name in data_dict['columns']]
 
+    # Index the rootname and flag date, which are used to find the
+    # current anomalies of a file
+    data_dict['__table_args__'] = (
+        Index('{}_rootname_flag_date_idx'.format(data_dict['__tablename__']), 'rootname', 'flag_date'),
+    )
+
     # Create a table with the appropriate Columns
     data_dict['id'] = Column(Integer, primary_key=True, nullable=False)
     data_dict['rootname'] = Column(String(), nullable=False)
@@ -262,6 +572,90 @@ def anomaly_orm_factory(class_name):
     return type(class_name, (base,), data_dict)
 
 
+def create_indexes(bind=None):
+    """Create the indexes of the tables in the database that do not
+    exist yet.
+
+    ``base.metadata.create_all`` only creates the indexes of new tables,
+    so indexes that are added to an existing table (e.g. the
+    ``rootname`` and ``flag_date`` index of the anomaly tables) are
+    created here, with ``CREATE INDEX IF NOT EXISTS``.
+
+    Parameters
+    ----------
+    bind : obj
+        The ``SQLAlchemy`` engine of the database. The ``engine`` of
+        this module is used if ``None``.
+    """
+    bind = engine if bind is None else bind
+    quote = bind.dialect.identifier_preparer.quote
+
+    with bind.begin() as connection:
+        for table in base.metadata.sorted_tables:
+            if not bind.dialect.has_table(connection, table.name):
+                continue
+            for index in table.indexes:
+                connection.execute('CREATE {}INDEX IF NOT EXISTS {} ON {} ({})'.format(
+                    'UNIQUE ' if index.unique else '', quote(index.name), quote(table.name),
+                    ', '.join(quote(column.name) for column in index.columns)))
+
+
+def get_current_anomalies(rootnames, instrument=None):
+    """Return the currently flagged anomalies of many rootnames, from a
+    single query of the anomaly table of each instrument.
+
+    Parameters
+    ----------
+    rootnames : iterable
+        The rootnames of interest (e.g.
+        ``jw86600008001_02101_00001_guider2``)
+    instrument : str
+        The instrument of all of the rootnames (e.g. ``FGS``). If
+        ``None``, the instrument of each rootname is determined from
+        its detector.
+
+    Returns
+    -------
+    current_anomalies : dict
+        The anomalies currently flagged for each rootname (e.g.
+        ``['snowball', 'crosstalk']``), in order of rootname. Rootnames
+        that have never been flagged, or whose instrument cannot be
+        determined, have an empty list.
+    """
+    rootnames = sorted(set(rootnames))
+    current_anomalies = {rootname: [] for rootname in rootnames}
+
+    # Group the rootnames by instrument
+    rootnames_by_instrument = {}
+    for rootname in rootnames:
+        if instrument is not None:
+            rootname_instrument = instrument.lower()
+        else:
+            try:
+                rootname_instrument = filename_parser(rootname)['instrument']
+            except (ValueError, KeyError):
+                continue
+        rootnames_by_instrument.setdefault(rootname_instrument, []).append(rootname)
+
+    for rootname_instrument, instrument_rootnames in sorted(rootnames_by_instrument.items()):
+        table = ANOMALY_TABLES[rootname_instrument]
+
+        # Keep only the most recent record of each rootname. PostgreSQL
+        # returns only that record, with DISTINCT ON (rootname) ordered
+        # by flag date. Other databases do not support DISTINCT ON, so
+        # all records are returned, oldest first, and the most recent
+        # record of each rootname is the last one kept below.
+        query = session.query(table).filter(table.rootname.in_(instrument_rootnames))
+        if engine.dialect.name == 'postgresql':
+            query = query.distinct(table.rootname).order_by(table.rootname, table.flag_date.desc(), table.id.desc())
+        else:
+            query = query.order_by(table.rootname, table.flag_date, table.id)
+        for record in query:
+            current_anomalies[record.rootname] = [anomaly for anomaly in table.columns if getattr(record, anomaly)]
+
+    return current_anomalies
+
+
 def get_monitor_columns(data_dict, table_name):
     """Read in the corresponding table definition text file to
     generate ``SQLAlchemy`` columns for the table.
@@ -391,6 +785,11 @@ NIRISSAnomaly = anomaly_orm_factory('niriss_anomaly')
 NIRSpecAnomaly = anomaly_orm_factory('nirspec_anomaly')
 MIRIAnomaly = anomaly_orm_factory('miri_anomaly')
 FGSAnomaly = anomaly_orm_factory('fgs_anomaly')
+ANOMALY_TABLES = {'nircam': NIRCamAnomaly,
+                  'niriss': NIRISSAnomaly,
+                  'nirspec': NIRSpecAnomaly,
+                  'miri': MIRIAnomaly,
+                  'fgs': FGSAnomaly}
 NIRCamDarkQueryHistory = monitor_orm_factory('nircam_dark_query_history')
 NIRCamDarkPixelStats = monitor_orm_factory('nircam_dark_pixel_stats')
 NIRCamDarkDarkCurrent = monitor_orm_factory('nircam_dark_dark_current')
@@ -429,6 +828,22 @@ MIRIReadnoiseStats = monitor_orm_factory('miri_readnoise_stats')
 FGSReadnoiseQueryHistory = monitor_orm_factory('fgs_readnoise_query_history')
 FGSReadnoiseStats = monitor_orm_factory('fgs_readnoise_stats')
 
+# Tables in which the web application and the monitors keep their state,
+# rather than results
+STORE_TABLES = [FilesystemIndexDirectory.__table__,
+                FilesystemIndexFile.__table__,
+                FilesystemIndexMetadata.__table__,
+                FilesystemIndexProposal.__table__,
+                PreviewManifestSource.__table__,
+                PreviewManifestOutput.__table__,
+                RenderJob.__table__,
+                MastQueryResult.__table__,
+                FileHeader.__table__,
+                MonitorComponent.__table__,
+                ApiResult.__table__,
+                RequestProfileRecord.__table__]
+
 if __name__ == '__main__':
 
     base.metadata.create_all(engine)
+    create_indexes(engine)
@@ -51,6 +51,7 @@ from bokeh.plotting import figure
 import numpy as np
 
 from jwql.utils.credentials import get_mast_token
+from jwql.utils.plotting import downsampled_source
 from jwedb.edb_interface import query_single_mnemonic, query_mnemonic_info
 
 
@@ -111,8 +112,11 @@ class EdbMnemonic:
         p1 = figure(tools='pan,box_zoom,reset,wheel_zoom,save', x_axis_type='datetime',
                     title=self.mnemonic_identifier, x_axis_label='Time',
                     y_axis_label='Value ({})'.format(self.info['unit']))
-        p1.line(abscissa, ordinate, line_width=1, line_color='blue', line_dash='dashed')
-        p1.circle(abscissa, ordinate, color='blue')
+
+        # Downsample long queries, showing every point when zoomed in
+        source = downsampled_source(p1, {'time': abscissa, 'value': ordinate}, 'time', 'value')
+        p1.line('time', 'value', source=source, line_width=1, line_color='blue', line_dash='dashed')
+        p1.circle('time', 'value', source=source, color='blue')
 
         script, div = components(p1)
 
@@ -30,6 +30,8 @@ import numpy as np
 
 from astropy.time import Time
 
+from jwql.utils.plotting import downsampled_source
+
 
 def pol_regression(x, y, rank):
     ''' Calculate polynominal regression of certain rank
@@ -130,7 +132,9 @@ def add_to_plot(p, legend, mnemonic, start, end, conn, y_axis= "default", color=
     reg = pd.DataFrame({'reg' : pol_regression(temp['start_time'], temp['average'],3)})
     temp = pd.concat([temp, reg], axis = 1)
     temp['start_time'] = pd.to_datetime( Time(temp['start_time'], format = "mjd").datetime )
-    plot_data = ColumnDataSource(temp)
+
+    #downsample long series, showing every point when zoomed in
+    plot_data = downsampled_source(p, temp, 'start_time', 'average')
 
     #plot data
     p.line(x = "start_time", y = "average", color = color, y_range_name = y_axis, legend = legend, source = plot_data)
@@ -142,7 +146,7 @@ def add_to_plot(p, legend, mnemonic, start, end, conn, y_axis= "default", color=
         err_xs = []
         err_ys = []
 
-        for index, item in temp.iterrows():
+        for index, item in plot_data.to_df().iterrows():
             err_xs.append((item['start_time'], item['start_time']))
             err_ys.append((item['average'] - item['deviation'], item['average'] + item['deviation']))
 
@@ -9,6 +9,11 @@ smaller and contain no labels.  Images are saved into the
 ``preview_image_filesystem`` and ``thumbnail_filesystem``, organized
 by subdirectories pertaining to the ``program_id`` in the filenames.
 
+The files that have been processed, and the images made from them, are
+recorded in a manifest in the ``jwqldb`` database.  Only
+exposures that are new, have been modified, or whose images are
+missing are processed on subsequent runs.
+
 Authors
 -------
 
@@ -24,21 +29,43 @@ Use
     ::
 
         python generate_preview_images.py
+
+    To clear the manifest and regenerate all preview images and
+    thumbnails:
+
+    ::
+
+        python generate_preview_images.py --rebuild
+
+    To also save tile pyramids, for viewing large images one region at
+    a time:
+
+    ::
+
+        python generate_preview_images.py --tiles
 """
 
+import argparse
+from contextlib import ExitStack
+from functools import partial
 import glob
 import logging
 import multiprocessing
 import os
 import re
+import signal
+import time
 
+from astropy.io import fits
 import numpy as np
 
+from jwql.database.database_interface import engine
 from jwql.utils import permissions
 from jwql.utils.constants import NIRCAM_LONGWAVE_DETECTORS, NIRCAM_SHORTWAVE_DETECTORS
 from jwql.utils.logging_functions import configure_logging, log_info, log_fail
 from jwql.utils.preview_image import PreviewImage
-from jwql.utils.utils import get_config, filename_parser
+from jwql.utils.preview_manifest import MANIFEST_STATUSES, PreviewManifest
+from jwql.utils.utils import get_config, filename_parser, filename_parser_batch
 
 # Size of NIRCam inter- and intra-module chip gaps
 SW_MOD_GAP = 1387  # pixels = int(43 arcsec / 0.031 arcsec/pixel)
@@ -47,6 +74,12 @@ SW_DET_GAP = 145  # pixels = int(4.5 arcsec / 0.031 arcsec/pixel)
 FULLX = 2048  # Width of the full detector
 FULLY = 2048  # Height of the full detector
 
+# Categories of exposure groups in the report of each run
+REPORT_CATEGORIES = MANIFEST_STATUSES + ['existing', 'failed']
+
+# Default maximum time, in seconds, to spend on a single exposure group
+GROUP_TIMEOUT = 3600
+
 
 def array_coordinates(channelmod, detector_list, lowerleft_list):
     """Create an appropriately sized ``numpy`` array to contain the
@@ -196,26 +229,7 @@ def check_existence(file_list, outdir):
         ``True`` if preview image exists, ``False`` if it does not
     """
 
-    # If file_list contains only a single file, then we need to search
-    # for a preview image name that contains the detector name
-    if len(file_list) == 1:
-        filename = os.path.split(file_list[0])[1]
-        search_string = filename.split('.fits')[0] + '_*.jpg'
-    else:
-        # If file_list contains multiple files, then we need to search
-        # for the appropriately named jpg of the mosaic, which depends
-        # on the specific detectors in the file_list
-        file_parts = filename_parser(file_list[0])
-        if file_parts['detector'].upper() in NIRCAM_SHORTWAVE_DETECTORS:
-            mosaic_str = "NRC_SW*_MOSAIC_"
-        elif file_parts['detector'].upper() in NIRCAM_LONGWAVE_DETECTORS:
-            mosaic_str = "NRC_LW*_MOSAIC_"
-        search_string = 'jw{}{}{}_{}{}{}_{}_{}{}*.jpg'.format(
-                        file_parts['program_id'], file_parts['observation'],
-                        file_parts['visit'], file_parts['visit_group'],
-                        file_parts['parallel_seq_id'], file_parts['activity'],
-                        file_parts['exposure_id'], mosaic_str, file_parts['suffix'])
-
+    search_string = get_preview_search_string(file_list)
     current_files = glob.glob(os.path.join(outdir, search_string))
     if len(current_files) > 0:
         return True
@@ -272,71 +286,166 @@ def create_dummy_filename(filelist):
     return dummy_name
 
 
-def create_mosaic(filenames):
+def create_mosaic(filenames, integration=None):
     """If an exposure comprises data from multiple detectors read in all
     the appropriate files and create a mosaic so that the preview image
     will show all the data together.
 
+    The mosaic of all of the integrations is preallocated as a single
+    3D ``float32`` array using the file headers, and the difference
+    image from each detector is written directly into its place. Use
+    ``create_mosaic_frames`` to hold only one integration of the mosaic
+    in memory at once.
+
+    Parameters
+    ----------
+    filenames : list
+        List of filenames to be combined into a mosaic
+
+    integration : int
+        If given, only this integration is mosaicked, and the returned
+        array has a single integration. Default is ``None``, which
+        mosaics all integrations.
+
+    Returns
+    -------
+    full_array : obj
+        3D ``float32`` ``numpy`` array containing the mosaicked data
+
+    full_dq : obj
+        2D ``numpy`` array containing the DQ array of the mosaic
+    """
+
+    with ExitStack() as stack:
+        hdulists = [stack.enter_context(fits.open(filename)) for filename in filenames]
+        layout = _mosaic_layout(filenames, hdulists)
+        mosaic_channel, full_xdim, full_ydim, nints = layout[:4]
+
+        integrations = range(nints) if integration is None else [integration]
+        full_array = np.full((len(integrations), full_ydim, full_xdim), np.nan, dtype=np.float32)
+        for frame, integration in zip(full_array, integrations):
+            _fill_mosaic_frame(frame, hdulists, layout, integration)
+
+    # Create associated DQ array and set unpopulated pixels to be
+    # skipped in preview image scaling
+    full_dq = create_dq_array(full_xdim, full_ydim, full_array[0], mosaic_channel)
+
+    return full_array, full_dq
+
+
+def create_mosaic_frames(filenames, integrations=None):
+    """Create the mosaic of the data from multiple detectors one
+    integration at a time.
+
+    Each file is opened once, and the detector, location and shape of
+    its data are read from its headers once, for all integrations. The
+    files stay open, with their data memory-mapped, until the last
+    integration has been mosaicked.
+
     Parameters
     ----------
     filenames : list
         List of filenames to be combined into a mosaic
 
+    integrations : list
+        The integrations to mosaic. Default is ``None``, which mosaics
+        all integrations.
+
+    Yields
+    ------
+    frame : obj
+        2D ``float32`` ``numpy`` array containing the mosaicked data of
+        an integration
+
+    dq : obj
+        2D ``numpy`` array containing the DQ array of the mosaic
+    """
+
+    with ExitStack() as stack:
+        hdulists = [stack.enter_context(fits.open(filename)) for filename in filenames]
+        layout = _mosaic_layout(filenames, hdulists)
+        mosaic_channel, full_xdim, full_ydim, nints = layout[:4]
+        if integrations is None:
+            integrations = range(nints)
+
+        for integration in integrations:
+            frame = np.full((full_ydim, full_xdim), np.nan, dtype=np.float32)
+            _fill_mosaic_frame(frame, hdulists, layout, integration)
+
+            # Create associated DQ array and set unpopulated pixels to
+            # be skipped in preview image scaling
+            yield frame, create_dq_array(full_xdim, full_ydim, frame, mosaic_channel)
+
+
+def _mosaic_layout(filenames, hdulists):
+    """Return the layout of the mosaic of the data in the given open
+    files, read from their headers without reading the data.
+
+    Parameters
+    ----------
+    filenames : list
+        List of filenames to be combined into a mosaic
+
+    hdulists : list
+        The open ``HDUList`` of each file
+
     Returns
     -------
-    mosaic_filename : str
-        Name of fits file containing the mosaicked data
+    layout : tuple
+        The channel of the mosaic, its x and y dimensions, the number
+        of integrations, the detector and shape of the data in each
+        file, and the lower left pixel of each detector in the mosaic
     """
 
-    # Use preview_image to load data and create difference image
-    # for each detector. Save in a list
-    data = []
-    detector = []
-    data_lower_left = []
-    for filename in filenames:
-        image = PreviewImage(filename, "SCI")  # Now have image.data, image.dq
-        data_dim = len(image.data.shape)
-        if data_dim == 4:
-            diff_im = image.difference_image(image.data)
-        else:
-            diff_im = image.data
-        data.append(diff_im)
-        detector.append(filename_parser(filename)['detector'].upper())
-        data_lower_left.append((image.xstart, image.ystart))
-
-    # Make sure SW and LW data are not being mixed. Create the
-    # appropriately sized numpy array to hold all the data based
-    # on the channel, module, and subarray size
+    # Get the detector, location, and shape of the data in each file
+    # from the headers
+    detector = [filename_parser(filename)['detector'].upper() for filename in filenames]
+    data_lower_left = [(hdulist[0].header['SUBSTRT1'], hdulist[0].header['SUBSTRT2']) for hdulist in hdulists]
+    shapes = [hdulist['SCI'].shape for hdulist in hdulists]
+
+    # Make sure SW and LW data are not being mixed. Find the size of
+    # the mosaic based on the channel, module, and subarray size
     mosaic_channel = find_data_channel(detector)
-    full_xdim, full_ydim, full_lower_left = array_coordinates(mosaic_channel, detector,
-                                                              data_lower_left)
+    full_xdim, full_ydim, full_lower_left = array_coordinates(mosaic_channel, detector, data_lower_left)
 
-    # Create the array to hold all the data
-    datashape = data[0].shape
-    datadim = len(datashape)
+    datadim = len(shapes[0])
     if datadim == 2:
-        full_array = np.zeros((1, full_ydim, full_xdim)) * np.nan
-    elif datadim == 3:
-        full_array = np.zeros((datashape[0], full_ydim, full_xdim)) * np.nan
+        nints = 1
+    elif datadim in [3, 4]:
+        nints = shapes[0][0]
     else:
-        raise ValueError('Difference image for {} must be either 2D or 3D.'.format(filenames[0]))
+        raise ValueError('Data in {} must be 2D, 3D or 4D.'.format(filenames[0]))
+    for filename, shape in zip(filenames, shapes):
+        if len(shape) != datadim:
+            raise ValueError('Data in {} do not have the same dimensions as {}.'.format(filename, filenames[0]))
 
-    # Place the data from the individual detectors in the appropriate
-    # places in the final image
-    for pixdata, detect in zip(data, detector):
-        x0, y0 = full_lower_left[detect]
-        if datadim == 2:
-            yd, xd = pixdata.shape
-            full_array[0, y0: y0 + yd, x0: x0 + xd] = pixdata
-        elif datadim == 3:
-            ints, yd, xd = pixdata.shape
-            full_array[:, y0: y0 + yd, x0: x0 + xd] = pixdata
+    return mosaic_channel, full_xdim, full_ydim, nints, detector, shapes, full_lower_left
 
-    # Create associated DQ array and set unpopulated pixels to be skipped
-    # in preview image scaling
-    full_dq = create_dq_array(full_xdim, full_ydim, full_array[0, :, :], mosaic_channel)
 
-    return full_array, full_dq
+def _fill_mosaic_frame(frame, hdulists, layout, integration):
+    """Place the difference image of an integration from each of the
+    individual detectors in the appropriate place in ``frame``.
+
+    Parameters
+    ----------
+    frame : obj
+        2D ``numpy`` array of the mosaic, filled in place
+
+    hdulists : list
+        The open ``HDUList`` of each file
+
+    layout : tuple
+        The layout of the mosaic, returned by ``_mosaic_layout``
+
+    integration : int
+        The integration to mosaic
+    """
+
+    detector, shapes, full_lower_left = layout[4:]
+    for hdulist, shape, detect in zip(hdulists, shapes, detector):
+        x0, y0 = full_lower_left[detect]
+        yd, xd = shape[-2:]
+        frame[y0: y0 + yd, x0: x0 + xd] = get_difference_frame(hdulist['SCI'], integration)
 
 
 def create_dq_array(xd, yd, mosaic, module):
@@ -497,6 +606,109 @@ def find_data_channel(detectors):
     return channel
 
 
+def find_existing_outputs(file_list, preview_output_directory, thumbnail_output_directory):
+    """Find any preview images and thumbnails that have already been
+    made from the given list of fits files.
+
+    Parameters
+    ----------
+    file_list : list
+        List of fits filenames from which preview image will be
+        generated
+
+    preview_output_directory : str
+        Directory that will contain the preview images if they exist
+
+    thumbnail_output_directory : str
+        Directory that will contain the thumbnails if they exist
+
+    Returns
+    -------
+    previews : list
+        Paths of existing preview images
+
+    thumbnails : list
+        Paths of existing thumbnails
+    """
+
+    search_string = get_preview_search_string(file_list)
+    previews = sorted(glob.glob(os.path.join(preview_output_directory, search_string)))
+    thumbnails = sorted(glob.glob(os.path.join(thumbnail_output_directory,
+                                               search_string.replace('.jpg', '.thumb'))))
+
+    return previews, thumbnails
+
+
+def find_exposure_groups(program, rebuild=False):
+    """Find the exposure groups in the given program whose preview
+    images and thumbnails need to be made.
+
+    Exposures whose files and images are unchanged since they were
+    recorded in the manifest are skipped.  Exposures that are not yet
+    in the manifest, but whose preview images already exist, are added
+    to the manifest without being processed again.
+
+    Parameters
+    ----------
+    program : str
+        The program identifier (e.g. ``88600``)
+
+    rebuild : bool
+        If ``True``, return exposures that are not in the manifest even
+        if their preview images already exist
+
+    Returns
+    -------
+    tasks : list
+        List of dictionaries, one per exposure group to be processed,
+        with keys ``file_list``, ``stats`` (from
+        ``PreviewManifest.get_file_stats``), ``status`` (from
+        ``PreviewManifest.status``) and ``size`` (total size of the
+        files in bytes)
+
+    report : dict
+        The number of exposure groups that were skipped, in the
+        ``current`` and ``existing`` categories of ``REPORT_CATEGORIES``
+    """
+
+    # Group together common exposures
+    filenames = glob.glob(os.path.join(get_config()['filesystem'], program, '*.fits'))
+    grouped_filenames = group_filenames(filenames)
+    logging.info('Found {} filenames in {}'.format(len(filenames), program))
+
+    manifest = PreviewManifest()
+    report = dict.fromkeys(REPORT_CATEGORIES, 0)
+    tasks = []
+
+    for file_list in grouped_filenames:
+
+        # Skip the exposure if its images are up to date
+        stats = manifest.get_file_stats(file_list)
+        status = manifest.status(file_list, stats)
+        if status == 'current':
+            report['current'] += 1
+            continue
+
+        # Record preview images made before the manifest existed rather
+        # than making them again
+        if status == 'new' and not rebuild:
+            preview_output_directory, thumbnail_output_directory = get_output_directories(file_list[0])
+            previews, thumbnails = find_existing_outputs(file_list, preview_output_directory,
+                                                         thumbnail_output_directory)
+            if len(previews) > 0:
+                manifest.record(file_list, stats, previews, thumbnails)
+                logging.info("JPG already exists for {}, skipping.".format(file_list[0]))
+                report['existing'] += 1
+                continue
+
+        size = sum(file_size for file_size, mtime in stats.values())
+        tasks.append({'file_list': file_list, 'stats': stats, 'status': status, 'size': size})
+
+    manifest.close()
+
+    return tasks, report
+
+
 def get_base_output_name(filename_dict):
     """Returns the base output name used for preview images and
     thumbnails.
@@ -522,26 +734,172 @@ def get_base_output_name(filename_dict):
     return base_output_name
 
 
+def get_difference_frame(hdu, integration):
+    """Read the difference image of one integration from an HDU as
+    ``float32``. For 4D data only the first and last group of the
+    integration are read from disk.
+
+    Parameters
+    ----------
+    hdu : obj
+        ``astropy.io.fits`` image HDU containing 2D, 3D, or 4D data
+
+    integration : int
+        Integration to read. Ignored for 2D data.
+
+    Returns
+    -------
+    frame : obj
+        2D ``float32`` ``numpy`` array. The last group minus the first
+        group for 4D data, or the data of the integration otherwise.
+    """
+    ndim = len(hdu.shape)
+    if ndim == 4:
+        first = np.asarray(hdu.section[integration, 0, :, :], dtype=np.float32)
+        frame = np.asarray(hdu.section[integration, hdu.shape[1] - 1, :, :], dtype=np.float32)
+        frame -= first
+    elif ndim == 3:
+        frame = np.asarray(hdu.section[integration, :, :], dtype=np.float32)
+    else:
+        frame = np.asarray(hdu.data, dtype=np.float32)
+
+    return frame
+
+
+def get_preview_search_string(file_list):
+    """Returns the ``glob`` search string that matches the preview
+    images made from the given list of fits files.
+
+    Parameters
+    ----------
+    file_list : list
+        List of fits filenames from which preview image will be
+        generated
+
+    Returns
+    -------
+    search_string : str
+        Search string for the preview images, e.g.
+        ``jw96090001002_03101_00001_nrca2_rate_*.jpg``
+    """
+
+    # If file_list contains only a single file, then we need to search
+    # for a preview image name that contains the detector name
+    if len(file_list) == 1:
+        filename = os.path.split(file_list[0])[1]
+        search_string = filename.split('.fits')[0] + '_*.jpg'
+    else:
+        # If file_list contains multiple files, then we need to search
+        # for the appropriately named jpg of the mosaic, which depends
+        # on the specific detectors in the file_list
+        file_parts = filename_parser(file_list[0])
+        if file_parts['detector'].upper() in NIRCAM_SHORTWAVE_DETECTORS:
+            mosaic_str = "NRC_SW*_MOSAIC_"
+        elif file_parts['detector'].upper() in NIRCAM_LONGWAVE_DETECTORS:
+            mosaic_str = "NRC_LW*_MOSAIC_"
+        search_string = 'jw{}{}{}_{}{}{}_{}_{}{}*.jpg'.format(
+                        file_parts['program_id'], file_parts['observation'],
+                        file_parts['visit'], file_parts['visit_group'],
+                        file_parts['parallel_seq_id'], file_parts['activity'],
+                        file_parts['exposure_id'], mosaic_str, file_parts['suffix'])
+
+    return search_string
+
+
 @log_fail
 @log_info
-def generate_preview_images():
+def generate_preview_images(rebuild=False, chunksize=1, timeout=GROUP_TIMEOUT, tiles=False):
     """The main function of the ``generate_preview_image`` module.
-    See module docstring for further details."""
+    See module docstring for further details.
+
+    The exposure groups of all programs are found first, and are then
+    processed in parallel, largest first, so that large programs are
+    spread over all of the available cores.
+
+    Parameters
+    ----------
+    rebuild : bool
+        If ``True``, clear the manifest and regenerate the preview
+        images and thumbnails for all files
+
+    chunksize : int
+        Number of exposure groups sent to a worker at a time. Larger
+        chunks reduce overhead but balance the work less evenly.
+
+    timeout : int
+        Maximum time, in seconds, to spend on a single exposure group
+
+    tiles : bool
+        If ``True``, also save a tile pyramid of each integration, for
+        viewing large images one region at a time
+    """
 
     # Begin logging
     logging.info("Beginning the script run")
 
-    # Process programs in parallel
+    if rebuild:
+        manifest = PreviewManifest()
+        manifest.clear()
+        manifest.close()
+        logging.info('Cleared the manifest. Regenerating all preview images and thumbnails.')
+
     program_list = [os.path.basename(item) for item in glob.glob(os.path.join(get_config()['filesystem'], '*'))]
+
+    # The workers must not share the database connections of this process
+    engine.dispose()
     pool = multiprocessing.Pool(processes=int(get_config()['cores']))
-    pool.map(process_program, program_list)
+
+    # Find the exposure groups that need processing in all programs
+    tasks, reports = [], []
+    for program_tasks, report in pool.imap_unordered(partial(find_exposure_groups, rebuild=rebuild), program_list):
+        tasks.extend(program_tasks)
+        reports.append(report)
+
+    # Process the exposure groups, largest first
+    tasks.sort(key=lambda task: task['size'], reverse=True)
+    logging.info('Processing {} exposures from {} programs'.format(len(tasks), len(program_list)))
+    results = list(pool.imap_unordered(partial(run_exposure_group, timeout=timeout, tiles=tiles), tasks,
+                                       chunksize=chunksize))
     pool.close()
     pool.join()
 
+    # Report what was processed and what was skipped, and how fast
+    reports.append(results_to_report(results))
+    log_report(reports)
+    log_throughput(results)
+
     # Complete logging:
     logging.info("Completed.")
 
 
+def get_output_directories(filename):
+    """Returns the directories that the preview images and thumbnails
+    made from the given file are saved in.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the fits file
+
+    Returns
+    -------
+    preview_output_directory : str
+        Directory for the preview images
+
+    thumbnail_output_directory : str
+        Directory for the thumbnails
+    """
+
+    try:
+        identifier = 'jw{}'.format(filename_parser(filename)['program_id'])
+    except ValueError:
+        identifier = os.path.basename(filename).split('.fits')[0]
+    preview_output_directory = os.path.join(get_config()['preview_image_filesystem'], identifier)
+    thumbnail_output_directory = os.path.join(get_config()['thumbnail_filesystem'], identifier)
+
+    return preview_output_directory, thumbnail_output_directory
+
+
 def group_filenames(filenames):
     """Given a list of JWST filenames, group together files from the
     same exposure. These files will share the same ``program_id``,
@@ -552,6 +910,12 @@ def group_filenames(filenames):
     a given exposure will be kept separate from one another and no
     mosaic will be made.  Stage 3 files will remain as individual
     files, and will not be grouped together with any other files.
+    Files that do not follow JWST naming conventions are skipped.
+
+    All of the filenames are parsed together by
+    ``filename_parser_batch``, and files are grouped by a key built
+    from the parsed exposure information, so the time taken scales
+    linearly with the number of files.
 
     Parameters
     ----------
@@ -566,143 +930,323 @@ def group_filenames(filenames):
         information.
     """
 
-    # Some initializations
-    grouped, matched_names = [], []
-    filenames.sort()
+    # Groups of filenames, keyed by exposure, in the order in which
+    # each exposure is first found
+    groups = {}
+
+    filenames = sorted(filenames)
+    filename_table = filename_parser_batch(filenames)
 
     # Loop over each file in the list of good files
-    for filename in filenames:
+    for filename, filename_dict in zip(filenames, filename_table.to_dict('records')):
+
+        # Files that do not follow naming conventions are not grouped
+        if filename_dict['filename_type'] is None:
+            continue
+
+        # For stage 3 filenames, treat individually
+        elif 'stage_3' in filename_dict['filename_type']:
+            key = (filename,)
+
+        # Group together stage 1 and 2 filenames
+        elif filename_dict['filename_type'] == 'stage_1_and_2':
+
+            # Determine which detectors can be combined
+            detector = filename_dict['detector'].upper()
+            if detector in NIRCAM_SHORTWAVE_DETECTORS:
+                channel = 'NRC_SW'
+            elif detector in NIRCAM_LONGWAVE_DETECTORS:
+                channel = 'NRC_LW'
+            else:  # non-NIRCam detectors
+                channel = detector
+
+            key = (os.path.dirname(filename),
+                   filename_dict['program_id'], filename_dict['observation'],
+                   filename_dict['visit'], filename_dict['visit_group'],
+                   filename_dict['parallel_seq_id'], filename_dict['activity'].lower(),
+                   filename_dict['exposure_id'], filename_dict['suffix'].lower(), channel)
+
+        # Other filename types are not grouped or processed
+        else:
+            continue
+
+        groups.setdefault(key, []).append(filename)
+
+    grouped = list(groups.values())
 
-        # Holds list of matching files for exposure
-        subgroup = []
+    return grouped
 
-        # Generate string to be matched with other filenames
-        filename_dict = filename_parser(os.path.basename(filename))
 
-        # If the filename was already involved in a match, then skip
-        if filename not in matched_names:
+def log_report(reports):
+    """Log the number of exposure groups in each category of the
+    given reports, summed over all of the reports.
 
-            # For stage 3 filenames, treat individually
-            if 'stage_3' in filename_dict['filename_type']:
-                matched_names.append(filename)
-                subgroup.append(filename)
+    Parameters
+    ----------
+    reports : list
+        List of dictionaries returned by ``process_program``,
+        ``find_exposure_groups`` or ``results_to_report``
+    """
 
-            # Group together stage 1 and 2 filenames
-            elif filename_dict['filename_type'] == 'stage_1_and_2':
+    totals = dict.fromkeys(REPORT_CATEGORIES, 0)
+    for report in reports:
+        for category in REPORT_CATEGORIES:
+            totals[category] += report[category]
 
-                # Determine detector naming convention
-                if filename_dict['detector'].upper() in NIRCAM_SHORTWAVE_DETECTORS:
-                    detector_str = 'NRC[AB][1234]'
-                elif filename_dict['detector'].upper() in NIRCAM_LONGWAVE_DETECTORS:
-                    detector_str = 'NRC[AB]5'
-                else:  # non-NIRCam detectors
-                    detector_str = filename_dict['detector'].upper()
+    logging.info('Processed {} new, {} modified, and {} stale exposures'.format(
+        totals['new'], totals['modified'], totals['stale']))
+    logging.info('Skipped {} up-to-date exposures and {} exposures with existing images'.format(
+        totals['current'], totals['existing']))
+    if totals['failed'] > 0:
+        logging.warning('Failed to process {} exposures'.format(totals['failed']))
 
-                # Build pattern to match against
-                base_output_name = get_base_output_name(filename_dict)
-                match_str = '{}{}_{}.fits'.format(base_output_name, detector_str, filename_dict['suffix'])
-                match_str = os.path.join(os.path.dirname(filename), match_str)
-                pattern = re.compile(match_str, re.IGNORECASE)
 
-                # Try to match the substring to each good file
-                for file_to_match in filenames:
-                    if pattern.match(file_to_match) is not None:
-                        matched_names.append(file_to_match)
-                        subgroup.append(file_to_match)
+def log_throughput(results):
+    """Log the number of exposure groups and amount of data processed
+    by each worker process, and its throughput.
 
-        if len(subgroup) > 0:
-            grouped.append(subgroup)
+    Parameters
+    ----------
+    results : list
+        List of dictionaries returned by ``run_exposure_group``
+    """
 
-    return grouped
+    workers = {}
+    for result in results:
+        worker = workers.setdefault(result['worker'], {'groups': 0, 'size': 0, 'elapsed': 0.})
+        worker['groups'] += 1
+        worker['size'] += result['size']
+        worker['elapsed'] += result['elapsed']
+
+    for pid in sorted(workers):
+        worker = workers[pid]
+        megabytes = worker['size'] / 1024**2
+        elapsed = max(worker['elapsed'], 1e-6)
+        logging.info('Worker {}: {} exposures, {:.1f} MB in {:.1f} s ({:.2f} exposures/s, {:.1f} MB/s)'.format(
+            pid, worker['groups'], megabytes, worker['elapsed'], worker['groups'] / elapsed,
+            megabytes / elapsed))
+
+
+def process_exposure_group(file_list, tiles=False):
+    """Generate the preview images and thumbnails for a group of files
+    from the same exposure.
+
+    Parameters
+    ----------
+    file_list : list
+        List of fits filenames from the exposure. If there is more than
+        one, the files are combined into a mosaic.
+
+    tiles : bool
+        If ``True``, also save a tile pyramid of each integration
+
+    Returns
+    -------
+    previews : list
+        Paths of the preview images that were saved
+
+    thumbnails : list
+        Paths of the thumbnails that were saved
+
+    tile_pyramids : list
+        Paths of the JSON descriptors of the tile pyramids that were
+        saved
+    """
+
+    filename = file_list[0]
+    preview_output_directory, thumbnail_output_directory = get_output_directories(filename)
+
+    # Create the output directories if necessary
+    if not os.path.exists(preview_output_directory):
+        os.makedirs(preview_output_directory, exist_ok=True)
+        permissions.set_permissions(preview_output_directory)
+        logging.info('Created directory {}'.format(preview_output_directory))
+    if not os.path.exists(thumbnail_output_directory):
+        os.makedirs(thumbnail_output_directory, exist_ok=True)
+        permissions.set_permissions(thumbnail_output_directory)
+        logging.info('Created directory {}'.format(thumbnail_output_directory))
+
+    # If the exposure contains more than one file (because more
+    # than one detector was used), then a mosaic is created below
+    max_size = 8
+    numfiles = len(file_list)
+    if numfiles in [2, 4]:
+        max_size = 16
+    elif numfiles in [8]:
+        max_size = 32
+
+    # Create the nominal preview image and thumbnail. The data of a
+    # mosaic are not read from the first file, but set below.
+    im = PreviewImage(filename, "SCI", low_memory=True, read_data=numfiles == 1)
+    im.clip_percent = 0.01
+    im.limit_error = 0.001
+    im.scaling = 'log'
+    im.cmap = 'viridis'
+    im.output_format = 'jpg'
+    im.renderer = 'pillow'
+    im.tiled = tiles
+    im.preview_output_directory = preview_output_directory
+    im.thumbnail_output_directory = thumbnail_output_directory
+
+    if numfiles == 1:
+        im.make_image(max_img_size=max_size)
+
+    # If the exposure contains more than one file, create the mosaic
+    # one integration at a time and insert it and its associated DQ
+    # array into the instance of PreviewImage, so that only a single
+    # integration of the mosaic is in memory at once. Also set the
+    # input filename to indicate that we have mosaicked data
+    else:
+        im.file = create_dummy_filename(file_list)
+        for integration, (frame, dq) in enumerate(create_mosaic_frames(file_list)):
+            im.data, im.dq = frame, dq
+            im.first_integration = integration
+            im.make_image(max_img_size=max_size)
+            im.data = None
+        logging.info('Created mosaic for:')
+        for item in file_list:
+            logging.info('\t{}'.format(item))
+
+    logging.info('Created preview image and thumbnail for: {}'.format(filename))
 
+    return im.preview_images, im.thumbnail_images, im.tile_pyramids
 
-def process_program(program):
-    """Generate preview images and thumbnails for the given program.
+
+def process_program(program, rebuild=False, timeout=GROUP_TIMEOUT, tiles=False):
+    """Generate preview images and thumbnails for the given program,
+    one exposure group at a time.
+
+    Exposures whose files and images are unchanged since they were
+    recorded in the manifest are skipped.  Exposures that are not yet
+    in the manifest, but whose preview images already exist, are added
+    to the manifest without being processed again.
 
     Parameters
     ----------
     program : str
         The program identifier (e.g. ``88600``)
+
+    rebuild : bool
+        If ``True``, process exposures that are not in the manifest even
+        if their preview images already exist
+
+    timeout : int
+        Maximum time, in seconds, to spend on a single exposure group
+
+    tiles : bool
+        If ``True``, also save a tile pyramid of each integration
+
+    Returns
+    -------
+    report : dict
+        The number of exposure groups in each category: ``current``
+        (skipped), ``existing`` (images already existed), ``new``,
+        ``modified``, ``stale`` (images were missing) and ``failed``
     """
 
-    # Group together common exposures
-    filenames = glob.glob(os.path.join(get_config()['filesystem'], program, '*.fits'))
-    grouped_filenames = group_filenames(filenames)
-    logging.info('Found {} filenames'.format(len(filenames)))
+    tasks, report = find_exposure_groups(program, rebuild=rebuild)
+    results = [run_exposure_group(task, timeout=timeout, tiles=tiles) for task in tasks]
 
-    for file_list in grouped_filenames:
-        filename = file_list[0]
-
-        # Determine the save location
-        try:
-            identifier = 'jw{}'.format(filename_parser(filename)['program_id'])
-        except ValueError:
-            identifier = os.path.basename(filename).split('.fits')[0]
-        preview_output_directory = os.path.join(get_config()['preview_image_filesystem'], identifier)
-        thumbnail_output_directory = os.path.join(get_config()['thumbnail_filesystem'], identifier)
-
-        # Check to see if the preview images already exist and skip if they do
-        file_exists = check_existence(file_list, preview_output_directory)
-        if file_exists:
-            logging.info("JPG already exists for {}, skipping.".format(filename))
-            continue
+    group_report = results_to_report(results)
+    for category in REPORT_CATEGORIES:
+        report[category] += group_report[category]
+    logging.info('Program {}: {}'.format(program, report))
 
-        # Create the output directories if necessary
-        if not os.path.exists(preview_output_directory):
-            os.makedirs(preview_output_directory)
-            permissions.set_permissions(preview_output_directory)
-            logging.info('Created directory {}'.format(preview_output_directory))
-        if not os.path.exists(thumbnail_output_directory):
-            os.makedirs(thumbnail_output_directory)
-            permissions.set_permissions(thumbnail_output_directory)
-            logging.info('Created directory {}'.format(thumbnail_output_directory))
-
-        # If the exposure contains more than one file (because more
-        # than one detector was used), then create a mosaic
-        max_size = 8
-        numfiles = len(file_list)
-        if numfiles > 1:
-            try:
-                mosaic_image, mosaic_dq = create_mosaic(file_list)
-                logging.info('Created mosiac for:')
-                for item in file_list:
-                    logging.info('\t{}'.format(item))
-            except (ValueError, FileNotFoundError) as error:
-                logging.error(error)
-            dummy_file = create_dummy_filename(file_list)
-            if numfiles in [2, 4]:
-                max_size = 16
-            elif numfiles in [8]:
-                max_size = 32
-
-        # Create the nominal preview image and thumbnail
-        try:
-            im = PreviewImage(filename, "SCI")
-            im.clip_percent = 0.01
-            im.scaling = 'log'
-            im.cmap = 'viridis'
-            im.output_format = 'jpg'
-            im.preview_output_directory = preview_output_directory
-            im.thumbnail_output_directory = thumbnail_output_directory
-
-            # If a mosaic was made from more than one file
-            # insert it and it's associated DQ array into the
-            # instance of PreviewImage. Also set the input
-            # filename to indicate that we have mosaicked data
-            if numfiles != 1:
-                im.data = mosaic_image
-                im.dq = mosaic_dq
-                im.file = dummy_file
+    return report
+
+
+def results_to_report(results):
+    """Count the results of ``run_exposure_group`` in each category of
+    ``REPORT_CATEGORIES``.
+
+    Parameters
+    ----------
+    results : list
+        List of dictionaries returned by ``run_exposure_group``
+
+    Returns
+    -------
+    report : dict
+        The number of exposure groups in each category
+    """
+
+    report = dict.fromkeys(REPORT_CATEGORIES, 0)
+    for result in results:
+        report[result['status']] += 1
+
+    return report
 
-            im.make_image(max_img_size=max_size)
-            logging.info('Created preview image and thumbnail for: {}'.format(filename))
-        except ValueError as error:
-            logging.warning(error)
+
+def run_exposure_group(task, timeout=GROUP_TIMEOUT, tiles=False):
+    """Process an exposure group found by ``find_exposure_groups`` and
+    record its outputs in the manifest.  Any error, or taking longer
+    than ``timeout``, is logged and only fails this exposure group.
+
+    Parameters
+    ----------
+    task : dict
+        Dictionary describing the exposure group, as returned by
+        ``find_exposure_groups``
+
+    timeout : int
+        Maximum time, in seconds, to spend on the exposure group. No
+        limit is applied if ``None``.
+
+    tiles : bool
+        If ``True``, also save a tile pyramid of each integration
+
+    Returns
+    -------
+    result : dict
+        Dictionary with keys ``file_list``, ``status`` (the category of
+        the exposure group in ``REPORT_CATEGORIES``), ``worker`` (the
+        process ID), ``size`` (bytes) and ``elapsed`` (seconds)
+    """
+
+    def raise_timeout(signum, frame):
+        raise TimeoutError('Timed out after {} s'.format(timeout))
+
+    file_list = task['file_list']
+    status = task['status']
+    start = time.time()
+
+    if timeout is not None:
+        previous_handler = signal.signal(signal.SIGALRM, raise_timeout)
+        signal.alarm(int(timeout))
+    try:
+        previews, thumbnails, tile_pyramids = process_exposure_group(file_list, tiles=tiles)
+    except Exception as error:
+        logging.error('Failed to process {}: {}'.format(file_list[0], error))
+        status = 'failed'
+    finally:
+        if timeout is not None:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+    if status != 'failed':
+        manifest = PreviewManifest()
+        manifest.record(file_list, task['stats'], previews, thumbnails, tiles=tile_pyramids)
+        manifest.close()
+
+    return {'file_list': file_list, 'status': status, 'worker': os.getpid(),
+            'size': task['size'], 'elapsed': time.time() - start}
 
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description='Generate preview images and thumbnails.')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Clear the manifest and regenerate all preview images and thumbnails')
+    parser.add_argument('--chunksize', type=int, default=1,
+                        help='Number of exposures sent to each worker at a time')
+    parser.add_argument('--timeout', type=int, default=GROUP_TIMEOUT,
+                        help='Maximum time, in seconds, to spend on a single exposure')
+    parser.add_argument('--tiles', action='store_true',
+                        help='Also save a tile pyramid of each preview image')
+    args = parser.parse_args()
+
     module = os.path.basename(__file__).strip('.py')
     configure_logging(module)
 
-    generate_preview_images()
+    generate_preview_images(rebuild=args.rebuild, chunksize=args.chunksize, timeout=args.timeout,
+                            tiles=args.tiles)
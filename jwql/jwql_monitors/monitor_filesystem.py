@@ -53,6 +53,7 @@ from jwql.database.database_interface import CentralStore
 from jwql.utils.logging_functions import configure_logging, log_info, log_fail
 from jwql.utils.permissions import set_permissions
 from jwql.utils.constants import FILE_SUFFIX_TYPES, JWST_INSTRUMENT_NAMES, JWST_INSTRUMENT_NAMES_MIXEDCASE
+from jwql.utils.plotting import downsampled_source
 from jwql.utils.utils import filename_parser
 from jwql.utils.utils import get_config
 
@@ -339,13 +340,14 @@ def plot_by_filetype(plot_type, instrument):
             for date, value in results:
                 results_dict[date] += value
 
-            # Parse results so they can be easily plotted
-            dates = list(results_dict.keys())
-            values = list(results_dict.values())
+            # Parse results so they can be easily plotted, in order of date
+            dates = sorted(results_dict.keys())
+            values = [results_dict[date] for date in dates]
 
             # Plot the results
-            plot.line(dates, values, legend='{} files'.format(filetype), line_color=color)
-            plot.circle(dates, values, color=color)
+            source = downsampled_source(plot, {'date': dates, 'value': values}, 'date', 'value')
+            plot.line('date', 'value', source=source, legend='{} files'.format(filetype), line_color=color)
+            plot.circle('date', 'value', source=source, color=color)
 
     return plot
 
@@ -361,7 +363,7 @@ def plot_filesystem_size():
 
     # Plot system stats vs. date
     results = session.query(FilesystemGeneral.date, FilesystemGeneral.total_file_size,
-                            FilesystemGeneral.used, FilesystemGeneral.available).all()
+                            FilesystemGeneral.used, FilesystemGeneral.available).order_by(FilesystemGeneral.date).all()
     dates, total_sizes, useds, availables = zip(*results)
     plot = figure(
         tools='pan,box_zoom,wheel_zoom,reset,save',
@@ -369,12 +371,15 @@ def plot_filesystem_size():
         title='System stats',
         x_axis_label='Date',
         y_axis_label='Size TB')
-    plot.line(dates, total_sizes, legend='Total size', line_color='red')
-    plot.circle(dates, total_sizes, color='red')
-    plot.line(dates, useds, legend='Used bytes', line_color='green')
-    plot.circle(dates, useds, color='green')
-    plot.line(dates, availables, legend='Free bytes', line_color='blue')
-    plot.circle(dates, availables, color='blue')
+    source = downsampled_source(plot, {'date': dates, 'value': total_sizes}, 'date', 'value')
+    plot.line('date', 'value', source=source, legend='Total size', line_color='red')
+    plot.circle('date', 'value', source=source, color='red')
+    source = downsampled_source(plot, {'date': dates, 'value': useds}, 'date', 'value')
+    plot.line('date', 'value', source=source, legend='Used bytes', line_color='green')
+    plot.circle('date', 'value', source=source, color='green')
+    source = downsampled_source(plot, {'date': dates, 'value': availables}, 'date', 'value')
+    plot.line('date', 'value', source=source, legend='Free bytes', line_color='blue')
+    plot.circle('date', 'value', source=source, color='blue')
 
     return plot
 
@@ -389,7 +394,7 @@ def plot_central_store_dirs():
         """
 
     # Plot system stats vs. date
-    results = session.query(CentralStore.date, CentralStore.size, CentralStore.available).all()
+    results = session.query(CentralStore.date, CentralStore.size, CentralStore.available).order_by(CentralStore.date).all()
 
     arealist = ['logs', 'outputs', 'test', 'preview_images', 'thumbnails', 'all']
 
@@ -403,10 +408,12 @@ def plot_central_store_dirs():
         y_axis_label='Size TB')
     colors = itertools.cycle(palette)
 
-    plot.line(dates, total_sizes, legend='Total size', line_color='red')
-    plot.circle(dates, total_sizes, color='red')
-    plot.line(dates, availables, legend='Free', line_color='blue')
-    plot.circle(dates, availables, color='blue')
+    source = downsampled_source(plot, {'date': dates, 'value': total_sizes}, 'date', 'value')
+    plot.line('date', 'value', source=source, legend='Total size', line_color='red')
+    plot.circle('date', 'value', source=source, color='red')
+    source = downsampled_source(plot, {'date': dates, 'value': availables}, 'date', 'value')
+    plot.line('date', 'value', source=source, legend='Free', line_color='blue')
+    plot.circle('date', 'value', source=source, color='blue')
 
     # This part of the plot should cycle through areas and plot area used values vs. date
     for area, color in zip(arealist, colors):
@@ -420,13 +427,14 @@ def plot_central_store_dirs():
             for date, value in results:
                 results_dict[date] += value
 
-            # Parse results so they can be easily plotted
-            dates = list(results_dict.keys())
-            values = list(results_dict.values())
+            # Parse results so they can be easily plotted, in order of date
+            dates = sorted(results_dict.keys())
+            values = [results_dict[date] for date in dates]
 
             # Plot the results
-            plot.line(dates, values, legend='{} files'.format(area), line_color=color)
-            plot.circle(dates, values, color=color)
+            source = downsampled_source(plot, {'date': dates, 'value': values}, 'date', 'value')
+            plot.line('date', 'value', source=source, legend='{} files'.format(area), line_color=color)
+            plot.circle('date', 'value', source=source, color=color)
 
     return plot
 
@@ -494,7 +502,7 @@ def plot_total_file_counts():
     """
 
     # Total file counts vs. date
-    results = session.query(FilesystemGeneral.date, FilesystemGeneral.total_file_count).all()
+    results = session.query(FilesystemGeneral.date, FilesystemGeneral.total_file_count).order_by(FilesystemGeneral.date).all()
     dates, file_counts = zip(*results)
     plot = figure(
         tools='pan,box_zoom,reset,wheel_zoom,save',
@@ -502,8 +510,9 @@ def plot_total_file_counts():
         title="Total File Counts",
         x_axis_label='Date',
         y_axis_label='Count')
-    plot.line(dates, file_counts, line_width=2, line_color='blue')
-    plot.circle(dates, file_counts, color='blue')
+    source = downsampled_source(plot, {'date': dates, 'value': file_counts}, 'date', 'value')
+    plot.line('date', 'value', source=source, line_width=2, line_color='blue')
+    plot.circle('date', 'value', source=source, color='blue')
 
     return plot
 
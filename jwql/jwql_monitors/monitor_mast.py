@@ -18,17 +18,19 @@ Use
         inventory, keywords = monitor_mast.jwst_inventory()
 """
 
+from functools import partial
 import logging
 import os
 
-from astroquery.mast import Mast
 from bokeh.embed import components
 from bokeh.io import save, output_file
 import pandas as pd
 
 from jwql.utils.constants import JWST_INSTRUMENT_NAMES, JWST_DATAPRODUCTS
 from jwql.utils.logging_functions import configure_logging, log_info, log_fail
+from jwql.utils.mast_cache import mast_service_request
 from jwql.utils.permissions import set_permissions
+from jwql.utils.query_executor import QueryExecutor
 from jwql.utils.utils import get_config
 from jwql.utils.plotting import bar_chart
 
@@ -107,8 +109,7 @@ def instrument_inventory(instrument, dataproduct=JWST_DATAPRODUCTS,
     if isinstance(add_requests, dict):
         params.update(add_requests)
 
-    response = Mast.service_request_async(service, params)
-    result = response[0].json()
+    result = mast_service_request(service, params)
 
     # Return all the data
     if return_data:
@@ -146,9 +147,10 @@ def instrument_keywords(instrument, caom=False):
 
 def jwst_inventory(instruments=JWST_INSTRUMENT_NAMES,
                    dataproducts=['image', 'spectrum', 'cube'],
-                   caom=False, plot=False):
+                   caom=False, plot=False, executor=None):
     """Gather a full inventory of all JWST data in each instrument
-    service by instrument/dtype
+    service by instrument/dtype. The queries for each instrument and
+    data product are made in parallel.
 
     Parameters
     ----------
@@ -160,6 +162,9 @@ def jwst_inventory(instruments=JWST_INSTRUMENT_NAMES,
         Query CAOM service
     plot: bool
         Return a pie chart of the data
+    executor: QueryExecutor
+        The executor that makes the queries. A ``QueryExecutor`` with
+        the default settings is used if ``None``.
 
     Returns
     -------
@@ -167,22 +172,26 @@ def jwst_inventory(instruments=JWST_INSTRUMENT_NAMES,
         The table of record counts for each instrument and mode
     """
     logging.info('Searching database...')
-    # Iterate through instruments
-    inventory, keywords = [], {}
-    for instrument in instruments:
-        ins = [instrument]
-        for dp in dataproducts:
-            count = instrument_inventory(instrument, dataproduct=dp, caom=caom)
-            ins.append(count)
+    if executor is None:
+        executor = QueryExecutor()
+
+    # Query the counts of each data product and the keywords of each
+    # instrument at once
+    count_calls = [partial(instrument_inventory, instrument, dataproduct=dp, caom=caom)
+                   for instrument in instruments for dp in dataproducts]
+    keyword_calls = [partial(instrument_keywords, instrument, caom=caom) for instrument in instruments]
+    results = executor.run(count_calls + keyword_calls)
+    counts, instrument_keyword_tables = results[:len(count_calls)], results[len(count_calls):]
 
-        # Get the total
-        ins.append(sum(ins[-3:]))
+    inventory, keywords = [], {}
+    for i, instrument in enumerate(instruments):
+        ins_counts = counts[i * len(dataproducts):(i + 1) * len(dataproducts)]
 
-        # Add it to the list
-        inventory.append(ins)
+        # Add the counts and their total to the list
+        inventory.append([instrument] + ins_counts + [sum(ins_counts)])
 
         # Add the keywords to the dict
-        keywords[instrument] = instrument_keywords(instrument, caom=caom)
+        keywords[instrument] = instrument_keyword_tables[i]
 
     logging.info('Completed database search for {} instruments and {} data products.'.
                  format(instruments, dataproducts))
@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+
+"""Build the ``Bokeh`` components of the monitor pages of the web
+application whose monitors have new results, and store them in the
+component cache, so that the pages are served from the cache.
+
+This is intended to be run as a cron job, after the monitors.
+
+Authors
+-------
+
+    - Gray Kanarek
+
+Use
+---
+
+    This module can be executed as such:
+
+    ::
+
+        python update_monitor_components.py
+
+    To build the components of every page, whether or not they are up
+    to date:
+
+    ::
+
+        python update_monitor_components.py --force
+"""
+
+import argparse
+import logging
+import os
+
+from jwql.utils.logging_functions import configure_logging, log_info, log_fail
+from jwql.website.apps.jwql.bokeh_containers import refresh_monitor_tabs
+
+
+@log_fail
+@log_info
+def update_monitor_components(force=False):
+    """Build the components of the monitor pages whose monitors have new
+    results.
+
+    Parameters
+    ----------
+    force : bool
+        Build the components of every page
+    """
+    logging.info('Beginning the update of the monitor page components.')
+
+    refreshed = refresh_monitor_tabs(force=force)
+    for monitor, instrument in refreshed:
+        logging.info('Built the components of the {} {}'.format(instrument, monitor))
+
+    logging.info('Built the components of {} pages.'.format(len(refreshed)))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Build the components of the monitor pages.')
+    parser.add_argument('--force', action='store_true', help='Build the components of every page')
+    args = parser.parse_args()
+
+    # Configure logging
+    module = os.path.basename(__file__).strip('.py')
+    configure_logging(module)
+
+    update_monitor_components(force=args.force)
@@ -0,0 +1,441 @@
+#! /usr/bin/env python
+
+"""Benchmarks of the preview image pipeline, run on synthetic files.
+
+Synthetic JWST-named ``uncal``, ``rate`` and ``i2d`` files are written
+to a temporary directory, and the time taken by the main steps of
+``preview_image`` and ``generate_preview_images`` is measured. Each
+run of a benchmark is made in a new process, so that the peak resident
+set size (RSS) of the benchmark is not affected by the benchmarks run
+before it. The wall time, CPU time and peak RSS of each benchmark are
+printed, and can be saved to a JSON file along with the git commit, so
+that results can be compared across commits.
+
+Authors
+-------
+
+    - Bryan Hilbert
+
+Use
+---
+
+    This script is intended to be executed as such:
+
+    ::
+
+        python benchmark_preview_images.py --output results.json
+
+    To run only some of the benchmarks, on smaller files, and to
+    compare the results with those of a previous run:
+
+    ::
+
+        python benchmark_preview_images.py --size small --benchmarks find_limits create_mosaic --compare results.json
+
+    When comparing, the exit status is 1 if any benchmark is slower,
+    or uses more memory, than the previous run by more than the
+    ``--threshold`` factor.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from astropy.io import fits
+import numpy as np
+
+from jwql.jwql_monitors import generate_preview_images
+from jwql.utils.preview_image import PreviewImage
+
+# Dimensions of the synthetic data. ``full`` matches full frame NIRCam
+# exposures and a large stage 3 mosaic. ``filenames`` is the number of
+# filenames to group in the ``group_filenames`` benchmark.
+SIZES = {'small': {'ny': 512, 'nx': 512, 'ngroups': 5, 'nints': 1, 'i2d': 1024, 'filenames': 20000},
+         'full': {'ny': 2048, 'nx': 2048, 'ngroups': 10, 'nints': 1, 'i2d': 6000, 'filenames': 200000}}
+
+# Synthetic files are in a single program
+PROGRAM = 'jw00001'
+SWA_DETECTORS = ['nrca1', 'nrca2', 'nrca3', 'nrca4']
+SWA_ROOTNAME = 'jw00001001001_01101_00001_{}'
+NIRISS_ROOTNAME = 'jw00001002001_01101_00001_nis'
+I2D_FILENAME = 'jw00001-o001_t001_nircam_clear-f200w_i2d.fits'
+
+
+def bench_create_mosaic(files, directories):
+    """Mosaic the four SWA ``uncal`` files."""
+    yield
+    generate_preview_images.create_mosaic(files['swa_uncal'])
+
+
+def bench_find_limits(files, directories):
+    """Find the display limits of a difference image, exactly and with
+    the subsampled estimate used by ``generate_preview_images``."""
+    image = PreviewImage(files['swa_uncal'][0], 'SCI', low_memory=True)
+    frame = image.difference_image(image.data)[0]
+    yield
+    image.find_limits(frame, image.dq, image.clip_percent)
+    image.find_limits(frame, image.dq, image.clip_percent, max_error=0.001)
+
+
+def bench_get_data(files, directories):
+    """Read an ``uncal`` file."""
+    yield
+    PreviewImage(files['swa_uncal'][0], 'SCI', low_memory=True)
+
+
+def bench_group_filenames(files, directories):
+    """Group synthetic NIRCam filenames by exposure."""
+    filenames = []
+    for exposure in range(files['size']['filenames'] // len(SWA_DETECTORS) // 2):
+        for detector in SWA_DETECTORS:
+            for suffix in ['uncal', 'rate']:
+                filenames.append(os.path.join(directories['filesystem'], PROGRAM,
+                                              'jw00001001001_01101_{:05d}_{}_{}.fits'.format(exposure, detector, suffix)))
+    yield
+    generate_preview_images.group_filenames(filenames)
+
+
+def bench_make_image(files, directories):
+    """Make the preview images and thumbnails of an ``uncal`` file, as
+    ``generate_preview_images`` does."""
+    output_directory = reset_directory(os.path.join(directories['work'], 'make_image'))
+    image = PreviewImage(files['swa_uncal'][0], 'SCI', low_memory=True)
+    image.limit_error = 0.001
+    image.renderer = 'pillow'
+    image.preview_output_directory = output_directory
+    image.thumbnail_output_directory = output_directory
+    yield
+    image.make_image()
+
+
+def bench_make_image_i2d(files, directories):
+    """Make the preview images and thumbnails of a stage 3 mosaic."""
+    output_directory = reset_directory(os.path.join(directories['work'], 'make_image_i2d'))
+    image = PreviewImage(files['i2d'], 'SCI', low_memory=True)
+    image.limit_error = 0.001
+    image.renderer = 'pillow'
+    image.preview_output_directory = output_directory
+    image.thumbnail_output_directory = output_directory
+    yield
+    image.make_image(max_img_size=32)
+
+
+def bench_process_program(files, directories):
+    """Run ``generate_preview_images.process_program`` on all of the
+    synthetic files, starting with no existing outputs."""
+    reset_directory(directories['preview_image_filesystem'])
+    reset_directory(directories['thumbnail_filesystem'])
+    generate_preview_images.get_config = lambda: directories
+    yield
+    generate_preview_images.process_program(PROGRAM)
+
+
+# The benchmarks, in the order they are run. Each is a generator that
+# does any setup, yields, and then runs the code to be timed.
+BENCHMARKS = {'get_data': bench_get_data,
+              'find_limits': bench_find_limits,
+              'make_image': bench_make_image,
+              'make_image_i2d': bench_make_image_i2d,
+              'create_mosaic': bench_create_mosaic,
+              'group_filenames': bench_group_filenames,
+              'process_program': bench_process_program}
+
+
+def compare_results(results, previous, threshold=1.2):
+    """Print the change in each benchmark since a previous run and find
+    the benchmarks that have become slower or use more memory.
+
+    Parameters
+    ----------
+    results : dict
+        Results of this run, from ``run_benchmarks``
+
+    previous : dict
+        Results of a previous run
+
+    threshold : float
+        Ratio of the new to the previous wall time or peak RSS above
+        which a benchmark is counted as a regression
+
+    Returns
+    -------
+    regressions : list
+        Names of the benchmarks that have regressed
+    """
+    regressions = []
+    print('Compared with {} ({}):'.format(previous['commit'], previous['date']))
+    print('{:<20s} {:>10s} {:>10s} {:>8s} {:>10s} {:>10s} {:>8s}'.format(
+        'benchmark', 'wall (s)', 'was', 'ratio', 'RSS (MB)', 'was', 'ratio'))
+    for name, result in results['benchmarks'].items():
+        if name not in previous['benchmarks']:
+            continue
+        old = previous['benchmarks'][name]
+        wall_ratio = min(result['wall']) / max(min(old['wall']), 1e-9)
+        rss_ratio = result['peak_rss_mb'] / max(old['peak_rss_mb'], 1e-9)
+        flag = ''
+        if wall_ratio > threshold or rss_ratio > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('{:<20s} {:>10.3f} {:>10.3f} {:>8.2f} {:>10.1f} {:>10.1f} {:>8.2f}{}'.format(
+            name, min(result['wall']), min(old['wall']), wall_ratio,
+            result['peak_rss_mb'], old['peak_rss_mb'], rss_ratio, flag))
+
+    return regressions
+
+
+def create_synthetic_files(directory, size):
+    """Write synthetic NIRCam, NIRISS and stage 3 files of the given
+    size into a program directory.
+
+    Parameters
+    ----------
+    directory : str
+        Directory in which to make the program directory
+
+    size : dict
+        Dimensions of the data, from ``SIZES``
+
+    Returns
+    -------
+    files : dict
+        Paths of the files: ``swa_uncal`` and ``swa_rate`` (lists of
+        the four NIRCam SWA detectors), ``niriss_uncal`` and ``i2d``,
+        along with the ``size``
+    """
+    program_directory = os.path.join(directory, PROGRAM)
+    os.makedirs(program_directory, exist_ok=True)
+    rng = np.random.default_rng(0)
+    ny, nx, ngroups, nints = size['ny'], size['nx'], size['ngroups'], size['nints']
+    files = {'size': size, 'swa_uncal': [], 'swa_rate': []}
+
+    # Ramps have a bias level and a signal that increases with each group
+    def write_exposure(rootname):
+        rate = rng.gamma(2., 20., size=(ny, nx)).astype(np.float32)
+        ramp = np.empty((nints, ngroups, ny, nx), dtype=np.uint16)
+        for group in range(ngroups):
+            ramp[:, group] = 10000 + rate * (group + 1) + rng.normal(0., 5., size=(ny, nx))
+        pixeldq = np.zeros((ny, nx), dtype=np.uint32)
+        pixeldq[:4, :] = pixeldq[-4:, :] = pixeldq[:, :4] = pixeldq[:, -4:] = 2**31 + 512
+
+        uncal = os.path.join(program_directory, rootname + '_uncal.fits')
+        write_file(uncal, ramp, nx, ny, pixeldq=pixeldq)
+        rate_file = os.path.join(program_directory, rootname + '_rate.fits')
+        write_file(rate_file, rate, nx, ny)
+        return uncal, rate_file
+
+    for detector in SWA_DETECTORS:
+        uncal, rate_file = write_exposure(SWA_ROOTNAME.format(detector))
+        files['swa_uncal'].append(uncal)
+        files['swa_rate'].append(rate_file)
+    files['niriss_uncal'], _ = write_exposure(NIRISS_ROOTNAME)
+
+    # Stage 3 mosaics have a rotated footprint with NaNs outside of it
+    i2d_size = size['i2d']
+    y, x = np.mgrid[:i2d_size, :i2d_size] - i2d_size / 2
+    mosaic = rng.gamma(2., 20., size=(i2d_size, i2d_size)).astype(np.float32)
+    mosaic[np.abs(x + y) + np.abs(x - y) > 1.2 * i2d_size] = np.nan
+    files['i2d'] = os.path.join(program_directory, I2D_FILENAME)
+    write_file(files['i2d'], mosaic, i2d_size, i2d_size)
+
+    return files
+
+
+def get_commit():
+    """Return the hash of the current git commit of ``jwql``, or
+    ``unknown`` if it cannot be found."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def get_peak_rss():
+    """Return the peak RSS of this process so far, in MB."""
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss /= 1024
+
+    return peak_rss / 1024
+
+
+def reset_directory(directory):
+    """Remove and recreate ``directory``, returning its path."""
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    return directory
+
+
+def run_benchmark(name, files, directories):
+    """Run a single benchmark and measure it. This is run in a new
+    process for each run of each benchmark.
+
+    Parameters
+    ----------
+    name : str
+        Name of the benchmark in ``BENCHMARKS``
+
+    files : dict
+        Paths of the synthetic files, from ``create_synthetic_files``
+
+    directories : dict
+        The ``filesystem``, ``preview_image_filesystem``,
+        ``thumbnail_filesystem`` and ``work`` directories
+
+    Returns
+    -------
+    result : dict
+        The ``wall`` and ``cpu`` time of the benchmark, in seconds,
+        the peak RSS of the process running it, in MB, and the
+        ``baseline_rss_mb`` of the process before the benchmark
+    """
+    baseline_rss = get_peak_rss()
+    benchmark = BENCHMARKS[name](files, directories)
+    next(benchmark)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in benchmark:
+        pass
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    return {'wall': wall, 'cpu': cpu, 'peak_rss_mb': get_peak_rss(), 'baseline_rss_mb': baseline_rss}
+
+
+def run_benchmarks(names=None, size='full', repeat=3, directory=None):
+    """Create the synthetic files and run the benchmarks.
+
+    Parameters
+    ----------
+    names : list
+        Names of the benchmarks to run. All benchmarks are run if
+        ``None``.
+
+    size : str
+        Size of the synthetic data, a key of ``SIZES``
+
+    repeat : int
+        Number of times to run each benchmark
+
+    directory : str
+        Directory in which to write the synthetic files and outputs.
+        A temporary directory, removed afterwards, is used if ``None``.
+
+    Returns
+    -------
+    results : dict
+        The ``commit``, ``date``, ``size``, ``platform`` and version
+        information of the run, and a ``benchmarks`` dictionary with
+        the ``wall`` and ``cpu`` times of each run of each benchmark,
+        the largest ``peak_rss_mb``, and the ``baseline_rss_mb`` of
+        the process after importing ``jwql``
+    """
+    if names is None:
+        names = list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError('Unknown benchmark {}. Options are {}.'.format(name, list(BENCHMARKS)))
+
+    temporary_directory = None
+    if directory is None:
+        temporary_directory = tempfile.mkdtemp(prefix='jwql_benchmarks_')
+        directory = temporary_directory
+
+    directories = {'filesystem': os.path.join(directory, 'filesystem'),
+                   'preview_image_filesystem': os.path.join(directory, 'preview_images'),
+                   'thumbnail_filesystem': os.path.join(directory, 'thumbnails'),
+                   'work': os.path.join(directory, 'work')}
+
+    results = {'commit': get_commit(),
+               'date': datetime.datetime.now().isoformat(timespec='seconds'),
+               'size': size,
+               'platform': platform.platform(),
+               'python': platform.python_version(),
+               'numpy': np.__version__,
+               'cpus': os.cpu_count(),
+               'benchmarks': {}}
+
+    try:
+        files = create_synthetic_files(directories['filesystem'], SIZES[size])
+
+        # Use a new process for each run, so that the peak RSS is that of
+        # the benchmark alone
+        context = multiprocessing.get_context('spawn')
+        for name in names:
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    runs.append(executor.submit(run_benchmark, name, files, directories).result())
+            results['benchmarks'][name] = {'wall': [run['wall'] for run in runs],
+                                           'cpu': [run['cpu'] for run in runs],
+                                           'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+                                           'baseline_rss_mb': min(run['baseline_rss_mb'] for run in runs)}
+            print('{:<20s} wall {:8.3f} s  cpu {:8.3f} s  peak RSS {:8.1f} MB'.format(
+                name, min(results['benchmarks'][name]['wall']), min(results['benchmarks'][name]['cpu']),
+                results['benchmarks'][name]['peak_rss_mb']))
+    finally:
+        if temporary_directory is not None:
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    return results
+
+
+def write_file(filename, data, nx, ny, pixeldq=None):
+    """Write ``data`` to the ``SCI`` extension of a fits file, with the
+    subarray keywords of a full frame exposure in the primary header
+    and an optional ``PIXELDQ`` extension."""
+    primary = fits.PrimaryHDU()
+    primary.header['SUBSTRT1'] = 1
+    primary.header['SUBSTRT2'] = 1
+    primary.header['SUBSIZE1'] = nx
+    primary.header['SUBSIZE2'] = ny
+    hdulist = fits.HDUList([primary, fits.ImageHDU(data, name='SCI')])
+    if pixeldq is not None:
+        hdulist.append(fits.ImageHDU(pixeldq, name='PIXELDQ'))
+    hdulist.writeto(filename, overwrite=True)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark the preview image pipeline on synthetic files.')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS),
+                        help='Benchmarks to run. Default is all of them.')
+    parser.add_argument('--size', choices=list(SIZES), default='full',
+                        help='Size of the synthetic files')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of times to run each benchmark')
+    parser.add_argument('--directory',
+                        help='Directory for the synthetic files. Default is a temporary directory.')
+    parser.add_argument('--output',
+                        help='JSON file in which to save the results')
+    parser.add_argument('--compare',
+                        help='JSON file of previous results to compare with')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Ratio to previous wall time or peak RSS counted as a regression')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.benchmarks, size=args.size, repeat=args.repeat, directory=args.directory)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare_results(results, previous, threshold=args.threshold):
+            sys.exit(1)
@@ -0,0 +1,49 @@
+#! /usr/bin/env python
+
+"""Fixtures shared by the tests of ``jwql``.
+
+Authors
+-------
+
+    - Matthew Bourque
+
+Use
+---
+
+    The fixtures are found by ``pytest`` and are used by naming them as
+    arguments of a test, for example:
+
+    ::
+
+        def test_filesystem_index(store_engine):
+            index = FilesystemIndex(store_engine)
+"""
+
+import os
+
+import pytest
+from sqlalchemy import create_engine
+
+
+@pytest.fixture
+def store_engine(tmp_path):
+    """Return the engine of a ``sqlite`` database in ``tmp_path`` that
+    has the tables of the stores of ``database_interface``, for testing
+    the stores without the ``jwqldb`` database.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+
+    Returns
+    -------
+    engine : obj
+        The ``SQLAlchemy`` engine of the test database
+    """
+    from jwql.database.database_interface import base, STORE_TABLES
+
+    engine = create_engine('sqlite:///{}'.format(os.path.join(tmp_path, 'jwqldb.sqlite')))
+    base.metadata.create_all(engine, tables=STORE_TABLES)
+    yield engine
+    engine.dispose()
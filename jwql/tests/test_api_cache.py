@@ -0,0 +1,47 @@
+#! /usr/bin/env python
+
+"""Tests for the ``api_cache`` module.
+
+Authors
+-------
+
+    - Matthew Bourque
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_api_cache.py
+"""
+
+from jwql.utils.api_cache import ApiCache
+
+
+def test_api_cache(store_engine):
+    """Test that results are returned only for the version they were
+    built from, and that they can be invalidated.
+
+    Parameters
+    ----------
+    store_engine : obj
+        Engine of a test database with the table of the cache
+    """
+    cache = ApiCache(store_engine)
+    thumbnails = ['jw86600008001_02101_00007_guider2_rate_integ0.thumb']
+    cache.set('thumbnails_by_proposal', '86600', '1-100.0', thumbnails)
+    cache.set('thumbnails_by_proposal', '00308', '1-100.0', [])
+    cache.set('all_proposals', '', '1-100.0', ['00308', '86600'])
+
+    assert cache.get('thumbnails_by_proposal', '86600', '1-100.0') == thumbnails
+    assert cache.get('thumbnails_by_proposal', '86600', '2-200.0') is None
+    assert cache.get('thumbnails_by_proposal', '00001', '1-100.0') is None
+
+    assert cache.invalidate('thumbnails_by_proposal', '86600') == 1
+    assert cache.get('thumbnails_by_proposal', '86600', '1-100.0') is None
+    assert cache.invalidate('thumbnails_by_proposal') == 1
+    assert cache.invalidate() == 1
+    cache.close()
@@ -25,9 +25,22 @@ from urllib import request, error
 
 import pytest
 
+from jwql.utils.api_cache import ApiCache
 from jwql.utils.utils import get_base_url
 from jwql.utils.constants import JWST_INSTRUMENT_NAMES
 
+# The views can only be called once the web application is set up,
+# which requires a config file
+try:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jwql.website.jwql_proj.settings')
+    import django
+    from django.test import RequestFactory
+    django.setup()
+    from jwql.website.apps.jwql import api_views
+    DJANGO_SETUP = True
+except Exception:
+    DJANGO_SETUP = False
+
 # Determine if tests are being run on jenkins
 ON_JENKINS = '/home/jenkins' in os.path.expanduser('~')
 
@@ -111,3 +124,135 @@ def test_api_views(url):
     except (http.client.IncompleteRead) as e:
         data = e.partial
         assert len(data) > 0
+
+
+# Filenames of the pages built by ``_paginated_response``
+FILENAMES = ['jw86600008001_02101_0000{}_guider2_rate_integ0.jpg'.format(exposure) for exposure in range(1, 6)]
+
+
+@pytest.fixture
+def paginated(store_engine, monkeypatch):
+    """Return a function that calls ``_paginated_response`` with the
+    query parameters and headers of a request, for data built from
+    ``FILENAMES`` at the current ``version``, using an API cache in a
+    test database.
+
+    Parameters
+    ----------
+    store_engine : obj
+        Engine of a test database with the table of the cache
+    monkeypatch : _pytest.monkeypatch.MonkeyPatch
+        Used to replace the API cache of the views
+    """
+    monkeypatch.setattr(api_views, 'open_api_cache', lambda: ApiCache(store_engine))
+    state = {'version': ('1-100.0', 100.0), 'builds': 0}
+
+    def build():
+        state['builds'] += 1
+        return list(reversed(FILENAMES))
+
+    def paginated_response(params=None, describe=api_views._file_fields, **headers):
+        request = RequestFactory().get('/api/86600/preview_images/', params or {}, **headers)
+        return api_views._paginated_response(request, 'preview_images_by_proposal', '86600', 'preview_images',
+                                             lambda: state['version'], build, describe)
+
+    paginated_response.state = state
+    return paginated_response
+
+
+@pytest.mark.skipif(not DJANGO_SETUP, reason='Requires the web application settings.')
+def test_paginated_response_cursor(paginated):
+    """Test that following the ``next`` cursors returns every item once,
+    sorted, building the data only once.
+
+    Parameters
+    ----------
+    paginated : function
+        Calls ``_paginated_response`` with a request
+    """
+    items = []
+    params = {'limit': 2}
+    while True:
+        response = paginated(params)
+        assert response.status_code == 200
+        assert 'ETag' in response
+        assert 'Last-Modified' in response
+        data = json.loads(response.content)
+        assert data['count'] == len(FILENAMES)
+        assert len(data['preview_images']) <= 2
+        items += data['preview_images']
+        if data['next'] is None:
+            break
+        params['cursor'] = data['next']
+
+    assert items == FILENAMES
+    assert paginated.state['builds'] == 1
+
+
+@pytest.mark.skipif(not DJANGO_SETUP, reason='Requires the web application settings.')
+def test_paginated_response_not_modified(paginated):
+    """Test that conditional requests for the current version get a
+    ``304`` response without building the data, and that requests for
+    an older version get the data.
+
+    Parameters
+    ----------
+    paginated : function
+        Calls ``_paginated_response`` with a request
+    """
+    response = paginated()
+    etag, last_modified = response['ETag'], response['Last-Modified']
+
+    for headers in [{'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': last_modified}]:
+        not_modified = paginated(**headers)
+        assert not_modified.status_code == 304
+        assert not_modified['ETag'] == etag
+    assert paginated.state['builds'] == 1
+
+    paginated.state['version'] = ('2-200.0', 200.0)
+    for headers in [{'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': last_modified}]:
+        response = paginated(**headers)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+
+@pytest.mark.skipif(not DJANGO_SETUP, reason='Requires the web application settings.')
+@pytest.mark.parametrize('params, describe', [({'limit': 0}, True),
+                                              ({'limit': 'ten'}, True),
+                                              ({'limit': 10001}, True),
+                                              ({'cursor': '!!!'}, True),
+                                              ({'cursor': ''}, True),
+                                              ({'fields': 'rootname,colour'}, True),
+                                              ({'fields': 'rootname'}, False)])
+def test_paginated_response_bad_request(paginated, params, describe):
+    """Test that invalid query parameters get a ``400`` response
+    without building the data.
+
+    Parameters
+    ----------
+    paginated : function
+        Calls ``_paginated_response`` with a request
+    params : dict
+        The invalid query parameters
+    describe : bool
+        Whether field selection is available
+    """
+    response = paginated(params, describe=api_views._file_fields if describe else None)
+    assert response.status_code == 400
+    assert 'error' in json.loads(response.content)
+    assert paginated.state['builds'] == 0
+
+
+@pytest.mark.skipif(not DJANGO_SETUP, reason='Requires the web application settings.')
+def test_paginated_response_fields(paginated):
+    """Test that only the selected fields of each file are returned.
+
+    Parameters
+    ----------
+    paginated : function
+        Calls ``_paginated_response`` with a request
+    """
+    response = paginated({'fields': 'rootname,suffix', 'limit': 1})
+    data = json.loads(response.content)
+
+    assert data['preview_images'] == [{'rootname': 'jw86600008001_02101_00001_guider2', 'suffix': 'rate'}]
@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+
+"""Tests for the preview image benchmarks in
+``jwql.tests.benchmarks.benchmark_preview_images`` and the load tests
+of the web application in ``jwql.tests.benchmarks.load_test_web_app``.
+
+Authors
+-------
+
+    - Bryan Hilbert
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_benchmarks.py
+"""
+
+import os
+import sys
+
+import pytest
+
+from jwql.tests.benchmarks import load_test_web_app
+from jwql.tests.benchmarks.benchmark_preview_images import SIZES, compare_results, create_synthetic_files, run_benchmark
+from jwql.utils import utils
+
+# Determine if tests are being run on jenkins
+ON_JENKINS = '/home/jenkins' in os.path.expanduser('~')
+
+
+@pytest.fixture
+def restore_settings():
+    """Restore the settings and modules that the load test configures,
+    should it change them in this process rather than its own."""
+    get_config = utils.get_config
+    environ = dict(os.environ)
+    imported = [name for name in load_test_web_app.CONFIGURED_MODULES if name in sys.modules]
+    try:
+        yield
+    finally:
+        utils.get_config = get_config
+        os.environ.clear()
+        os.environ.update(environ)
+        for name in load_test_web_app.CONFIGURED_MODULES:
+            if name not in imported:
+                sys.modules.pop(name, None)
+
+
+def test_run_benchmark(tmp_path):
+    """Test that benchmarks run on the synthetic files and are measured.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    """
+    directories = {'filesystem': os.path.join(tmp_path, 'filesystem'),
+                   'work': os.path.join(tmp_path, 'work')}
+    files = create_synthetic_files(directories['filesystem'], SIZES['small'])
+    assert len(files['swa_uncal']) == 4
+    assert all(os.path.isfile(filename) for filename in files['swa_uncal'] + files['swa_rate'] + [files['i2d']])
+
+    results = {'commit': 'test', 'date': 'today', 'benchmarks': {}}
+    for name in ['find_limits', 'create_mosaic']:
+        result = run_benchmark(name, files, directories)
+        assert result['wall'] >= 0
+        assert result['cpu'] >= 0
+        assert result['peak_rss_mb'] >= result['baseline_rss_mb'] > 0
+        results['benchmarks'][name] = {'wall': [result['wall']], 'cpu': [result['cpu']],
+                                       'peak_rss_mb': result['peak_rss_mb']}
+
+    # A run is not a regression of itself
+    assert compare_results(results, results) == []
+
+
+@pytest.mark.skipif(ON_JENKINS, reason='Requires the web application and its dependencies.')
+def test_run_load_test(tmp_path, restore_settings):
+    """Test that views of the web application are requested on the
+    synthetic data and measured.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+
+    restore_settings : None
+        Fixture that restores the settings changed by the load test
+    """
+    names = ['home', 'archive_ajax', 'bias_monitor', 'export', 'jwqldb_table_ajax']
+    results = load_test_web_app.run_load_test(names, size='small', requests=4, clients=2, directory=str(tmp_path))
+    assert list(results['views']) == names
+    for view in results['views'].values():
+        assert view['errors'] == 0
+        assert view['requests'] == 4
+        assert 0 <= view['p50'] <= view['p95'] <= view['p99']
+        assert view['bytes'] > 0
+
+    # The monitor, the export and the table viewer read the seeded
+    # tables
+    for name in ['bias_monitor', 'export', 'jwqldb_table_ajax']:
+        assert results['views'][name]['queries'] > 0
+
+    # A run is not a regression of itself
+    assert load_test_web_app.compare_results(results, results) == []
@@ -22,6 +22,41 @@ import numpy as np
 from jwql.utils import calculations
 
 
+def test_clipped_limits():
+    """Test that the selection-based clipping limits match the limits
+    found by sorting the data, and that the subsampled limits are within
+    the requested error"""
+
+    random = np.random.RandomState(seed=1)
+    image = random.lognormal(mean=3., sigma=1., size=(512, 512))
+    mask = np.ones(image.shape, dtype=bool)
+    mask[0:4, :] = False
+    mask[:, -4:] = False
+    clip_fraction = 0.01
+
+    # Limits as found by sorting all of the science pixels
+    nelem = np.sum(mask)
+    numclip = int(clip_fraction * nelem)
+    sorted_values = np.sort(image[mask])
+    expected = (sorted_values[numclip], sorted_values[-numclip - 1])
+
+    minval, maxval = calculations.clipped_limits(image, mask, clip_fraction)
+    assert (minval, maxval) == expected
+
+    # Subsampled limits are deterministic and have ranks within the error
+    max_error = 0.002
+    minval, maxval = calculations.clipped_limits(image, mask, clip_fraction, max_error=max_error)
+    assert (minval, maxval) == calculations.clipped_limits(image, mask, clip_fraction, max_error=max_error)
+    lower_rank = np.searchsorted(sorted_values, minval) / nelem
+    upper_rank = np.searchsorted(sorted_values, maxval) / nelem
+    assert np.isclose(lower_rank, clip_fraction, atol=max_error, rtol=0.)
+    assert np.isclose(upper_rank, 1. - clip_fraction, atol=max_error, rtol=0.)
+
+    # Without clipping the limits are the extrema
+    minval, maxval = calculations.clipped_limits(image, mask, 0., max_error=max_error)
+    assert (minval, maxval) == (sorted_values[0], sorted_values[-1])
+
+
 def test_double_gaussian_fit():
     """Test the double Gaussian fitting function"""
 
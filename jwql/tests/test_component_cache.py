@@ -0,0 +1,88 @@
+#! /usr/bin/env python
+
+"""Tests for the ``component_cache`` module.
+
+Authors
+-------
+
+    - Gray Kanarek
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_component_cache.py
+"""
+
+import time
+
+from jwql.utils import component_cache
+from jwql.utils.component_cache import ComponentCache
+
+
+class FakeTabs():
+    """A fake builder of the tabs of a monitor page that counts the
+    times it is called."""
+
+    def __init__(self):
+        self.builds = 0
+
+    def __call__(self):
+        self.builds += 1
+        return '<div>{}</div>'.format(self.builds), '<script>{}</script>'.format(self.builds)
+
+
+def test_component_cache(store_engine):
+    """Test that components are stored by monitor and instrument.
+
+    Parameters
+    ----------
+    store_engine : obj
+        Engine of a test database with the table of the cache
+    """
+    with ComponentCache(store_engine) as cache:
+        assert cache.get('dark_monitor', 'NIRCam') is None
+        cache.set('dark_monitor', 'NIRCam', '2020-01-01T00:00:00', '<div>', '<script>')
+        cached = cache.get('dark_monitor', 'nircam')
+        assert cached['version'] == '2020-01-01T00:00:00'
+        assert (cached['div'], cached['script']) == ('<div>', '<script>')
+        assert cache.get('bias_monitor', 'NIRCam') is None
+
+        cache.clear()
+        assert cache.get('dark_monitor', 'NIRCam') is None
+
+
+def test_get_components(store_engine, monkeypatch):
+    """Test that cached components are returned at once, and are built
+    again in the background when the version changes.
+
+    Parameters
+    ----------
+    store_engine : obj
+        Engine of a test database with the table of the cache
+    monkeypatch : _pytest.monkeypatch.MonkeyPatch
+        Used to open the cache in the test database
+    """
+    monkeypatch.setattr(component_cache, 'open_component_cache', lambda: ComponentCache(store_engine))
+    build = FakeTabs()
+    first = ('<div>1</div>', '<script>1</script>')
+
+    # The first request builds the components
+    assert component_cache.get_components('dark_monitor', 'NIRCam', 'v1', build) == first
+    assert component_cache.get_components('dark_monitor', 'NIRCam', 'v1', build) == first
+    assert build.builds == 1
+
+    # New results return the cached components while they are rebuilt
+    assert component_cache.get_components('dark_monitor', 'NIRCam', 'v2', build) == first
+    for _ in range(100):
+        with ComponentCache(store_engine) as cache:
+            if cache.get('dark_monitor', 'NIRCam')['version'] == 'v2':
+                break
+        time.sleep(0.01)
+    second = ('<div>2</div>', '<script>2</script>')
+    assert component_cache.get_components('dark_monitor', 'NIRCam', 'v2', build) == second
+    assert build.builds == 2
@@ -19,10 +19,12 @@ Use
         pytest -s test_data_containers.py
 """
 
+import datetime
 import glob
 import os
 
 import pytest
+from sqlalchemy import create_engine
 
 # Skip testing this module if on Jenkins
 ON_JENKINS = '/home/jenkins' in os.path.expanduser('~')
@@ -137,6 +139,57 @@ def test_get_preview_images_by_instrument():
     assert len(preview_images) > 0
 
 
+@pytest.mark.skipif(ON_JENKINS, reason='Requires access to central storage.')
+def test_get_jwqldb_table_page():
+    """Tests the ``get_jwqldb_table_page`` function."""
+
+    page = data_containers.get_jwqldb_table_page('filesystem_general', start=1, length=2,
+                                                 order_column='date', order_direction='desc')
+    assert page['columns'][0] == 'id'
+    assert len(page['rows']) == 2
+    assert page['rows'][0][page['columns'].index('date')] >= page['rows'][1][page['columns'].index('date')]
+    assert page['records_filtered'] == page['records_total']
+
+    filtered = data_containers.get_jwqldb_table_page('filesystem_general', filters={'id': '1'})
+    assert filtered['records_filtered'] <= filtered['records_total']
+    assert all('1' in str(row[0]) for row in filtered['rows'])
+
+
+def test_get_jwqldb_table_page_sqlite(monkeypatch):
+    """Tests the ``get_jwqldb_table_page`` function on a table in an
+    in-memory ``sqlite`` database, without the development database.
+    """
+    engine = create_engine('sqlite://')
+    table = data_containers.di.FilesystemGeneral.__table__
+    table.create(engine)
+    rows = [{'id': index + 1, 'date': datetime.datetime(2021, 1, 1 + index), 'total_file_count': 10 * index,
+             'total_file_size': 1., 'fits_file_count': index, 'fits_file_size': 1., 'used': 1., 'available': 1.}
+            for index in range(5)]
+    with engine.begin() as connection:
+        connection.execute(table.insert(), rows)
+    monkeypatch.setattr(data_containers.di, 'engine', engine)
+
+    page = data_containers.get_jwqldb_table_page('filesystem_general', start=1, length=2,
+                                                 order_column='date', order_direction='desc')
+    assert page['columns'][:3] == ['id', 'date', 'total_file_count']
+    assert [row[0] for row in page['rows']] == [4, 3]
+    assert page['records_total'] == 5
+    assert page['records_filtered'] == 5
+
+    filtered = data_containers.get_jwqldb_table_page('filesystem_general', filters={'total_file_count': '4'},
+                                                     search='2021')
+    assert [row[0] for row in filtered['rows']] == [5]
+    assert filtered['records_total'] == 5
+    assert filtered['records_filtered'] == 1
+
+    # Wildcards in the search are matched literally
+    for search in ['%', '_', '\\']:
+        assert data_containers.get_jwqldb_table_page('filesystem_general', search=search)['records_filtered'] == 0
+
+    with pytest.raises(ValueError):
+        data_containers.get_jwqldb_table_page('filesystem_general', order_column='not_a_column')
+
+
 @pytest.mark.skipif(ON_JENKINS, reason='Requires access to central storage.')
 def test_get_preview_images_by_proposal():
     """Tests the ``get_preview_images_by_proposal`` function."""
@@ -196,6 +249,29 @@ def test_get_thumbnails_by_rootname():
     assert len(preview_images) > 0
 
 
+@pytest.mark.skipif(ON_JENKINS, reason='Requires access to central storage.')
+def test_parquet_export_available():
+    """Tests that Parquet export is available only when ``pyarrow`` is
+    installed."""
+
+    try:
+        import pyarrow
+        installed = True
+    except ImportError:
+        installed = False
+
+    assert data_containers.parquet_export_available() == installed
+
+
+@pytest.mark.skipif(ON_JENKINS, reason='Requires access to central storage.')
+def test_stream_table_csv():
+    """Tests the ``stream_table_csv`` function."""
+
+    chunks = list(data_containers.stream_table_csv('filesystem_general', chunksize=10))
+    assert chunks[0].startswith('id,')
+    assert len(chunks) > 1
+
+
 @pytest.mark.skipif(ON_JENKINS, reason='Requires access to central storage.')
 def test_thumbnails_ajax():
     """Tests the ``get_thumbnails_ajax`` function."""
@@ -24,6 +24,8 @@ import pytest
 import random
 import string
 
+from sqlalchemy import create_engine, inspect
+
 from jwql.database import database_interface as di
 from jwql.utils.constants import ANOMALIES_PER_INSTRUMENT
 from jwql.utils.utils import get_config
@@ -91,6 +93,43 @@ def test_anomaly_records():
     assert ghosts.data_frame.iloc[0]['ghost'] == True
 
 
+def test_create_indexes(tmp_path):
+    """Test that the indexes of an existing table that does not have
+    them are created, and that creating them again does nothing"""
+
+    engine = create_engine('sqlite:///{}'.format(tmp_path / 'jwqldb.sqlite'))
+    table = di.FGSAnomaly.__table__
+    table.create(engine)
+    index_name = 'fgs_anomaly_rootname_flag_date_idx'
+    engine.execute('DROP INDEX {}'.format(index_name))
+
+    for _ in range(2):
+        di.create_indexes(engine)
+        indexes = inspect(engine).get_indexes('fgs_anomaly')
+        assert [(index['name'], index['column_names']) for index in indexes] == \
+            [(index_name, ['rootname', 'flag_date'])]
+
+
+@pytest.mark.skipif(ON_JENKINS, reason='Requires access to development database server.')
+def test_get_current_anomalies():
+    """Test that the most recently flagged anomalies of each rootname
+    are returned, in order of rootname"""
+
+    rootnames = ['jw00000{}_02101_00001_guider1'.format(''.join(
+        random.SystemRandom().choice(string.digits) for _ in range(6))) for _ in range(2)]
+    today = datetime.datetime.today()
+    di.session.add(di.FGSAnomaly(rootname=rootnames[0], flag_date=today - datetime.timedelta(days=1),
+                                 user='test', ghost=True))
+    di.session.add(di.FGSAnomaly(rootname=rootnames[0], flag_date=today, user='test', crosstalk=True))
+    di.session.commit()
+
+    current_anomalies = di.get_current_anomalies(rootnames)
+    assert list(current_anomalies) == sorted(rootnames)
+    assert current_anomalies[rootnames[0]] == ['crosstalk']
+    assert current_anomalies[rootnames[1]] == []
+    assert di.get_current_anomalies(rootnames[:1], 'FGS') == {rootnames[0]: ['crosstalk']}
+
+
 @pytest.mark.skipif(ON_JENKINS, reason='Requires access to development database server.')
 def test_load_connections():
     """Test to see that a connection to the database can be
@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+
+"""Tests for the ``downsample`` module.
+
+Authors
+-------
+
+    - Joe Filippazzo
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_downsample.py
+"""
+
+import numpy as np
+import pytest
+
+from jwql.utils.downsample import downsample, lttb, min_max
+
+
+@pytest.mark.parametrize('method', ['lttb', 'min_max'])
+def test_downsample(method):
+    """Test that a long series is reduced to about the requested number
+    of points, keeping its extremes, its ends and its gaps.
+
+    Parameters
+    ----------
+    method : str
+        The downsampling method
+    """
+    x = np.arange(100000, dtype=float)
+    y = np.sin(x / 1000.)
+    y[30000] = 50.
+    y[60000] = -50.
+    y[70000:70010] = np.nan
+    x[80000:] += 10000.
+
+    indices = downsample(x, y, 1000, method=method)
+
+    assert np.all(np.diff(indices) > 0)
+    assert 900 < len(indices) < 1200
+    for index in [0, 30000, 60000, 69999, 70010, 79999, 80000, 99999]:
+        assert index in indices
+    assert np.all(np.isin(np.arange(70000, 70010), indices))
+
+
+def test_downsample_datetimes():
+    """Test that series of datetimes can be downsampled."""
+
+    x = np.datetime64('2020-01-01') + np.arange(10000) * np.timedelta64(1, 'm')
+    indices = downsample(list(x.astype(object)), np.random.random(10000), 100)
+    assert 90 < len(indices) < 120
+
+
+def test_downsample_short():
+    """Test that a series shorter than the requested number of points
+    is kept whole, and that an unknown method is rejected."""
+
+    assert np.all(downsample([1, 2, 3], [4, 5, 6], 10) == [0, 1, 2])
+    with pytest.raises(ValueError):
+        downsample(np.arange(100), np.arange(100), 10, method='mean')
+
+
+def test_lttb():
+    """Test that LTTB keeps the requested number of points, including
+    the ends and a spike."""
+
+    y = np.zeros(10000)
+    y[5000] = 1.
+    indices = lttb(np.arange(10000), y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert 5000 in indices
+
+
+def test_min_max():
+    """Test that the smallest and largest values of each bucket are
+    kept."""
+
+    y = np.random.random(10000)
+    indices = min_max(np.arange(10000), y, 100)
+    for bucket in np.split(np.arange(10000), 50):
+        assert bucket[np.argmin(y[bucket])] in indices
+        assert bucket[np.argmax(y[bucket])] in indices
@@ -0,0 +1,183 @@
+#! /usr/bin/env python
+
+"""Tests for the ``filesystem_index`` module.
+
+Authors
+-------
+
+    - Matthew Bourque
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_filesystem_index.py
+"""
+
+import os
+
+from jwql.utils.filesystem_index import FilesystemIndex, parse_index_filename
+
+
+def make_files(directory, filenames):
+    """Create empty files in ``directory``, making it if needed."""
+    os.makedirs(directory, exist_ok=True)
+    for filename in filenames:
+        open(os.path.join(directory, filename), 'w').close()
+
+
+def test_filesystem_index(tmp_path, store_engine):
+    """Test that the index finds files by category, program,
+    instrument, prefix and suffix, and that unchanged directories are
+    not scanned again.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    store_engine : obj
+        Engine of a test database with the tables of the index
+    """
+    filesystem = os.path.join(tmp_path, 'filesystem')
+    preview_images = os.path.join(tmp_path, 'preview_images')
+    make_files(os.path.join(filesystem, 'jw86600'),
+               ['jw86600008001_02101_00007_guider2_uncal.fits',
+                'jw86600008001_02101_00007_guider2_rate.fits',
+                'jw86600008001_02101_00008_guider2_rate.fits',
+                'notes.txt'])
+    make_files(os.path.join(filesystem, 'jw00001'),
+               ['jw00001001001_01101_00001_nrca1_rate.fits'])
+    make_files(os.path.join(preview_images, 'jw86600'),
+               ['jw86600008001_02101_00007_guider2_rate_integ0.jpg',
+                'jw86600008001_02101_00007_guider2_rate_integ1.jpg'])
+
+    index = FilesystemIndex(store_engine)
+    assert index.last_update() is None
+    assert index.update([filesystem, preview_images]) == 3
+    assert index.last_update() is not None
+    assert index.programs() == ['00001', '86600']
+
+    rootname = 'jw86600008001_02101_00007_guider2'
+    assert index.count('fits') == 4
+    assert index.files('fits', prefix=rootname) == [
+        os.path.join(filesystem, 'jw86600', rootname + '_rate.fits'),
+        os.path.join(filesystem, 'jw86600', rootname + '_uncal.fits')]
+    assert index.count('fits', program='86600', suffixes=['rate']) == 2
+    assert index.count('fits', instrument='NIRCam') == 1
+    assert index.count('fits', instrument='FGS') == 3
+    assert index.count('preview', prefix=rootname + '_rate_integ') == 2
+    assert index.count('thumbnail') == 0
+
+    # Unchanged directories are skipped
+    assert index.update([filesystem, preview_images]) == 0
+
+    # New and removed files are found when their directory changes
+    os.remove(os.path.join(preview_images, 'jw86600', rootname + '_rate_integ1.jpg'))
+    make_files(os.path.join(preview_images, 'jw86600'), [rootname + '_uncal_integ0.jpg'])
+    assert index.update_directory(os.path.join(preview_images, 'jw86600'))
+    assert index.count('preview', prefix=rootname + '_rate_integ') == 1
+    assert index.count('preview', prefix=rootname + '_uncal_integ') == 1
+
+    # Removed directories are forgotten
+    os.remove(os.path.join(filesystem, 'jw00001', 'jw00001001001_01101_00001_nrca1_rate.fits'))
+    os.rmdir(os.path.join(filesystem, 'jw00001'))
+    index.update([filesystem, preview_images])
+    assert index.programs() == ['86600']
+
+    # Filenames are matched literally
+    assert index.count('fits', prefix='jw86600008001_02101_0000%') == 0
+    assert index.count('fits', prefix='jw86600008001_02101_0000_') == 0
+    index.close()
+
+
+def test_proposal_summaries(tmp_path, store_engine):
+    """Test that the summaries of proposals follow the files of each
+    program as directories are scanned.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    store_engine : obj
+        Engine of a test database with the tables of the index
+    """
+    filesystem = os.path.join(tmp_path, 'filesystem')
+    thumbnails = os.path.join(tmp_path, 'thumbnails')
+    make_files(os.path.join(filesystem, 'jw86600'),
+               ['jw86600008001_02101_00007_guider2_uncal.fits',
+                'jw86600008001_02101_00007_guider2_rate.fits',
+                'jw86600009001_02101_00001_guider1_rate.fits'])
+    make_files(os.path.join(thumbnails, 'jw86600'),
+               ['jw86600009001_02101_00001_guider1_rate_integ0.thumb',
+                'jw86600008001_02101_00007_guider2_rate_integ0.thumb',
+                'jw86600008001_02101_00007_guider2_uncal_integ0.thumb'])
+
+    index = FilesystemIndex(store_engine)
+    index.update([filesystem, thumbnails])
+    summaries = index.proposals('FGS')
+    assert len(summaries) == 1
+    assert summaries[0]['program'] == '86600'
+    assert summaries[0]['num_files'] == 3
+    assert summaries[0]['num_observations'] == 2
+    assert summaries[0]['thumbnail'] == 'jw86600/jw86600008001_02101_00007_guider2_rate_integ0.thumb'
+    assert index.proposals('NIRCam') == []
+
+    # Only the programs of changed directories are summarized again
+    make_files(os.path.join(filesystem, 'jw00001'), ['jw00001001001_01101_00001_nrca1_rate.fits'])
+    index.update([filesystem, thumbnails])
+    assert index.proposals('FGS')[0]['updated'] == summaries[0]['updated']
+    assert [summary['program'] for summary in index.proposals('NIRCam')] == ['00001']
+
+    os.remove(os.path.join(filesystem, 'jw86600', 'jw86600009001_02101_00001_guider1_rate.fits'))
+    index.update([filesystem, thumbnails])
+    assert index.proposals('FGS')[0]['num_files'] == 2
+    assert index.proposals('FGS')[0]['num_observations'] == 1
+    index.close()
+
+
+def test_parse_index_filename():
+    """Test that files are categorised and their rootnames and suffixes
+    are found."""
+
+    assert parse_index_filename('jw86600008001_02101_00007_guider2_uncal_integ0.jpg') == \
+        ('preview', '86600', 'fgs', 'jw86600008001_02101_00007_guider2', 'uncal')
+    assert parse_index_filename('jw00001001001_01101_00001_nrca1_rateints.fits') == \
+        ('fits', '00001', 'nircam', 'jw00001001001_01101_00001_nrca1', 'rateints')
+    assert parse_index_filename('jw00001001001_01101_00001_NRC_SWA_MOSAIC_rate_integ0_tiles.json') == \
+        ('tiles', '00001', 'nircam', 'jw00001001001_01101_00001_NRC_SWA_MOSAIC', 'rate')
+    assert parse_index_filename('jw00001001001_01101_00001_nrca1_rate_integ0.thumb')[0] == 'thumbnail'
+    assert parse_index_filename('preview_manifest.db') is None
+
+
+def test_index_version(tmp_path, store_engine):
+    """Test that the version of the index changes only when files are
+    added or removed.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    store_engine : obj
+        Engine of a test database with the tables of the index
+    """
+    filesystem = os.path.join(tmp_path, 'filesystem')
+    make_files(os.path.join(filesystem, 'jw86600'), ['jw86600008001_02101_00007_guider2_rate.fits'])
+
+    index = FilesystemIndex(store_engine)
+    assert index.version()[1] is None
+    index.update([filesystem])
+    version, modified = index.version()
+    assert modified is not None
+
+    # Unchanged directories keep the version
+    index.update([filesystem])
+    assert index.version() == (version, modified)
+
+    make_files(os.path.join(filesystem, 'jw86600'), ['jw86600008001_02101_00008_guider2_rate.fits'])
+    index.update_directory(os.path.join(filesystem, 'jw86600'))
+    assert index.version()[0] != version
+    index.close()
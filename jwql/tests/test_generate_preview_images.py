@@ -0,0 +1,142 @@
+#! /usr/bin/env python
+
+"""Tests for the ``generate_preview_images`` module.
+
+Authors
+-------
+
+    - Bryan Hilbert
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_generate_preview_images.py
+"""
+
+import os
+
+from astropy.io import fits
+import numpy as np
+
+from jwql.jwql_monitors.generate_preview_images import create_mosaic, get_difference_frame, group_filenames
+
+
+def write_exposure(filename, data, xstart=1, ystart=1):
+    """Write ``data`` to the ``SCI`` extension of a fits file, with the
+    subarray location in the primary header."""
+    primary = fits.PrimaryHDU()
+    primary.header['SUBSTRT1'] = xstart
+    primary.header['SUBSTRT2'] = ystart
+    primary.header['SUBSIZE1'] = data.shape[-1]
+    primary.header['SUBSIZE2'] = data.shape[-2]
+    fits.HDUList([primary, fits.ImageHDU(data, name='SCI')]).writeto(filename)
+    return filename
+
+
+def test_create_mosaic(tmp_path):
+    """Test that the data from each detector are placed in the mosaic,
+    and that a single integration can be mosaicked.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    """
+    filenames = []
+    for value, detector in enumerate(['nrca1', 'nrca2', 'nrca3', 'nrca4']):
+        data = np.full((2, 2048, 2048), value, dtype=np.float32)
+        data[1] += 10
+        filename = os.path.join(tmp_path, 'jw00001001001_01101_00001_{}_rateints.fits'.format(detector))
+        filenames.append(write_exposure(filename, data))
+
+    mosaic, dq = create_mosaic(filenames)
+    assert mosaic.dtype == np.float32
+    assert mosaic.shape == (2, 2048 * 2 + 145, 2048 * 2 + 145)
+    assert dq.shape == mosaic.shape[1:]
+
+    # NRCA1 is in the lower left, and NRCA4 in the upper right
+    assert np.all(mosaic[0, :2048, :2048] == 0)
+    assert np.all(mosaic[1, -2048:, -2048:] == 13)
+    assert np.all(np.isnan(mosaic[:, 2048:2048 + 145, :]))
+    assert not np.any(dq[2048:2048 + 145, :])
+
+    single, single_dq = create_mosaic(filenames, integration=1)
+    assert single.shape == (1,) + mosaic.shape[1:]
+    assert np.array_equal(single[0], mosaic[1], equal_nan=True)
+    assert np.array_equal(single_dq, dq)
+
+
+def test_get_difference_frame(tmp_path):
+    """Test that the last minus first group is read for an integration
+    of scaled 4D data.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    """
+    data = np.arange(2 * 3 * 4 * 5, dtype=np.uint16).reshape((2, 3, 4, 5)) * 100
+    filename = write_exposure(os.path.join(tmp_path, 'jw00001001001_01101_00001_nrca1_uncal.fits'), data)
+
+    with fits.open(filename) as hdulist:
+        frame = get_difference_frame(hdulist['SCI'], 1)
+
+    assert frame.dtype == np.float32
+    assert np.array_equal(frame, data[1, -1].astype(np.float32) - data[1, 0])
+
+
+def test_group_filenames():
+    """Test that files from the same exposure are grouped, with NIRCam
+    shortwave and longwave detectors grouped separately, and that
+    stage 3 files are kept separate"""
+
+    directory = os.path.join('filesystem', 'jw00001')
+    filenames = ['jw00001001001_01101_00001_nrcb1_rate.fits',
+                 'jw00001001001_01101_00001_nrca1_rate.fits',
+                 'jw00001001001_01101_00001_nrca5_rate.fits',
+                 'jw00001001001_01101_00001_nrcb5_rate.fits',
+                 'jw00001001001_01101_00001_nrca1_uncal.fits',
+                 'jw00001001001_01101_00002_nrca1_rate.fits',
+                 'jw00001001001_01101_00001_nrs1_rate.fits',
+                 'jw00001001001_01101_00001_nrs2_rate.fits',
+                 'jw00001-o001_t001_nircam_f444w_i2d.fits',
+                 'jw00001-o002_t001_nircam_f444w_i2d.fits']
+    filenames = [os.path.join(directory, filename) for filename in filenames]
+
+    expected = [['jw00001-o001_t001_nircam_f444w_i2d.fits'],
+                ['jw00001-o002_t001_nircam_f444w_i2d.fits'],
+                ['jw00001001001_01101_00001_nrca1_rate.fits', 'jw00001001001_01101_00001_nrcb1_rate.fits'],
+                ['jw00001001001_01101_00001_nrca1_uncal.fits'],
+                ['jw00001001001_01101_00001_nrca5_rate.fits', 'jw00001001001_01101_00001_nrcb5_rate.fits'],
+                ['jw00001001001_01101_00001_nrs1_rate.fits'],
+                ['jw00001001001_01101_00001_nrs2_rate.fits'],
+                ['jw00001001001_01101_00002_nrca1_rate.fits']]
+    expected = [[os.path.join(directory, filename) for filename in group] for group in expected]
+
+    assert group_filenames(filenames) == expected
+
+
+def test_group_filenames_many():
+    """Test the grouping of many synthetic filenames of shortwave and
+    longwave detectors. Its speed is measured by the
+    ``group_filenames`` benchmark in ``jwql.tests.benchmarks``."""
+
+    detectors = ['nrca1', 'nrca2', 'nrca3', 'nrca4', 'nrcb1', 'nrcb2', 'nrcb3', 'nrcb4', 'nrca5', 'nrcb5']
+    filenames = []
+    for exposure in range(1000):
+        for detector in detectors:
+            for suffix in ['uncal', 'rate']:
+                filenames.append(os.path.join('filesystem', 'jw00001', 'jw00001001001_01101_{:05d}_{}_{}.fits'.format(
+                    exposure, detector, suffix)))
+
+    grouped = group_filenames(filenames)
+
+    # Shortwave and longwave detectors, for each exposure and suffix
+    assert len(grouped) == 1000 * 2 * 2
+    assert sorted(len(group) for group in grouped) == [2] * 2000 + [8] * 2000
+    assert sorted(filename for group in grouped for filename in group) == sorted(filenames)
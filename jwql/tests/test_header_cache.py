@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+
+"""Tests for the ``header_cache`` module.
+
+Authors
+-------
+
+    - Lauren Chambers
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_header_cache.py
+"""
+
+import os
+
+from astropy.io import fits
+import numpy as np
+
+from jwql.utils.header_cache import HeaderCache, read_headers
+
+
+def write_file(filename, value):
+    """Write a fits file with a primary header and a ``SCI`` extension."""
+    primary = fits.PrimaryHDU()
+    primary.header['TESTKEY'] = value
+    primary.header['COMMENT'] = 'Not recorded'
+    primary.header['HISTORY'] = 'First'
+    primary.header['HISTORY'] = 'Second'
+    sci = fits.ImageHDU(np.zeros((4, 4), dtype=np.float32), name='SCI')
+    fits.HDUList([primary, sci]).writeto(filename, overwrite=True)
+
+
+def test_header_cache(tmp_path, store_engine):
+    """Test that cached headers are returned until the file changes.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    store_engine : obj
+        Engine of a test database with the table of the cache
+    """
+    filename = os.path.join(tmp_path, 'jw00001001001_01101_00001_nrca1_rate.fits')
+    write_file(filename, 1)
+
+    cache = HeaderCache(store_engine)
+    headers = cache.get(filename)
+    assert headers == read_headers(filename)
+    assert headers[0]['values'][headers[0]['keywords'].index('TESTKEY')] == 1
+
+    # The file is not read again while its size and modification time
+    # are unchanged
+    mtime = os.stat(filename).st_mtime_ns
+    write_file(filename, 2)
+    os.utime(filename, ns=(mtime, mtime))
+    assert cache.get(filename) == headers
+
+    # A modified file is read again
+    os.utime(filename, ns=(mtime, mtime + 1))
+    headers = cache.get(filename)
+    assert headers[0]['values'][headers[0]['keywords'].index('TESTKEY')] == 2
+    cache.close()
+
+
+def test_read_headers(tmp_path):
+    """Test that the headers of every extension are read, without
+    ``COMMENT`` cards.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    """
+    filename = os.path.join(tmp_path, 'jw00001001001_01101_00001_nrca1_rate.fits')
+    write_file(filename, 1)
+
+    headers = read_headers(filename)
+    assert [header['EXTNAME'] for header in headers] == ['PRIMARY', 'SCI']
+    assert 'COMMENT' not in headers[0]['keywords']
+    history = [value for keyword, value in zip(headers[0]['keywords'], headers[0]['values'])
+               if keyword == 'HISTORY']
+    assert history == ['First', 'Second']
+    assert headers[1]['values'][headers[1]['keywords'].index('NAXIS1')] == 4
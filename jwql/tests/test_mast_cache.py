@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+
+"""Tests for the ``mast_cache`` module.
+
+Authors
+-------
+
+    - Matthew Bourque
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_mast_cache.py
+"""
+
+import time
+
+import pytest
+
+from jwql.utils.mast_cache import MastCache, cache_key
+
+
+class FakeService():
+    """A fake MAST service that counts its queries."""
+
+    def __init__(self):
+        self.queries = 0
+        self.fail = False
+
+    def __call__(self, service, params):
+        if self.fail:
+            raise ConnectionError('MAST is unavailable')
+        self.queries += 1
+        return {'data': [{'service': service, 'query': self.queries}]}
+
+
+def test_cache_key():
+    """Test that the key does not depend on the order of the
+    parameters."""
+
+    first = cache_key('Mast.Jwst.Filtered.Nircam', {'columns': '*', 'filters': []})
+    second = cache_key('Mast.Jwst.Filtered.Nircam', {'filters': [], 'columns': '*'})
+    assert first == second
+    assert first != cache_key('Mast.Jwst.Filtered.Niriss', {'columns': '*', 'filters': []})
+
+
+def test_mast_cache(store_engine):
+    """Test that results are returned from the cache until they expire,
+    and that the statistics are recorded.
+
+    Parameters
+    ----------
+    store_engine : obj
+        Engine of a test database with the table of the cache
+    """
+    service = FakeService()
+    cache = MastCache(store_engine, service_function=service,
+                      service_ttls={'Mast.Jwst.Filtered': 3600}, default_ttl=0, stale_while_revalidate=0)
+    params = {'columns': 'filename', 'filters': []}
+
+    first = cache.query('Mast.Jwst.Filtered.Nircam', params)
+    assert cache.query('Mast.Jwst.Filtered.Nircam', params) == first
+    assert service.queries == 1
+    assert cache.ttl('Mast.Jwst.Filtered.Nircam') == 3600
+    assert cache.fetched('Mast.Jwst.Filtered.Nircam', params) <= time.time()
+    assert cache.fetched('Mast.Jwst.Filtered.Niriss', params) is None
+
+    # Results of services with no TTL expire at once
+    cache.query('Mast.Caom.Filtered', params)
+    time.sleep(0.01)
+    cache.query('Mast.Caom.Filtered', params)
+    assert service.queries == 3
+
+    statistics = cache.statistics()
+    assert statistics['hits'] == 1
+    assert statistics['misses'] == 3
+    assert statistics['hit_rate'] == 0.25
+
+    # Failed queries are not cached
+    service.fail = True
+    with pytest.raises(ConnectionError):
+        cache.query('Mast.Caom.Filtered', params)
+    assert cache.statistics()['errors'] == 1
+
+    assert cache.size() == 2
+    assert cache.prune() == 1
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_mast_cache_stale_while_revalidate(store_engine):
+    """Test that an expired result is returned while it is fetched again
+    in the background.
+
+    Parameters
+    ----------
+    store_engine : obj
+        Engine of a test database with the table of the cache
+    """
+    service = FakeService()
+    cache = MastCache(store_engine, service_function=service,
+                      service_ttls={}, default_ttl=0, stale_while_revalidate=3600)
+    params = {'columns': 'filename', 'filters': []}
+
+    first = cache.query('Mast.Jwst.Filtered.Nircam', params)
+    time.sleep(0.01)
+    assert cache.query('Mast.Jwst.Filtered.Nircam', params) == first
+    assert cache.statistics()['stale_hits'] == 1
+
+    # Wait for the background query to store the new result
+    for _ in range(100):
+        if service.queries == 2 and not cache._revalidating:
+            break
+        time.sleep(0.05)
+    assert cache.query('Mast.Jwst.Filtered.Nircam', params)['data'][0]['query'] == 2
@@ -17,11 +17,14 @@ Use
         pytest -s test_monitor_mast.py
 """
 
+import threading
+
 from astroquery.mast import Mast
 import pytest
 
 from jwql.jwql_monitors import monitor_mast as mm
 from jwql.utils.constants import JWST_INSTRUMENT_NAMES
+from jwql.utils.query_executor import QueryExecutor
 
 
 def test_astroquery_mast():
@@ -77,3 +80,44 @@ def test_instrument_dataproduct_filtering():
     dps = [row['dataproduct_type'] for row in data['data']]
 
     assert all([i == dp for i in dps])
+
+
+def test_jwst_inventory_concurrent(monkeypatch):
+    """Test that the inventory queries are made in parallel, up to the
+    number of workers of the executor, with a fake MAST service"""
+
+    class FakeService():
+        """Hold each query until another one is made at the same time,
+        or until ``hold`` seconds have passed, and record the most
+        queries made at once"""
+
+        def __init__(self, hold):
+            self.hold = hold
+            self.running = 0
+            self.most_running = 0
+            self.overlapped = threading.Event()
+            self._lock = threading.Lock()
+
+        def __call__(self, service, params):
+            with self._lock:
+                self.running += 1
+                self.most_running = max(self.most_running, self.running)
+                if self.running > 1:
+                    self.overlapped.set()
+            self.overlapped.wait(self.hold)
+            with self._lock:
+                self.running -= 1
+            return {'data': [{'Column1': len(service)}], 'fields': [{'name': 'filename', 'type': 'string'}]}
+
+    service = FakeService(hold=0)
+    monkeypatch.setattr(mm, 'mast_service_request', service)
+    sequential, _ = mm.jwst_inventory(executor=QueryExecutor(max_workers=1))
+    assert service.most_running == 1
+
+    service = FakeService(hold=10)
+    monkeypatch.setattr(mm, 'mast_service_request', service)
+    concurrent, keywords = mm.jwst_inventory(executor=QueryExecutor(max_workers=2))
+    assert service.most_running == 2
+
+    assert concurrent.equals(sequential)
+    assert sorted(keywords) == sorted(JWST_INSTRUMENT_NAMES)
@@ -24,10 +24,12 @@ import re
 import sys
 
 import bokeh
+from bokeh.plotting import figure
+import numpy as np
 from pandas import DataFrame
 import pytest
 
-from jwql.utils.plotting import bar_chart
+from jwql.utils.plotting import bar_chart, downsampled_source
 
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
 JWQL_DIR = __location__.split('tests')[0]
@@ -48,6 +50,26 @@ def test_bar_chart():
     assert str(type(plt)) == "<class 'bokeh.plotting.figure.Figure'>"
 
 
+@pytest.mark.parametrize('length, max_points, full', [(50000, 100000, True), (500000, 20000, False)])
+def test_downsampled_source(length, max_points, full):
+    """Make sure a long series is downsampled, and that the levels of
+    detail sent for zooming are capped at ``max_points``"""
+
+    x = np.arange(length)
+    plot = figure()
+    source = downsampled_source(plot, {'x': x, 'y': np.sin(x / 100.)}, 'x', 'y', n_out=1000,
+                                max_points=max_points)
+
+    assert len(source.data['x']) == 1000
+
+    levels = plot.x_range.js_property_callbacks['change:start'][0].args['levels']
+    sizes = [len(level.data['x']) for level in levels]
+    assert sizes == sorted(sizes)
+    assert sizes[-1] == min(length, max_points)
+    assert all(size <= max_points for size in sizes)
+    assert np.array_equal(levels[-1].data['x'], x) == full
+
+
 def test_bokeh_version():
     """Make sure that the current version of Bokeh matches the version being
     used in all the web app HTML templates.
@@ -0,0 +1,193 @@
+#! /usr/bin/env python
+
+"""Tests for the ``preview_image`` module that run on synthetic FITS
+files, without access to central storage.
+
+Authors
+-------
+
+    - Johannes Sahlmann
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_preview_image_synthetic.py
+"""
+
+import json
+import os
+
+from astropy.io import fits
+import numpy as np
+from PIL import Image
+import matplotlib.pyplot as plt
+
+from jwql.utils import permissions
+from jwql.utils.preview_image import PreviewImage
+
+
+def create_synthetic_ramp(filename, nints=2, ngroups=5, ny=32, nx=32):
+    """Write a small uncal-like FITS file with a 4D ``uint16`` ramp in
+    the ``SCI`` extension and a ``PIXELDQ`` extension.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the FITS file to create
+    nints : int
+        Number of integrations
+    ngroups : int
+        Number of groups per integration
+    ny : int
+        Number of rows
+    nx : int
+        Number of columns
+
+    Returns
+    -------
+    ramp : numpy.ndarray
+        The ramp data written to the ``SCI`` extension
+    pixeldq : numpy.ndarray
+        The data written to the ``PIXELDQ`` extension
+    """
+    ramp = np.arange(nints * ngroups * ny * nx, dtype=np.uint16).reshape((nints, ngroups, ny, nx))
+    pixeldq = np.zeros((ny, nx), dtype=np.uint32)
+    pixeldq[:4, :] = 2**31 + 512  # REFERENCE_PIXEL + NON_SCIENCE
+
+    primary = fits.PrimaryHDU()
+    primary.header['SUBSTRT1'] = 1
+    primary.header['SUBSTRT2'] = 1
+    primary.header['SUBSIZE1'] = nx
+    primary.header['SUBSIZE2'] = ny
+    sci = fits.ImageHDU(ramp, name='SCI')
+    dq = fits.ImageHDU(pixeldq, name='PIXELDQ')
+    fits.HDUList([primary, sci, dq]).writeto(filename, overwrite=True)
+
+    return ramp, pixeldq
+
+
+
+def test_get_data_low_memory(tmp_path):
+    """Test that the low-memory read mode returns the first and last
+    group of each integration as ``float32``, and reads the ``PIXELDQ``
+    extension only when it is needed.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    """
+    filename = os.path.join(tmp_path, 'jw00000001001_01101_00001_nrca1_uncal.fits')
+    ramp, pixeldq = create_synthetic_ramp(filename)
+
+    image = PreviewImage(filename, 'SCI', low_memory=True)
+    assert image.data.dtype == np.float32
+    assert image.data.shape == (ramp.shape[0], 2, ramp.shape[2], ramp.shape[3])
+    assert np.all(image.data[:, 0, :, :] == ramp[:, 0, :, :])
+    assert np.all(image.data[:, 1, :, :] == ramp[:, -1, :, :])
+    assert image._dq is None
+
+    # The DQ map is read on first access
+    assert not np.any(image.dq[:4, :])
+    assert np.all(image.dq[4:, :])
+
+    # The difference image matches the one from the full read
+    full_image = PreviewImage(filename, 'SCI')
+    assert np.allclose(image.difference_image(image.data),
+                       full_image.difference_image(full_image.data))
+    assert np.all(image.dq == full_image.dq)
+
+
+def test_make_image_pillow(tmp_path):
+    """Test that the pillow renderer makes an un-annotated preview image
+    and a thumbnail for each integration, with the expected colors.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    """
+    filename = os.path.join(tmp_path, 'jw00000001001_01101_00001_nrca2_uncal.fits')
+    ramp, pixeldq = create_synthetic_ramp(filename, nints=2, ngroups=3, ny=300, nx=600)
+
+    image = PreviewImage(filename, 'SCI', low_memory=True)
+    image.renderer = 'pillow'
+    image.annotate = False
+    image.preview_output_directory = tmp_path
+    image.thumbnail_output_directory = tmp_path
+    image.make_image(max_img_size=4)
+
+    rootname = os.path.basename(filename).split('.')[0]
+    for integration in range(ramp.shape[0]):
+        preview = Image.open(os.path.join(tmp_path, '{}_integ{}.jpg'.format(rootname, integration)))
+        thumbnail = Image.open(os.path.join(tmp_path, '{}_integ{}.thumb'.format(rootname, integration)))
+        assert preview.format == 'JPEG'
+        assert preview.size == (400, 200)
+        assert thumbnail.format == 'JPEG'
+        assert thumbnail.size == (256, 128)
+
+    # Values at or below the minimum get the first color of the
+    # colormap, values at or above the maximum get the last color, and
+    # NaNs are white. The first row of the frame is at the bottom.
+    frame = np.array([[0., 1.], [10., np.nan]])
+    for scale in ['log', 'linear']:
+        rgb = image.make_rgb(frame, 1., 10., scale)
+        colors = plt.get_cmap(image.cmap)([0., 1.], bytes=True)
+        assert rgb.shape == (2, 2, 3)
+        assert np.all(rgb[1, 0] == colors[0, :3])
+        assert np.all(rgb[1, 1] == colors[0, :3])
+        assert np.all(rgb[0, 0] == colors[1, :3])
+        assert np.all(rgb[0, 1] == 255)
+
+
+def test_make_image_tiled(tmp_path, monkeypatch):
+    """Test that a tile pyramid and its descriptor are saved for each
+    integration, with each level half the size of the next, and that
+    the permissions of every directory and tile are set.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    monkeypatch : pytest.MonkeyPatch
+        Fixture used to record the paths whose permissions are set
+    """
+    filename = os.path.join(tmp_path, 'jw00000001001_01101_00001_nrca3_uncal.fits')
+    ramp, pixeldq = create_synthetic_ramp(filename, nints=1, ngroups=3, ny=300, nx=600)
+
+    permission_paths = []
+    monkeypatch.setattr(permissions, 'set_permissions', permission_paths.append)
+
+    image = PreviewImage(filename, 'SCI', low_memory=True)
+    image.renderer = 'pillow'
+    image.annotate = False
+    image.tiled = True
+    image.preview_output_directory = tmp_path
+    image.thumbnail_output_directory = tmp_path
+    image.make_image(max_img_size=4)
+
+    rootname = os.path.basename(filename).split('.')[0]
+    descriptor_file = os.path.join(tmp_path, '{}_integ0_tiles.json'.format(rootname))
+    assert image.tile_pyramids == [descriptor_file]
+    with open(descriptor_file) as f:
+        descriptor = json.load(f)
+
+    assert (descriptor['width'], descriptor['height'], descriptor['tile_size']) == (600, 300, 256)
+    assert [(level['width'], level['height']) for level in descriptor['levels']] == [(150, 75), (300, 150), (600, 300)]
+    assert [(level['columns'], level['rows']) for level in descriptor['levels']] == [(1, 1), (2, 1), (3, 2)]
+
+    tile_directory = os.path.join(tmp_path, descriptor['tiles'])
+    assert Image.open(os.path.join(tile_directory, '0', '0_0.jpg')).size == (150, 75)
+    assert Image.open(os.path.join(tile_directory, '2', '0_0.jpg')).size == (256, 256)
+    assert Image.open(os.path.join(tile_directory, '2', '2_1.jpg')).size == (88, 44)
+
+    # Permissions are set on the descriptor, the tile directory, each
+    # level directory and each tile
+    saved = [os.path.join(directory, name) for directory, _, names in os.walk(tile_directory) for name in names]
+    levels = [os.path.join(tile_directory, str(level)) for level in range(3)]
+    assert set(permission_paths) >= set([descriptor_file, tile_directory] + levels + saved)
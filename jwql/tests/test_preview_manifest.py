@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+
+"""Tests for the ``preview_manifest`` module.
+
+Authors
+-------
+
+    - Bryan Hilbert
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_preview_manifest.py
+"""
+
+import os
+
+from jwql.utils.preview_manifest import PreviewManifest
+
+
+def write_file(filename, contents):
+    """Write ``contents`` to ``filename`` and return the path."""
+    with open(filename, 'w') as f:
+        f.write(contents)
+    return filename
+
+
+def test_manifest_status(tmp_path, store_engine):
+    """Test that the status of an exposure group follows changes to its
+    files and outputs.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    store_engine : obj
+        Engine of a test database with the tables of the manifest
+    """
+    nrca1 = write_file(os.path.join(tmp_path, 'jw00000001001_01101_00001_nrca1_rate.fits'), 'a')
+    nrca2 = write_file(os.path.join(tmp_path, 'jw00000001001_01101_00001_nrca2_rate.fits'), 'b')
+    preview = write_file(os.path.join(tmp_path, 'jw00000001001_01101_00001_NRC_SWA_MOSAIC_rate_integ0.jpg'), '')
+    thumbnail = write_file(os.path.join(tmp_path, 'jw00000001001_01101_00001_NRC_SWA_MOSAIC_rate_integ0.thumb'), '')
+    file_list = [nrca1, nrca2]
+
+    manifest = PreviewManifest(store_engine)
+    stats = manifest.get_file_stats(file_list)
+    assert manifest.status(file_list, stats) == 'new'
+
+    manifest.record(file_list, stats, [preview], [thumbnail])
+    assert manifest.status(file_list, stats) == 'current'
+    assert manifest.outputs(file_list) == [(preview, 'preview'), (thumbnail, 'thumbnail')]
+    manifest.close()
+
+    # The manifest persists between connections
+    manifest = PreviewManifest(store_engine)
+    assert manifest.status(file_list, manifest.get_file_stats(file_list)) == 'current'
+
+    # Missing outputs make the group stale
+    os.remove(thumbnail)
+    assert manifest.status(file_list, manifest.get_file_stats(file_list)) == 'stale'
+
+    # Changing a file, or the files in the group, modifies it
+    write_file(nrca2, 'bb')
+    assert manifest.status(file_list, manifest.get_file_stats(file_list)) == 'modified'
+    nrca3 = write_file(os.path.join(tmp_path, 'jw00000001001_01101_00001_nrca3_rate.fits'), 'c')
+    new_file_list = file_list + [nrca3]
+    assert manifest.status(new_file_list, manifest.get_file_stats(new_file_list)) == 'modified'
+
+    # Recording the new group replaces the entries of the old one
+    new_stats = manifest.get_file_stats(new_file_list)
+    manifest.record(new_file_list, new_stats, [preview], [])
+    assert manifest.status(new_file_list, new_stats) == 'current'
+    assert manifest.outputs(file_list) == []
+
+    manifest.clear()
+    assert manifest.status(new_file_list, new_stats) == 'new'
+    manifest.close()
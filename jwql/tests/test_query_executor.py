@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+
+"""Tests for the ``query_executor`` module.
+
+Authors
+-------
+
+    - Matthew Bourque
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_query_executor.py
+"""
+
+import threading
+import time
+
+import pytest
+
+from jwql.utils.mast_cache import RateLimiter
+from jwql.utils.query_executor import QueryExecutor
+
+
+class FakeService():
+    """A fake MAST service that takes ``latency`` seconds to answer, and
+    fails the first ``failures`` queries of each service."""
+
+    def __init__(self, latency=0.05, failures=0):
+        self.latency = latency
+        self.failures = failures
+        self.queries = {}
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, service, params):
+        with self._lock:
+            self.queries[service] = self.queries.get(service, 0) + 1
+            attempt = self.queries[service]
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(self.latency)
+        with self._lock:
+            self.running -= 1
+        if attempt <= self.failures:
+            raise ConnectionError('MAST is unavailable')
+        return {'data': [{'service': service, 'page': params['page']}]}
+
+
+def test_query_all():
+    """Test that requests are made in parallel, up to the number of
+    workers, and that the results are in the order of the requests."""
+
+    service = FakeService(latency=0.1)
+    executor = QueryExecutor(max_workers=4, service_function=service)
+    requests = [('Mast.Jwst.Filtered.{}'.format(i), {'page': i}) for i in range(8)]
+
+    results = executor.query_all(requests)
+
+    assert [result['data'][0]['page'] for result in results] == list(range(8))
+    assert service.most_running == 4
+
+
+def test_rate_limit():
+    """Test that attempts are spaced by the rate limit."""
+
+    service = FakeService(latency=0)
+    executor = QueryExecutor(max_workers=4, rate_limiter=RateLimiter(20), service_function=service)
+
+    start = time.time()
+    executor.query_all([('Mast.Jwst.Filtered.{}'.format(i), {'page': i}) for i in range(5)])
+    assert time.time() - start >= 0.2
+
+
+def test_retries():
+    """Test that failed queries are retried, and that a query that fails
+    every attempt raises its error or returns it."""
+
+    service = FakeService(latency=0, failures=2)
+    executor = QueryExecutor(retries=2, backoff=0.01, service_function=service)
+    results = executor.query_all([('Mast.Jwst.Filtered.Nircam', {'page': 1})])
+    assert results[0]['data'][0]['page'] == 1
+    assert service.queries['Mast.Jwst.Filtered.Nircam'] == 3
+
+    service = FakeService(latency=0, failures=2)
+    executor = QueryExecutor(retries=1, backoff=0.01, service_function=service)
+    with pytest.raises(ConnectionError):
+        executor.query_all([('Mast.Jwst.Filtered.Nircam', {'page': 1})])
+
+    results = executor.query_all([('Mast.Jwst.Filtered.Niriss', {'page': 1}),
+                                  ('Mast.Jwst.Filtered.Nirspec', {'page': 1})], return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+def test_timeout():
+    """Test that an attempt that takes longer than the timeout fails."""
+
+    service = FakeService(latency=0.5)
+    executor = QueryExecutor(timeout=0.05, retries=0, service_function=service)
+    with pytest.raises(TimeoutError):
+        executor.query_all([('Mast.Jwst.Filtered.Nircam', {'page': 1})])
+
+
+def test_timeout_bounded():
+    """Test that an attempt that has timed out but not finished still
+    counts towards the number of queries run at once, so that its
+    retry is not made alongside it."""
+
+    service = FakeService(latency=0.5)
+    executor = QueryExecutor(max_workers=1, timeout=0.05, retries=1, backoff=0.01, service_function=service)
+    with pytest.raises(TimeoutError):
+        executor.query_all([('Mast.Jwst.Filtered.Nircam', {'page': 1})])
+    assert service.queries == {'Mast.Jwst.Filtered.Nircam': 1}
+    assert service.most_running == 1
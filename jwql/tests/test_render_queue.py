@@ -0,0 +1,126 @@
+#! /usr/bin/env python
+
+"""Tests for the ``render_queue`` module.
+
+Authors
+-------
+
+    - Bryan Hilbert
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_render_queue.py
+"""
+
+import os
+import time
+
+from astropy.io import fits
+import numpy as np
+
+from jwql.utils.render_queue import RenderQueue, run_worker
+
+
+def test_render_queue(store_engine):
+    """Test that identical jobs are only queued once, that jobs are
+    claimed in order, that abandoned jobs are returned to the queue,
+    and that their status is reported.
+
+    Parameters
+    ----------
+    store_engine : obj
+        Engine of a test database with the table of the queue
+    """
+    queue = RenderQueue(store_engine)
+
+    first = queue.submit('a_rate.fits', 'previews', 'thumbnails')
+    second = queue.submit('b_rate.fits', 'previews', 'thumbnails')
+    assert queue.submit('a_rate.fits', 'previews', 'thumbnails') == first
+    assert queue.job(first)['position'] == 0
+    assert queue.job(second)['position'] == 1
+
+    job = queue.claim()
+    assert job['id'] == first
+    assert job['status'] == 'running'
+    assert job['position'] is None
+    assert queue.job(second)['position'] == 0
+
+    # A running job is not queued again
+    assert queue.submit('a_rate.fits', 'previews', 'thumbnails') == first
+
+    queue.complete(first, ['previews/a_rate_integ0.jpg'])
+    assert queue.job(first)['status'] == 'done'
+    assert queue.job(first)['outputs'] == ['previews/a_rate_integ0.jpg']
+
+    # Once done, a file can be queued again
+    third = queue.submit('a_rate.fits', 'previews', 'thumbnails')
+    assert third not in [first, second]
+
+    assert queue.claim()['id'] == second
+    queue.fail(second, 'Bad file')
+    assert queue.job(second)['status'] == 'failed'
+    assert queue.job(second)['error'] == 'Bad file'
+
+    # Abandoned running jobs are returned to the queue
+    assert queue.claim()['id'] == third
+    assert queue.claim() is None
+    assert queue.requeue_stale(max_age=3600) == 0
+    time.sleep(0.01)
+    assert queue.requeue_stale(max_age=0) == 1
+    assert queue.job(third)['status'] == 'pending'
+
+    # Jobs abandoned since the workers started are returned to the
+    # queue when a job is submitted or claimed
+    assert queue.claim()['id'] == third
+    time.sleep(0.01)
+    assert queue.submit('a_rate.fits', 'previews', 'thumbnails', max_age=0) == third
+    assert queue.job(third)['status'] == 'pending'
+    assert queue.claim()['id'] == third
+    time.sleep(0.01)
+    assert queue.claim(max_age=0)['id'] == third
+
+    assert queue.job(1000) is None
+    queue.close()
+
+
+def test_run_worker(tmp_path, store_engine):
+    """Test that a worker makes the preview images of queued jobs and
+    records failures.
+
+    Parameters
+    ----------
+    tmp_path : pathlib.Path
+        Temporary directory used for testing
+    store_engine : obj
+        Engine of a test database with the table of the queue
+    """
+    filename = os.path.join(tmp_path, 'jw00000001001_01101_00001_nrca1_rate.fits')
+    primary = fits.PrimaryHDU()
+    primary.header['SUBSTRT1'] = 1
+    primary.header['SUBSTRT2'] = 1
+    primary.header['SUBSIZE1'] = 64
+    primary.header['SUBSIZE2'] = 64
+    data = np.arange(64 * 64, dtype=np.float32).reshape((64, 64))
+    fits.HDUList([primary, fits.ImageHDU(data, name='SCI')]).writeto(filename)
+
+    preview_directory = os.path.join(tmp_path, 'previews')
+    thumbnail_directory = os.path.join(tmp_path, 'thumbnails')
+    queue = RenderQueue(store_engine)
+    good = queue.submit(filename, preview_directory, thumbnail_directory)
+    bad = queue.submit(os.path.join(tmp_path, 'missing_rate.fits'), preview_directory, thumbnail_directory)
+
+    run_worker(max_jobs=2, bind=store_engine)
+
+    preview = os.path.join(preview_directory, 'jw00000001001_01101_00001_nrca1_rate_integ0.jpg')
+    assert queue.job(good)['status'] == 'done'
+    assert queue.job(good)['outputs'] == [preview]
+    assert os.path.isfile(preview)
+    assert os.path.isfile(os.path.join(thumbnail_directory, 'jw00000001001_01101_00001_nrca1_rate_integ0.thumb'))
+    assert queue.job(bad)['status'] == 'failed'
+    queue.close()
@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+
+"""Tests for the ``request_profile`` module.
+
+Authors
+-------
+
+    - Lauren Chambers
+
+Use
+---
+
+    These tests can be run via the command line (omit the ``-s`` to
+    suppress verbose output to ``stdout``):
+
+    ::
+
+        pytest -s test_request_profile.py
+"""
+
+import threading
+
+from jwql.utils.request_profile import (ProfileStore, bind_profile, current_profile, profiled, start_profile,
+                                        stop_profile)
+
+
+def test_profiled():
+    """Test that events are recorded only while a request is profiled,
+    including by the threads working for it."""
+
+    with profiled('filesystem', 'not profiled'):
+        pass
+    assert current_profile() is None
+
+    profile = start_profile()
+    with profiled('filesystem', '/tmp/jw86600'):
+        pass
+    thread = threading.Thread(target=bind_profile(lambda: profile.record('mast', 0.5, 'Mast.Jwst.Filtered.Nircam')))
+    thread.start()
+    thread.join()
+    assert stop_profile() is profile
+    assert current_profile() is None
+
+    assert profile.counts == {'django': 0, 'sqlalchemy': 0, 'filesystem': 1, 'mast': 1}
+    assert profile.times['mast'] == 0.5
+    assert [event[0] for event in profile.events] == ['filesystem', 'mast']
+
+
+def test_profile_store(store_engine):
+    """Test that profiles are stored, summarized by view, and that only
+    the most recent are kept.
+
+    Parameters
+    ----------
+    store_engine : obj
+        Engine of a test database with the table of the profiles
+    """
+    store = ProfileStore(store_engine, max_profiles=3)
+    profile = start_profile()
+    profile.record('sqlalchemy', 0.2, 'SELECT 1')
+    stop_profile()
+
+    store.add('GET', '/nircam/archive/', 'jwql:archive', 200, 1., profile)
+    slow_id = store.add('GET', '/nircam/dark_monitor/', 'jwql:dark_monitor', 200, 5., profile)
+    store.add('GET', '/nircam/dark_monitor/', 'jwql:dark_monitor', 200, 3., profile)
+
+    views = store.slowest_views()
+    assert [view['view'] for view in views] == ['jwql:dark_monitor', 'jwql:archive']
+    assert views[0]['requests'] == 2
+    assert views[0]['mean_wall'] == 4.
+    assert views[0]['queries'] == 1.
+
+    assert [request['wall'] for request in store.slowest_requests(view='jwql:dark_monitor')] == [5., 3.]
+    slowest = store.get(slow_id)
+    assert slowest['categories']['sqlalchemy'] == {'count': 1, 'time': 0.2}
+    assert slowest['other_time'] == 4.8
+    assert slowest['events'][0]['detail'] == 'SELECT 1'
+
+    # The oldest profile is removed
+    store.add('GET', '/', 'jwql:home', 200, 0.1, profile)
+    assert len(store.slowest_requests()) == 3
+    assert store.slowest_requests(view='jwql:archive') == []
+    store.close()
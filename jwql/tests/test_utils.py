@@ -23,7 +23,7 @@ from pathlib import Path
 import pytest
 
 from jwql.utils.utils import copy_files, get_config, filename_parser, \
-    filesystem_path, _validate_config
+    filename_parser_batch, filesystem_path, _validate_config
 
 # Determine if tests are being run on jenkins
 ON_JENKINS = '/home/jenkins' in os.path.expanduser('~')
@@ -336,6 +336,33 @@ def test_filename_parser_nonJWST():
         filename_parser(filename)
 
 
+def test_filename_parser_batch():
+    """Test that a table of the properties of many files matches the
+    results of ``filename_parser``, with ``None`` for the properties
+    of files that cannot be parsed."""
+
+    filenames = [filename for filename, _ in FILENAME_PARSER_TEST_DATA] + ['not_a_jwst_file.fits']
+    filename_table = filename_parser_batch(filenames)
+
+    assert len(filename_table) == len(filenames)
+    for row, (filename, solution) in enumerate(FILENAME_PARSER_TEST_DATA):
+        assert filename_table['filename'][row] == os.path.basename(filename)
+        for key, value in solution.items():
+            assert filename_table[key][row] == value
+    assert filename_table['filename_type'].iloc[-1] is None
+    assert filename_table['program_id'].iloc[-1] is None
+
+
+def test_filename_parser_cache():
+    """Test that modifying the result of ``filename_parser`` does not
+    change the result of parsing the same file again."""
+
+    filename = 'jw00327001001_02101_00002_nrca1_rate.fits'
+    filename_dict = filename_parser(filename)
+    filename_dict['detector'] = 'nrcb1'
+    assert filename_parser(filename)['detector'] == 'nrca1'
+
+
 @pytest.mark.skipif(ON_JENKINS, reason='Requires access to central storage.')
 def test_filesystem_path():
     """Test that a file's location in the filesystem is returned"""
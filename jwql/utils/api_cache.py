@@ -0,0 +1,172 @@
+#! /usr/bin/env python
+
+"""A persistent cache of the results of the ``jwql`` REST API.
+
+The endpoints of the API return lists of proposals and files built from
+the filesystem index and from MAST queries, and external scripts poll
+them often. The full, sorted list of each endpoint and argument is
+instead stored in a table of the ``jwqldb`` database, with the
+``version`` of the data it was built from (e.g. the version of the
+filesystem index). A list is returned from the cache while the version
+of its data is unchanged, and each request is answered with a page of
+it. Entries can also be invalidated explicitly, for an endpoint or for
+the whole API.
+
+Authors
+-------
+
+    - Matthew Bourque
+
+Use
+---
+
+    The table of the cache is created along with the other tables of
+    the database, by executing ``database_interface.py``. This module
+    can then be imported and used as such:
+
+    ::
+
+        from jwql.utils.api_cache import open_api_cache
+        with open_api_cache() as cache:
+            items = cache.get('thumbnails_by_proposal', '86600', version)
+            if items is None:
+                items = get_thumbnails_by_proposal('86600')
+                cache.set('thumbnails_by_proposal', '86600', version, items)
+
+    The cache can be invalidated from the command line, for all
+    endpoints or for the given endpoints:
+
+    ::
+
+        python api_cache.py
+        python api_cache.py --endpoint thumbnails_by_proposal
+"""
+
+import argparse
+import json
+import time
+
+from sqlalchemy import and_, select
+
+from jwql.database.database_interface import ApiResult
+from jwql.database.database_interface import DatabaseStore
+from jwql.database.database_interface import upsert
+
+# Table of the cache
+RESULTS = ApiResult.__table__
+
+
+class ApiCache(DatabaseStore):
+    """A cache, in the ``jwqldb`` database, of the results of the API,
+    keyed on the endpoint and its argument.
+
+    Attributes
+    ----------
+    connection : obj
+        Connection to the database
+    engine : obj
+        Engine of the database
+
+    Methods
+    -------
+    close()
+        Close the connection to the database
+    get(endpoint, key, version)
+        Return the cached result of an endpoint
+    invalidate(endpoint, key)
+        Remove cached results
+    set(endpoint, key, version, items)
+        Store the result of an endpoint
+    """
+
+    def get(self, endpoint, key, version):
+        """Return the cached result of an endpoint, if it was built from
+        the given version of the data.
+
+        Parameters
+        ----------
+        endpoint : str
+            Name of the endpoint (e.g. ``thumbnails_by_proposal``)
+        key : str
+            Argument of the endpoint (e.g. ``86600``)
+        version : str
+            The current version of the data of the endpoint
+
+        Returns
+        -------
+        items : list
+            The cached result, or ``None`` if it is not cached or was
+            built from another version
+        """
+        items = self.connection.execute(select([RESULTS.c['items']]).where(
+            and_(RESULTS.c.endpoint == endpoint, RESULTS.c.key == key, RESULTS.c.version == version))).scalar()
+        if items is None:
+            return None
+
+        return json.loads(items)
+
+    def invalidate(self, endpoint=None, key=None):
+        """Remove cached results.
+
+        Parameters
+        ----------
+        endpoint : str
+            Name of the endpoint whose results are removed, or ``None``
+            for all endpoints
+        key : str
+            Argument of the endpoint whose result is removed, or
+            ``None`` for all arguments
+
+        Returns
+        -------
+        count : int
+            The number of results removed
+        """
+        statement = RESULTS.delete()
+        if endpoint is not None:
+            statement = statement.where(RESULTS.c.endpoint == endpoint)
+        if key is not None:
+            statement = statement.where(RESULTS.c.key == key)
+
+        return self.connection.execute(statement).rowcount
+
+    def set(self, endpoint, key, version, items):
+        """Store the result of an endpoint.
+
+        Parameters
+        ----------
+        endpoint : str
+            Name of the endpoint (e.g. ``thumbnails_by_proposal``)
+        key : str
+            Argument of the endpoint (e.g. ``86600``)
+        version : str
+            Version of the data the result was built from
+        items : list
+            The result
+        """
+        with self.connection.begin():
+            upsert(self.connection, RESULTS, [{'endpoint': endpoint, 'key': key, 'version': version,
+                                               'items': json.dumps(items), 'updated': time.time()}])
+
+
+def open_api_cache():
+    """Open the cache in the ``jwqldb`` database.
+
+    Returns
+    -------
+    cache : ApiCache
+        The open cache, which should be closed after use
+    """
+    return ApiCache()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Invalidate the cached results of the API.')
+    parser.add_argument('--endpoint', action='append',
+                        help='Endpoint whose results are invalidated (all endpoints if not given)')
+    args = parser.parse_args()
+
+    with open_api_cache() as cache:
+        for endpoint in args.endpoint or [None]:
+            print('Removed {} results'.format(cache.invalidate(endpoint)))
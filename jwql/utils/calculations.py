@@ -14,6 +14,7 @@ Use
 
         from jwql.utils import calculations
         mean_val, stdev_val = calculations.mean_stdev(image, sigma_threshold=4)
+        minval, maxval = calculations.clipped_limits(image, mask, 0.01)
  """
 
 import numpy as np
@@ -24,6 +25,121 @@ from scipy.optimize import curve_fit
 from scipy.stats import sigmaclip
 
 
+def clipped_limits(data, mask, clip_fraction, max_error=None):
+    """Find the signal levels above and below which ``clip_fraction``
+    of the masked pixels lie. The limits are found by selection rather
+    than by sorting all of the pixels, so the run time is linear in the
+    number of pixels.
+
+    If ``max_error`` is given, the limits are instead estimated from a
+    deterministic, evenly strided subsample of the pixels. The
+    subsample is just large enough that the rank of each limit is
+    within ``max_error`` (as a fraction of the number of masked pixels)
+    of the exact rank, at the 3-sigma level.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        2D array of signal values
+
+    mask : numpy.ndarray
+        2D boolean array, ``True`` for pixels to be used
+
+    clip_fraction : float
+        Fraction of the lowest and highest pixels to clip (e.g. 0.01
+        clips the dimmest and brightest 1% of pixels)
+
+    max_error : float
+        Maximum error on the rank of the limits, as a fraction of the
+        number of masked pixels. If ``None``, the limits are exact.
+
+    Returns
+    -------
+    minval : float
+        Lower signal limit
+
+    maxval : float
+        Upper signal limit
+    """
+
+    flat_data = data.ravel()
+    flat_mask = mask.ravel()
+    nelem = np.count_nonzero(flat_mask)
+
+    # The standard error on the rank of a quantile p estimated from m
+    # samples is sqrt(p * (1 - p) / m), as a fraction of all pixels
+    if max_error is not None and clip_fraction > 0:
+        nsample = int(np.ceil(9. * clip_fraction * (1. - clip_fraction) / max_error**2))
+        stride = max(1, nelem // nsample)
+
+        # Keep the stride from lining up with the image columns, so that
+        # the subsample is spread over all columns
+        if data.ndim > 1:
+            while stride > 1 and np.gcd(stride, data.shape[-1]) != 1:
+                stride -= 1
+
+        flat_data = flat_data[::stride]
+        flat_mask = flat_mask[::stride]
+        nelem = np.count_nonzero(flat_mask)
+
+    values = flat_data[flat_mask]
+    numclip = int(clip_fraction * nelem)
+    minval, maxval = _order_statistics(values, [numclip, nelem - numclip - 1])
+
+    return minval, maxval
+
+
+def _order_statistics(values, ranks, sample_size=100000, margin=0.002):
+    """Return the elements that would be at the given ``ranks`` if
+    ``values`` were sorted.
+
+    Each rank is first bracketed using a sorted, evenly strided sample
+    of ``values``. Only the elements within the bracket are then
+    partitioned, so a full partition of ``values`` is only needed if
+    the bracket misses the rank.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        1D array of values
+
+    ranks : list
+        Ranks (indexes into the sorted array) to return
+
+    sample_size : int
+        Approximate number of elements in the sample used to bracket
+        each rank
+
+    margin : float
+        Half-width of each bracket, as a fraction of the number of
+        elements
+
+    Returns
+    -------
+    results : list
+        The value at each of ``ranks``
+    """
+
+    nelem = values.size
+    sample = np.sort(values[::max(1, nelem // sample_size)])
+    nsample = sample.size
+
+    results = []
+    for rank in ranks:
+        fraction = rank / nelem
+        low = sample[max(0, int((fraction - margin) * nsample))]
+        high = sample[min(nsample - 1, int((fraction + margin) * nsample))]
+        nbelow = np.count_nonzero(values < low)
+        window = values[(values >= low) & (values <= high)]
+        if nbelow <= rank < nbelow + window.size:
+            window.partition(rank - nbelow)
+            results.append(window[rank - nbelow])
+        else:
+            results.append(np.partition(values, rank)[rank])
+
+    return results
+
+
 def double_gaussian(x, amp1, peak1, sigma1, amp2, peak2, sigma2):
     """Equate two Gaussians
 
@@ -0,0 +1,226 @@
+#! /usr/bin/env python
+
+"""A persistent cache of the ``Bokeh`` components of the monitor pages
+of the web application.
+
+Building the tabs of a monitor page queries the database and reads
+files for every aperture of the instrument, and takes many seconds. The
+``script`` and ``div`` returned by ``bokeh.embed.components`` for each
+monitor and instrument are instead stored in a table of the ``jwqldb``
+database, with the ``version`` of the monitor results they were
+built from (e.g. the latest ``entry_date`` of the monitor's stats
+tables). When the results have a newer version, the cached components
+are still returned at once, while new components are built in the
+background. The cache is also refreshed by a scheduled job, so that
+pages are rarely built while a user waits.
+
+Authors
+-------
+
+    - Gray Kanarek
+
+Use
+---
+
+    The table of the cache is created along with the other tables of
+    the database, by executing ``database_interface.py``. This module
+    can then be imported and used as such:
+
+    ::
+
+        from jwql.utils.component_cache import get_components
+        div, script = get_components('dark_monitor', 'NIRCam', version,
+                                     lambda: dark_monitor_tabs('NIRCam'))
+"""
+
+import logging
+import threading
+import time
+
+from sqlalchemy import and_, select
+
+from jwql.database.database_interface import DatabaseStore
+from jwql.database.database_interface import MonitorComponent
+from jwql.database.database_interface import upsert
+
+# Table of the cache
+COMPONENTS = MonitorComponent.__table__
+
+# The components that are being built in the background by this
+# process, by ``(monitor, instrument)``
+_BUILDING = set()
+_BUILDING_LOCK = threading.Lock()
+
+
+class ComponentCache(DatabaseStore):
+    """A cache, in the ``jwqldb`` database, of the ``Bokeh`` components
+    of the monitor pages, keyed on the monitor and instrument.
+
+    Attributes
+    ----------
+    connection : obj
+        Connection to the database
+    engine : obj
+        Engine of the database
+
+    Methods
+    -------
+    clear()
+        Remove all components from the cache
+    close()
+        Close the connection to the database
+    get(monitor, instrument)
+        Return the cached components of a monitor page
+    set(monitor, instrument, version, div, script)
+        Store the components of a monitor page
+    """
+
+    def clear(self):
+        """Remove all components from the cache."""
+        self.connection.execute(COMPONENTS.delete())
+
+    def get(self, monitor, instrument):
+        """Return the cached components of a monitor page.
+
+        Parameters
+        ----------
+        monitor : str
+            Name of the monitor (e.g. ``dark_monitor``)
+        instrument : str
+            Name of the instrument (e.g. ``NIRCam``)
+
+        Returns
+        -------
+        components : dict
+            The ``version``, ``div``, ``script`` and the time at which
+            they were ``updated``, or ``None`` if the page is not
+            cached
+        """
+        query = select([COMPONENTS.c.version, COMPONENTS.c.div, COMPONENTS.c.script, COMPONENTS.c.updated]).where(
+            and_(COMPONENTS.c.monitor == monitor, COMPONENTS.c.instrument == instrument.lower()))
+        row = self.connection.execute(query).fetchone()
+        if row is None:
+            return None
+
+        return dict(row)
+
+    def set(self, monitor, instrument, version, div, script):
+        """Store the components of a monitor page.
+
+        Parameters
+        ----------
+        monitor : str
+            Name of the monitor (e.g. ``dark_monitor``)
+        instrument : str
+            Name of the instrument (e.g. ``NIRCam``)
+        version : str
+            Version of the monitor results the components were built
+            from
+        div : str
+            The HTML div of the page
+        script : str
+            The JS script of the page
+        """
+        with self.connection.begin():
+            upsert(self.connection, COMPONENTS, [{'monitor': monitor, 'instrument': instrument.lower(),
+                                                  'version': version, 'div': div, 'script': script,
+                                                  'updated': time.time()}])
+
+
+def build_components(monitor, instrument, version, build):
+    """Build the components of a monitor page and store them in the
+    cache.
+
+    Parameters
+    ----------
+    monitor : str
+        Name of the monitor (e.g. ``dark_monitor``)
+    instrument : str
+        Name of the instrument (e.g. ``NIRCam``)
+    version : str
+        Version of the monitor results
+    build : function
+        Function that takes no arguments and returns the ``div`` and
+        ``script`` of the page
+
+    Returns
+    -------
+    div : str
+        The HTML div of the page
+    script : str
+        The JS script of the page
+    """
+    div, script = build()
+    with open_component_cache() as cache:
+        cache.set(monitor, instrument, version, div, script)
+
+    return div, script
+
+
+def get_components(monitor, instrument, version, build):
+    """Return the components of a monitor page, from the cache if
+    possible.
+
+    If the cached components were built from an older version of the
+    monitor results, they are returned and new components are built in
+    a background thread. The components are only built before returning
+    if the page has never been cached.
+
+    Parameters
+    ----------
+    monitor : str
+        Name of the monitor (e.g. ``dark_monitor``)
+    instrument : str
+        Name of the instrument (e.g. ``NIRCam``)
+    version : str
+        The current version of the monitor results
+    build : function
+        Function that takes no arguments and returns the ``div`` and
+        ``script`` of the page
+
+    Returns
+    -------
+    div : str
+        The HTML div of the page
+    script : str
+        The JS script of the page
+    """
+    with open_component_cache() as cache:
+        cached = cache.get(monitor, instrument)
+
+    if cached is None:
+        return build_components(monitor, instrument, version, build)
+
+    if cached['version'] != version:
+        key = (monitor, instrument.lower())
+        with _BUILDING_LOCK:
+            start = key not in _BUILDING
+            _BUILDING.add(key)
+        if start:
+            threading.Thread(target=_build_in_background, args=(key, monitor, instrument, version, build),
+                             daemon=True).start()
+
+    return cached['div'], cached['script']
+
+
+def open_component_cache():
+    """Open the cache in the ``jwqldb`` database.
+
+    Returns
+    -------
+    cache : ComponentCache
+        The open cache, which should be closed after use
+    """
+    return ComponentCache()
+
+
+def _build_in_background(key, monitor, instrument, version, build):
+    """Build the components of a monitor page, and allow them to be
+    built again once finished."""
+    try:
+        build_components(monitor, instrument, version, build)
+    except Exception as error:
+        logging.warning('Failed to build the components of the {} {}: {}'.format(instrument, monitor, error))
+    finally:
+        with _BUILDING_LOCK:
+            _BUILDING.discard(key)
@@ -0,0 +1,220 @@
+#! /usr/bin/env python
+
+"""Downsample time series for plotting.
+
+Plots of long time series (e.g. years of engineering telemetry) would
+otherwise send millions of points to the browser. The functions in this
+module select a subset of the points of a series that keeps its shape:
+
+    - ``lttb``, the Largest-Triangle-Three-Buckets algorithm, keeps in
+      each bucket of points the one that forms the largest triangle
+      with the point kept in the previous bucket and the mean of the
+      next bucket
+    - ``min_max`` keeps the smallest and largest value of each bucket,
+      so that every extremum is kept
+
+``downsample`` applies either of them to each run of the series between
+gaps (``NaN`` values, or steps in ``x`` much larger than usual), so
+that gaps are not bridged by the selected points. The functions return
+the indices of the selected points, so that any other columns of the
+data can be selected with them.
+
+Authors
+-------
+
+    - Joe Filippazzo
+
+Use
+---
+
+    This module can be imported and used as such:
+
+    ::
+
+        from jwql.utils.downsample import downsample
+        indices = downsample(times, values, 2000)
+        plot.line(times[indices], values[indices])
+
+References
+----------
+
+    Steinarsson, S. 2013, "Downsampling Time Series for Visual
+    Representation", MSc thesis, University of Iceland
+"""
+
+import numpy as np
+
+# Default number of points kept
+DEFAULT_POINTS = 2000
+
+# Steps in ``x`` larger than this many times the median step are gaps
+GAP_FACTOR = 10
+
+
+def as_float(values):
+    """Return values as a ``float`` array, with datetimes as
+    nanoseconds.
+
+    Parameters
+    ----------
+    values : array-like
+        Numbers or datetimes
+
+    Returns
+    -------
+    values : numpy.ndarray
+        The values as floats
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == 'O' and len(values) > 0:
+        values = np.asarray(values, dtype='datetime64[ns]')
+    if values.dtype.kind in 'mM':
+        values = values.astype('datetime64[ns]').astype(np.int64)
+
+    return values.astype(float)
+
+
+def downsample(x, y, n_out=DEFAULT_POINTS, method='lttb', gap_factor=GAP_FACTOR):
+    """Return the indices of at most about ``n_out`` points of a series,
+    chosen with ``method`` within each run of the series between gaps.
+
+    ``NaN`` values of ``y`` are always kept, so that lines are still
+    broken at them, and the points on both sides of a gap in ``x`` are
+    kept, so that the gap is not narrowed.
+
+    Parameters
+    ----------
+    x : array-like
+        Increasing ``x`` values (numbers or datetimes)
+    y : array-like
+        ``y`` values
+    n_out : int
+        Number of points to keep
+    method : str
+        ``lttb`` or ``min_max``
+    gap_factor : float
+        Steps in ``x`` larger than this many times the median step are
+        gaps. ``None`` to only treat ``NaN`` values as gaps.
+
+    Returns
+    -------
+    indices : numpy.ndarray
+        Sorted indices of the selected points
+    """
+    x = as_float(x)
+    y = as_float(y)
+    if len(x) <= n_out:
+        return np.arange(len(x))
+
+    methods = {'lttb': lttb, 'min_max': min_max}
+    if method not in methods:
+        raise ValueError('Unrecognized downsampling method: {}'.format(method))
+
+    # Split the series at NaN values and at large steps in x
+    missing = ~np.isfinite(y)
+    starts = np.zeros(len(x), dtype=bool)
+    starts[0] = True
+    starts[1:] |= missing[:-1]
+    if gap_factor is not None:
+        steps = np.diff(x)
+        starts[1:] |= steps > gap_factor * np.median(steps)
+    segment_ids = np.cumsum(starts)
+    segment_ids[missing] = 0
+
+    # Share the points among the runs by their length
+    kept = [np.flatnonzero(missing)]
+    n_valid = np.count_nonzero(~missing)
+    boundaries = np.flatnonzero(np.diff(segment_ids) != 0) + 1
+    for segment in np.split(np.arange(len(x)), boundaries):
+        if missing[segment[0]]:
+            continue
+        n_segment = max(int(round(n_out * len(segment) / n_valid)), 2)
+        kept.append(segment[methods[method](x[segment], y[segment], n_segment)])
+
+    return np.unique(np.concatenate(kept))
+
+
+def lttb(x, y, n_out=DEFAULT_POINTS):
+    """Return the indices of ``n_out`` points of a series, chosen with
+    the Largest-Triangle-Three-Buckets algorithm. The first and last
+    points are always kept.
+
+    Parameters
+    ----------
+    x : array-like
+        Increasing ``x`` values
+    y : array-like
+        ``y`` values, without ``NaN`` values
+    n_out : int
+        Number of points to keep, at least 3
+
+    Returns
+    -------
+    indices : numpy.ndarray
+        Sorted indices of the selected points
+    """
+    x = as_float(x)
+    y = as_float(y)
+    n_in = len(x)
+    if n_in <= n_out or n_out < 3:
+        return np.arange(n_in) if n_in <= n_out else np.array([0, n_in - 1])
+
+    # The points between the first and last are divided into n_out - 2
+    # buckets of about equal numbers of points
+    edges = np.linspace(1, n_in - 1, n_out - 1).astype(int)
+
+    # Mean of each bucket, and of the last point as a final bucket
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n_in - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+
+        # Twice the area of the triangle of each point of the bucket with
+        # the previously selected point and the mean of the next bucket
+        areas = np.abs((x[previous] - mean_x[bucket + 1]) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (mean_y[bucket + 1] - y[previous]))
+        previous = start + np.argmax(areas)
+        indices[bucket + 1] = previous
+
+    return indices
+
+
+def min_max(x, y, n_out=DEFAULT_POINTS):
+    """Return the indices of the smallest and largest values of each of
+    ``n_out // 2`` buckets of points of a series. The first and last
+    points are always kept.
+
+    Parameters
+    ----------
+    x : array-like
+        Increasing ``x`` values
+    y : array-like
+        ``y`` values, without ``NaN`` values
+    n_out : int
+        Number of points to keep
+
+    Returns
+    -------
+    indices : numpy.ndarray
+        Sorted indices of the selected points
+    """
+    y = as_float(y)
+    n_in = len(y)
+    n_buckets = max(n_out // 2, 1)
+    if n_in <= n_out:
+        return np.arange(n_in)
+
+    # Sort the points by bucket and then by value, so that the first and
+    # last point of each bucket are its smallest and largest values
+    buckets = np.arange(n_in) * n_buckets // n_in
+    order = np.lexsort((y, buckets))
+    firsts = np.searchsorted(buckets[order], np.arange(n_buckets))
+    lasts = np.append(firsts[1:], n_in) - 1
+
+    return np.unique(np.concatenate([[0, n_in - 1], order[firsts], order[lasts]]))
@@ -0,0 +1,522 @@
+#! /usr/bin/env python
+
+"""A persistent index of the files in the ``jwql`` filesystem and of
+the preview images and thumbnails made from them.
+
+The web application looks up files by program, instrument and rootname
+on every page view. Searching the central storage with ``glob`` for
+each lookup is slow, so the files are instead recorded in tables of the
+``jwqldb`` database that are queried by the web application. The index
+is updated incrementally: only directories whose modification time has
+changed since they were last scanned are listed again. It is built and
+updated only by running this module as a script (e.g. as a cron job);
+the web application finds no files until it has been built. The web
+application does update individual directories that are expected to
+change, such as the preview images of a file that is being rendered.
+
+Each file is recorded with its ``category`` (``fits``, ``preview``,
+``thumbnail`` or ``tiles``), ``program``, ``instrument``, ``rootname``
+and ``suffix``. A summary of each proposal of each instrument (its
+number of files and observations and a representative thumbnail) is
+kept up to date with the files, so that the archive pages can read all
+of the proposals of an instrument at once. The index also records a
+``version`` that changes whenever files are added or removed, so that
+results derived from it (e.g. the responses of the API) can be reused
+until it changes.
+
+Authors
+-------
+
+    - Matthew Bourque
+
+Use
+---
+
+    The tables of the index are created along with the other tables of
+    the database, by executing ``database_interface.py``. This module
+    can then be executed as such, to build or update the index:
+
+    ::
+
+        python filesystem_index.py
+
+    To clear and rebuild the index:
+
+    ::
+
+        python filesystem_index.py --rebuild
+
+    The index can be queried as such:
+
+    ::
+
+        from jwql.utils.filesystem_index import open_filesystem_index
+        with open_filesystem_index() as index:
+            filepaths = index.files('fits', program='86600')
+            proposals = index.proposals('nircam')
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from sqlalchemy import and_, bindparam, func, select
+
+from jwql.database.database_interface import DatabaseStore
+from jwql.database.database_interface import FilesystemIndexDirectory
+from jwql.database.database_interface import FilesystemIndexFile
+from jwql.database.database_interface import FilesystemIndexMetadata
+from jwql.database.database_interface import FilesystemIndexProposal
+from jwql.database.database_interface import upsert
+from jwql.utils.constants import JWST_INSTRUMENT_NAMES_SHORTHAND
+from jwql.utils.logging_functions import configure_logging
+from jwql.utils.request_profile import profiled
+from jwql.utils.utils import filename_parser, get_config
+
+# Tables of the index
+DIRECTORIES = FilesystemIndexDirectory.__table__
+FILES = FilesystemIndexFile.__table__
+METADATA = FilesystemIndexMetadata.__table__
+PROPOSALS = FilesystemIndexProposal.__table__
+
+# The category of each type of file in the index, by the end of the
+# filename. Other files are not indexed.
+FILE_CATEGORIES = [('_tiles.json', 'tiles'),
+                   ('.fits', 'fits'),
+                   ('.jpg', 'preview'),
+                   ('.thumb', 'thumbnail')]
+
+# Suffixes of the thumbnails that represent a proposal
+PROPOSAL_THUMBNAIL_SUFFIXES = ['rate', 'rateints']
+
+# Detector name fragments of each instrument, for files that
+# ``filename_parser`` cannot parse (e.g. NIRCam mosaics)
+INSTRUMENT_MATCH = {'guider': 'fgs',
+                    'mir': 'miri',
+                    'nis': 'niriss',
+                    'nrc': 'nircam',
+                    'nrs': 'nirspec'}
+
+
+class FilesystemIndex(DatabaseStore):
+    """An index, in the ``jwqldb`` database, of the files in the
+    ``jwql`` filesystem, preview image and thumbnail directories.
+
+    Attributes
+    ----------
+    connection : obj
+        Connection to the database
+    engine : obj
+        Engine of the database
+
+    Methods
+    -------
+    clear()
+        Remove all entries from the index
+    close()
+        Close the connection to the database
+    count(category, program, instrument, prefix, suffixes)
+        Count the indexed files that match the given criteria
+    files(category, program, instrument, prefix, suffixes)
+        Return the paths of the indexed files that match the given
+        criteria
+    last_update()
+        Return the time of the last full update
+    programs(category)
+        Return the programs that have indexed files
+    proposals(instrument)
+        Return the summaries of the proposals of an instrument
+    update(roots)
+        Update the index with the program directories in each root
+    update_directory(directory)
+        Update the index with the files in a directory, if it has
+        changed
+    version()
+        Return the version of the indexed files and the time they
+        last changed
+    """
+
+    def clear(self):
+        """Remove all entries from the index."""
+        with self.connection.begin():
+            for table in [DIRECTORIES, FILES, METADATA, PROPOSALS]:
+                self.connection.execute(table.delete())
+
+    def count(self, category, program=None, instrument=None, prefix=None, suffixes=None):
+        """Count the indexed files that match the given criteria. See
+        ``files`` for a description of the parameters.
+
+        Returns
+        -------
+        count : int
+            The number of matching files
+        """
+        query = select([func.count()]).select_from(FILES).where(
+            self._where(category, program, instrument, prefix, suffixes))
+        return self.connection.execute(query).scalar()
+
+    def files(self, category, program=None, instrument=None, prefix=None, suffixes=None):
+        """Return the paths of the indexed files that match the given
+        criteria.
+
+        Parameters
+        ----------
+        category : str
+            The category of file (``fits``, ``preview``, ``thumbnail``
+            or ``tiles``)
+        program : str
+            The five-digit program number (e.g. ``86600``)
+        instrument : str
+            The instrument, in any case (e.g. ``NIRCam``)
+        prefix : str
+            The start of the filename (e.g. a rootname such as
+            ``jw86600008001_02101_00007_guider2``). If given,
+            ``program`` is taken from the prefix if not given.
+        suffixes : list
+            The suffixes of the files (e.g. ``['rate', 'rateints']``)
+
+        Returns
+        -------
+        filepaths : list
+            Sorted list of the full paths of the matching files
+        """
+        query = select([FILES.c.path]).where(self._where(category, program, instrument, prefix, suffixes))
+
+        # Sorted here rather than by the database, whose collation may
+        # not order paths character by character
+        return sorted(row.path for row in self.connection.execute(query))
+
+    def last_update(self):
+        """Return the time of the last full update of the index, or
+        ``None`` if it has never been updated."""
+        value = self.connection.execute(
+            select([METADATA.c.value]).where(METADATA.c.key == 'last_update')).scalar()
+        if value is None:
+            return None
+        return float(value)
+
+    def programs(self, category='fits'):
+        """Return the programs that have indexed files.
+
+        Parameters
+        ----------
+        category : str
+            The category of file
+
+        Returns
+        -------
+        programs : list
+            Sorted list of five-digit program numbers
+        """
+        query = select([FILES.c.program]).distinct().where(
+            and_(FILES.c.category == category, FILES.c.program.isnot(None)))
+        return sorted(row.program for row in self.connection.execute(query))
+
+    def proposals(self, instrument):
+        """Return the summaries of the proposals of an instrument.
+
+        Parameters
+        ----------
+        instrument : str
+            The instrument, in any case (e.g. ``NIRCam``)
+
+        Returns
+        -------
+        proposals : list
+            A dictionary for each proposal, in order of program, with
+            its ``program``, number of fits files (``num_files``),
+            number of observations (``num_observations``), the path of
+            a representative thumbnail relative to the thumbnail
+            directory (``thumbnail``, ``None`` if there are no
+            thumbnails) and the time at which the summary was
+            ``updated``
+        """
+        columns = ['program', 'num_files', 'num_observations', 'thumbnail', 'updated']
+        query = select([PROPOSALS.c[column] for column in columns]).where(
+            PROPOSALS.c.instrument == instrument.lower()).order_by(PROPOSALS.c.program)
+        return [dict(row) for row in self.connection.execute(query)]
+
+    def update(self, roots):
+        """Update the index with the program directories in each root.
+        Directories that have not changed since they were last scanned
+        are skipped, and directories that no longer exist are removed.
+
+        Parameters
+        ----------
+        roots : list
+            The directories that contain program directories (e.g. the
+            ``filesystem``)
+
+        Returns
+        -------
+        updated : int
+            The number of directories that were scanned
+        """
+        updated = 0
+        directories = []
+        for root in roots:
+            if os.path.isdir(root):
+                with profiled('filesystem', root):
+                    directories.extend(entry.path for entry in os.scandir(root) if entry.is_dir())
+
+        for directory in directories:
+            updated += self.update_directory(directory)
+
+        # Forget directories that have been removed
+        known = set(row.path for row in self.connection.execute(select([DIRECTORIES.c.path])))
+        removed = [path for path in known - set(directories)
+                   if os.path.dirname(path) in roots and not os.path.isdir(path)]
+        programs = set()
+        with self.connection.begin():
+            for path in removed:
+                programs.update(self._directory_programs(path))
+                self.connection.execute(DIRECTORIES.delete().where(DIRECTORIES.c.path == path))
+                self.connection.execute(FILES.delete().where(FILES.c.directory == path))
+            self._update_proposals(programs)
+            if len(removed) > 0:
+                self._record_change()
+            upsert(self.connection, METADATA, [{'key': 'last_update', 'value': repr(time.time())}])
+
+        return updated
+
+    def update_directory(self, directory):
+        """Update the index with the files in a directory, if the
+        directory has been modified since it was last scanned.
+
+        Parameters
+        ----------
+        directory : str
+            Path of the directory
+
+        Returns
+        -------
+        updated : bool
+            ``True`` if the directory was scanned
+        """
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        row = self.connection.execute(
+            select([DIRECTORIES.c.mtime]).where(DIRECTORIES.c.path == directory)).fetchone()
+        if row is not None and row.mtime == mtime:
+            return False
+
+        if mtime is None:
+            filenames = set()
+        else:
+            with profiled('filesystem', directory):
+                filenames = set(entry.name for entry in os.scandir(directory) if entry.is_file())
+        indexed = set(row.filename for row in self.connection.execute(
+            select([FILES.c.filename]).where(FILES.c.directory == directory)))
+        removed = indexed - filenames
+
+        new_rows = []
+        for filename in filenames - indexed:
+            entry = parse_index_filename(filename)
+            if entry is not None:
+                new_rows.append(dict(zip(['path', 'directory', 'filename', 'category', 'program', 'instrument',
+                                          'rootname', 'suffix'],
+                                         (os.path.join(directory, filename), directory, filename) + entry)))
+
+        # The programs whose summaries change with the directory
+        programs = set(row['program'] for row in new_rows)
+        if len(removed) > 0:
+            programs.update(self._directory_programs(directory))
+
+        with self.connection.begin():
+            if len(removed) > 0:
+                self.connection.execute(FILES.delete().where(FILES.c.path == bindparam('removed_path')),
+                                        [{'removed_path': os.path.join(directory, filename)}
+                                         for filename in removed])
+            upsert(self.connection, FILES, new_rows)
+            if mtime is None:
+                self.connection.execute(DIRECTORIES.delete().where(DIRECTORIES.c.path == directory))
+            else:
+                upsert(self.connection, DIRECTORIES, [{'path': directory, 'mtime': mtime}])
+            self._update_proposals(programs)
+            if len(new_rows) > 0 or len(removed) > 0:
+                self._record_change()
+
+        return True
+
+    def version(self):
+        """Return the version of the indexed files, which changes
+        whenever files are added to or removed from the index.
+
+        Returns
+        -------
+        version : str
+            The version of the indexed files
+        modified : float
+            The time at which files were last added or removed, or
+            ``None`` if the index has never changed
+        """
+        metadata = {key: value for key, value in self.connection.execute(
+            select([METADATA.c.key, METADATA.c.value]).where(METADATA.c.key.in_(['generation', 'modified'])))}
+        modified = float(metadata['modified']) if 'modified' in metadata else None
+
+        # The time is part of the version so that the versions of a
+        # rebuilt index differ from those before it was cleared
+        version = '{}-{}'.format(metadata.get('generation', 0), metadata.get('modified', 0))
+
+        return version, modified
+
+    def _directory_programs(self, directory):
+        """Return the programs of the indexed files in a directory."""
+        query = select([FILES.c.program]).distinct().where(FILES.c.directory == directory)
+        return set(row.program for row in self.connection.execute(query))
+
+    def _record_change(self):
+        """Increase the generation of the index and record the time of
+        the change, within the current transaction."""
+        generation = self.connection.execute(
+            select([METADATA.c.value]).where(METADATA.c.key == 'generation')).scalar()
+        generation = 0 if generation is None else int(generation)
+        upsert(self.connection, METADATA, [{'key': 'generation', 'value': str(generation + 1)},
+                                           {'key': 'modified', 'value': repr(time.time())}])
+
+    def _update_proposals(self, programs=None):
+        """Summarize the files of the given programs, or of all programs
+        if ``None``, replacing their summaries, within the current
+        transaction."""
+        if programs is None:
+            self.connection.execute(PROPOSALS.delete())
+            programs = self.programs() + self.programs('thumbnail')
+        programs = sorted(set(program for program in programs if program is not None))
+        if len(programs) == 0:
+            return
+
+        self.connection.execute(PROPOSALS.delete().where(PROPOSALS.c.program.in_(programs)))
+
+        # The observation of a file is the program and observation number
+        # at the start of its name (e.g. ``jw86600008``)
+        updated = time.time()
+        observation = func.substr(FILES.c.filename, 1, 10)
+        query = select([FILES.c.instrument, FILES.c.program, func.count().label('num_files'),
+                        func.count(observation.distinct()).label('num_observations')]).where(
+            and_(FILES.c.category == 'fits', FILES.c.instrument.isnot(None), FILES.c.program.in_(programs))).group_by(
+            FILES.c.instrument, FILES.c.program)
+        summaries = {(row.instrument, row.program): dict(row, thumbnail=None, updated=updated)
+                     for row in self.connection.execute(query)}
+
+        # The first rate thumbnail of each proposal, as a path relative to
+        # the thumbnail directory
+        query = select([FILES.c.instrument, FILES.c.program, func.min(FILES.c.path).label('path')]).where(
+            and_(FILES.c.category == 'thumbnail', FILES.c.instrument.isnot(None), FILES.c.program.in_(programs),
+                 FILES.c.suffix.in_(PROPOSAL_THUMBNAIL_SUFFIXES))).group_by(FILES.c.instrument, FILES.c.program)
+        for row in self.connection.execute(query):
+            if (row.instrument, row.program) in summaries:
+                summaries[(row.instrument, row.program)]['thumbnail'] = '/'.join(row.path.split(os.sep)[-2:])
+
+        upsert(self.connection, PROPOSALS, list(summaries.values()))
+
+    def _where(self, category, program=None, instrument=None, prefix=None, suffixes=None):
+        """Build the condition on the files for ``files`` and
+        ``count``."""
+        conditions = [FILES.c.category == category]
+        if prefix is not None and program is None and prefix.startswith('jw'):
+            program = prefix[2:7]
+        if program is not None:
+            conditions.append(FILES.c.program == '{:05d}'.format(int(program)))
+        if instrument is not None:
+            conditions.append(FILES.c.instrument == instrument.lower())
+        if prefix is not None:
+            conditions.append(FILES.c.filename.startswith(prefix, autoescape=True))
+        if suffixes is not None:
+            conditions.append(FILES.c.suffix.in_(suffixes))
+
+        return and_(*conditions)
+
+
+def get_index_roots():
+    """Return the directories of the ``jwql`` filesystem, preview images
+    and thumbnails, as used by the web application."""
+    jwql_dir = get_config()['jwql_dir']
+    return [os.path.join(jwql_dir, 'filesystem'),
+            os.path.join(jwql_dir, 'preview_images'),
+            os.path.join(jwql_dir, 'thumbnails')]
+
+
+def open_filesystem_index():
+    """Open the index in the ``jwqldb`` database.
+
+    The index is only built by running this module as a script, never
+    by the web application, so no files are found until it has been
+    built.
+
+    Returns
+    -------
+    index : FilesystemIndex
+        The open index, which should be closed after use
+    """
+    return FilesystemIndex()
+
+
+def parse_index_filename(filename):
+    """Determine the category, program, instrument, rootname and suffix
+    of a file.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file (e.g.
+        ``jw86600008001_02101_00007_guider2_uncal_integ0.jpg``)
+
+    Returns
+    -------
+    entry : tuple
+        ``(category, program, instrument, rootname, suffix)``, or
+        ``None`` if the file is not of a category that is indexed. The
+        rootname of ``jw86600008001_02101_00007_guider2_uncal_integ0.jpg``
+        is ``jw86600008001_02101_00007_guider2`` and its suffix is
+        ``uncal``.
+    """
+    for ending, category in FILE_CATEGORIES:
+        if filename.endswith(ending):
+            break
+    else:
+        return None
+
+    name = filename[:-len(ending)].split('_integ')[0]
+    rootname, _, suffix = name.rpartition('_')
+    program = filename[2:7] if filename.startswith('jw') else None
+
+    try:
+        filename_dict = filename_parser(filename)
+    except ValueError:
+        filename_dict = {}
+    if 'instrument' in filename_dict:
+        instrument = filename_dict['instrument'].lower()
+    elif 'detector' in filename_dict:
+        instrument = JWST_INSTRUMENT_NAMES_SHORTHAND.get(filename_dict['detector'][:3].lower())
+    else:
+        instrument = None
+    if instrument is None:
+        for fragment, instrument_name in INSTRUMENT_MATCH.items():
+            if '_{}'.format(fragment) in filename.lower():
+                instrument = instrument_name
+                break
+
+    return category, program, instrument, rootname, suffix
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Update the index of the jwql filesystem.')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Clear the index and scan all directories')
+    args = parser.parse_args()
+
+    module = os.path.basename(__file__).strip('.py')
+    configure_logging(module)
+
+    index = FilesystemIndex()
+    if args.rebuild:
+        index.clear()
+    start = time.time()
+    updated = index.update(get_index_roots())
+    logging.info('Scanned {} directories in {:.1f} s'.format(updated, time.time() - start))
+    index.close()
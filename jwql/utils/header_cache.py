@@ -0,0 +1,160 @@
+#! /usr/bin/env python
+
+"""A persistent cache of the headers of the files in the ``jwql``
+filesystem.
+
+The headers of every extension of a file are read with a single open of
+the file, without reading the data, and are stored as JSON in a table
+of the ``jwqldb`` database. The cached headers of a file are
+used for as long as its size and modification time are unchanged, so
+that header pages of the web application do not need to read the file
+again.
+
+Authors
+-------
+
+    - Lauren Chambers
+
+Use
+---
+
+    The table of the cache is created along with the other tables of
+    the database, by executing ``database_interface.py``. This module
+    can then be imported as such:
+
+    ::
+
+        from jwql.utils.header_cache import get_headers
+        headers = get_headers('jw86600008001_02101_00007_guider2_uncal.fits')
+        for header in headers:
+            print(header['EXTNAME'], header['keywords'], header['values'])
+"""
+
+import json
+import os
+
+from astropy.io import fits
+from sqlalchemy import select
+
+from jwql.database.database_interface import DatabaseStore
+from jwql.database.database_interface import FileHeader
+from jwql.database.database_interface import upsert
+
+# Table of the cache
+HEADERS = FileHeader.__table__
+
+# Keywords of header cards that are not recorded
+EXCLUDED_KEYWORDS = ['', 'COMMENT']
+
+
+class HeaderCache(DatabaseStore):
+    """A cache, in the ``jwqldb`` database, of the headers of files,
+    keyed on the path, size and modification time of each file.
+
+    Attributes
+    ----------
+    connection : obj
+        Connection to the database
+    engine : obj
+        Engine of the database
+
+    Methods
+    -------
+    clear()
+        Remove all headers from the cache
+    close()
+        Close the connection to the database
+    get(path)
+        Return the headers of a file, reading and caching them if needed
+    """
+
+    def clear(self):
+        """Remove all headers from the cache."""
+        self.connection.execute(HEADERS.delete())
+
+    def get(self, path):
+        """Return the headers of a file. Cached headers are returned if
+        the size and modification time of the file are unchanged;
+        otherwise the headers are read from the file and cached.
+
+        Parameters
+        ----------
+        path : str
+            Path of the fits file
+
+        Returns
+        -------
+        headers : list
+            The headers of each extension, as returned by
+            ``read_headers``
+        """
+        stat = os.stat(path)
+        row = self.connection.execute(select([HEADERS]).where(HEADERS.c.path == path)).fetchone()
+        if row is not None and row.size == stat.st_size and row.mtime == stat.st_mtime_ns:
+            return json.loads(row.headers)
+
+        headers = read_headers(path)
+        with self.connection.begin():
+            upsert(self.connection, HEADERS, [{'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                                               'headers': json.dumps(headers)}])
+
+        return headers
+
+
+def get_headers(path):
+    """Return the headers of a file, using the cache in the ``jwqldb``
+    database.
+
+    Parameters
+    ----------
+    path : str
+        Path of the fits file
+
+    Returns
+    -------
+    headers : list
+        The headers of each extension, as returned by ``read_headers``
+    """
+    with HeaderCache() as cache:
+        return cache.get(path)
+
+
+def read_headers(path):
+    """Read the headers of every extension of a file, with a single open
+    of the file and without reading the data.
+
+    Parameters
+    ----------
+    path : str
+        Path of the fits file
+
+    Returns
+    -------
+    headers : list
+        A dictionary for each extension, with the ``EXTNAME`` of the
+        extension (``PRIMARY`` for the first), and lists of the
+        ``keywords`` and ``values`` of its header cards. ``COMMENT``
+        and blank cards are not included. Values that are not strings,
+        numbers or booleans are converted to strings.
+    """
+    headers = []
+    with fits.open(path) as hdulist:
+        for ext, hdu in enumerate(hdulist):
+            header = {'keywords': [], 'values': []}
+            if ext == 0:
+                header['EXTNAME'] = 'PRIMARY'
+            else:
+                header['EXTNAME'] = hdu.header.get('EXTNAME', hdu.name)
+
+            for card in hdu.header.cards:
+                if card.keyword in EXCLUDED_KEYWORDS:
+                    continue
+                value = card.value
+                if not isinstance(value, (bool, int, float, str)):
+                    value = str(value)
+                header['keywords'].append(card.keyword)
+                header['values'].append(value)
+
+            headers.append(header)
+
+    return headers
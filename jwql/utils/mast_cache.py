@@ -0,0 +1,435 @@
+#! /usr/bin/env python
+
+"""A local cache of the results of MAST service queries.
+
+The web application and the monitors send the same queries to MAST
+many times (e.g. the list of files of an instrument, on every page
+view). The results are instead stored in a table of the ``jwqldb``
+database, keyed by a hash of the service and its parameters, and
+are returned from there until they are older than the time to live
+(TTL) of the service. Results that have expired, but are younger than
+the TTL plus the ``stale_while_revalidate`` time, are returned at once
+while a fresh copy is fetched from MAST in the background. The number
+of hits, misses, stale hits and errors of the cache are recorded. The
+queries that are sent to MAST are limited to ``MAST_RATE_LIMIT`` per
+second across all of the threads of a process.
+
+Authors
+-------
+
+    - Matthew Bourque
+
+Use
+---
+
+    The table of the cache is created along with the other tables of
+    the database, by executing ``database_interface.py``. This module
+    can then be imported and used in place of
+    ``Mast.service_request_async`` as such:
+
+    ::
+
+        from jwql.utils.mast_cache import mast_service_request
+        result = mast_service_request('Mast.Jwst.Filtered.Nircam', params)
+        data = result['data']
+
+    The cache can be cleared of expired results, or emptied, and its
+    size reported, from the command line:
+
+    ::
+
+        python mast_cache.py --prune
+        python mast_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from astroquery.mast import Mast
+from sqlalchemy import and_, func, select
+
+from jwql.database.database_interface import engine
+from jwql.database.database_interface import MastQueryResult
+from jwql.database.database_interface import upsert
+from jwql.utils.request_profile import profiled
+
+# Table of the cache
+RESULTS = MastQueryResult.__table__
+
+# Time, in seconds, for which results are fresh, by the start of the
+# service name. The longest matching start is used.
+SERVICE_TTLS = {'Mast.Jwst.Filtered': 900,
+                'Mast.Caom.Filtered': 3600}
+DEFAULT_TTL = 600
+
+# Time, in seconds, after the TTL during which an expired result is
+# still returned while it is fetched again in the background
+STALE_WHILE_REVALIDATE = 3600
+
+# Largest number of queries per second sent to MAST by a process
+MAST_RATE_LIMIT = 10
+
+# The cache shared by the callers in a process
+_SHARED_CACHE = None
+
+
+class MastCache():
+    """A cache, in the ``jwqldb`` database, of the results of MAST
+    service queries.
+
+    A connection to the database is taken from the pool of the engine
+    for each operation, so that a cache can be shared by the threads of
+    the web application.
+
+    Attributes
+    ----------
+    engine : obj
+        Engine of the database
+    service_function : function
+        Function that takes a service name and parameters and returns
+        the JSON result of the query
+    service_ttls : dict
+        Time to live of results, in seconds, by the start of the
+        service name
+    default_ttl : float
+        Time to live of the results of other services, in seconds
+    stale_while_revalidate : float
+        Time after the TTL during which expired results are returned
+        while they are fetched again. ``0`` to always wait for a fresh
+        result.
+
+    Methods
+    -------
+    clear()
+        Remove all results from the cache
+    fetched(service, params)
+        Return the time at which the cached result of a query was
+        fetched
+    prune()
+        Remove results that are too old to be returned
+    query(service, params)
+        Return the result of a query, from the cache if possible
+    size()
+        Return the number of results in the cache
+    statistics()
+        Return the hit and miss statistics of the cache
+    ttl(service)
+        Return the time to live of the results of a service
+    """
+
+    def __init__(self, bind=None, service_function=None, service_ttls=SERVICE_TTLS, default_ttl=DEFAULT_TTL,
+                 stale_while_revalidate=STALE_WHILE_REVALIDATE):
+        """Initialize the class.
+
+        Parameters
+        ----------
+        bind : obj
+            The ``SQLAlchemy`` engine of the database. The ``engine``
+            of ``database_interface`` is used if ``None``.
+        service_function : function
+            Function that takes a service name and parameters and
+            returns the JSON result of the query. If ``None``, MAST is
+            queried with ``astroquery``.
+        service_ttls : dict
+            Time to live of results, in seconds, by the start of the
+            service name
+        default_ttl : float
+            Time to live of the results of other services, in seconds
+        stale_while_revalidate : float
+            Time after the TTL during which expired results are
+            returned while they are fetched again
+        """
+        self.engine = engine if bind is None else bind
+        self.service_function = service_function or query_mast_service
+        self.service_ttls = service_ttls
+        self.default_ttl = default_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+
+        self._lock = threading.Lock()
+        self._revalidating = set()
+        self._statistics = {'hits': 0, 'misses': 0, 'stale_hits': 0, 'errors': 0}
+
+    def _count(self, statistic):
+        """Add one to a statistic of the cache."""
+        with self._lock:
+            self._statistics[statistic] += 1
+
+    def _fetch(self, key, service, params):
+        """Query MAST and store the result in the cache."""
+        result = self.service_function(service, params)
+        with self.engine.begin() as connection:
+            upsert(connection, RESULTS, [{'key': key, 'service': service, 'params': canonical_params(params),
+                                          'result': json.dumps(result), 'fetched': time.time()}])
+
+        return result
+
+    def _revalidate(self, key, service, params):
+        """Fetch a fresh copy of an expired result, keeping the expired
+        result if the query fails."""
+        try:
+            self._fetch(key, service, params)
+        except Exception as error:
+            self._count('errors')
+            logging.warning('Failed to refresh the cached result of {}: {}'.format(service, error))
+        finally:
+            with self._lock:
+                self._revalidating.discard(key)
+
+    def clear(self):
+        """Remove all results from the cache."""
+        self.engine.execute(RESULTS.delete())
+
+    def fetched(self, service, params):
+        """Return the time at which the cached result of a query was
+        fetched from MAST, if it is still returned by ``query``.
+
+        Parameters
+        ----------
+        service : str
+            Name of the MAST service (e.g. ``Mast.Jwst.Filtered.Nircam``)
+        params : dict
+            Parameters of the query
+
+        Returns
+        -------
+        fetched : float
+            The time at which the result was fetched, or ``None`` if
+            the query is not cached or its result is too old to be
+            returned
+        """
+        fetched = self.engine.execute(
+            select([RESULTS.c.fetched]).where(RESULTS.c.key == cache_key(service, params))).scalar()
+        if fetched is None or time.time() - fetched > self.ttl(service) + self.stale_while_revalidate:
+            return None
+
+        return fetched
+
+    def prune(self):
+        """Remove results that are too old to be returned.
+
+        Returns
+        -------
+        count : int
+            The number of results removed
+        """
+        removed = 0
+        now = time.time()
+        with self.engine.begin() as connection:
+            services = [row.service for row in connection.execute(select([RESULTS.c.service]).distinct())]
+            for service in services:
+                max_age = self.ttl(service) + self.stale_while_revalidate
+                result = connection.execute(RESULTS.delete().where(
+                    and_(RESULTS.c.service == service, RESULTS.c.fetched < now - max_age)))
+                removed += result.rowcount
+
+        return removed
+
+    def query(self, service, params):
+        """Return the result of a query. A fresh result is returned from
+        the cache; an expired result within the
+        ``stale_while_revalidate`` time is returned and fetched again in
+        the background; otherwise MAST is queried.
+
+        Parameters
+        ----------
+        service : str
+            Name of the MAST service (e.g. ``Mast.Jwst.Filtered.Nircam``)
+        params : dict
+            Parameters of the query
+
+        Returns
+        -------
+        result : dict
+            The JSON result of the query
+        """
+        key = cache_key(service, params)
+        row = self.engine.execute(select([RESULTS.c.result, RESULTS.c.fetched]).where(RESULTS.c.key == key)).fetchone()
+
+        if row is not None:
+            age = time.time() - row.fetched
+            ttl = self.ttl(service)
+            if age <= ttl:
+                self._count('hits')
+                return json.loads(row.result)
+
+            if age <= ttl + self.stale_while_revalidate:
+                self._count('stale_hits')
+                with self._lock:
+                    start = key not in self._revalidating
+                    self._revalidating.add(key)
+                if start:
+                    threading.Thread(target=self._revalidate, args=(key, service, params), daemon=True).start()
+                return json.loads(row.result)
+
+        self._count('misses')
+        try:
+            return self._fetch(key, service, params)
+        except Exception:
+            self._count('errors')
+            raise
+
+    def size(self):
+        """Return the number of results in the cache."""
+        return self.engine.execute(select([func.count()]).select_from(RESULTS)).scalar()
+
+    def statistics(self):
+        """Return the hit and miss statistics of the cache.
+
+        Returns
+        -------
+        statistics : dict
+            The number of ``hits``, ``misses``, ``stale_hits`` and
+            ``errors``, and the ``hit_rate`` (the fraction of queries
+            answered from the cache)
+        """
+        with self._lock:
+            statistics = dict(self._statistics)
+        queries = statistics['hits'] + statistics['stale_hits'] + statistics['misses']
+        statistics['hit_rate'] = (statistics['hits'] + statistics['stale_hits']) / queries if queries else 0.
+
+        return statistics
+
+    def ttl(self, service):
+        """Return the time to live of the results of a service.
+
+        Parameters
+        ----------
+        service : str
+            Name of the MAST service
+
+        Returns
+        -------
+        ttl : float
+            Time to live, in seconds
+        """
+        matches = [start for start in self.service_ttls if service.startswith(start)]
+        if len(matches) == 0:
+            return self.default_ttl
+
+        return self.service_ttls[max(matches, key=len)]
+
+
+class RateLimiter():
+    """Limit the rate of calls made by any number of threads, by
+    spacing them at least ``1 / rate`` seconds apart.
+
+    Attributes
+    ----------
+    interval : float
+        Least time between calls, in seconds
+
+    Methods
+    -------
+    acquire()
+        Wait until the next call may be made
+    """
+
+    def __init__(self, rate):
+        """Initialize the class.
+
+        Parameters
+        ----------
+        rate : float
+            Largest number of calls per second
+        """
+        self.interval = 1. / rate
+        self._lock = threading.Lock()
+        self._next = 0.
+
+    def acquire(self):
+        """Wait until the next call may be made, reserving its time so
+        that other threads wait for later times."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+# The limit of the queries sent to MAST by a process
+_MAST_RATE_LIMITER = RateLimiter(MAST_RATE_LIMIT)
+
+
+def cache_key(service, params):
+    """Return the key of a query in the cache: a hash of the service
+    and the canonical form of its parameters.
+
+    Parameters
+    ----------
+    service : str
+        Name of the MAST service
+    params : dict
+        Parameters of the query
+
+    Returns
+    -------
+    key : str
+        The SHA-256 hash of the query
+    """
+    return hashlib.sha256('{}\n{}'.format(service, canonical_params(params)).encode()).hexdigest()
+
+
+def canonical_params(params):
+    """Return the parameters of a query as JSON with sorted keys, so
+    that equal parameters give the same string."""
+    return json.dumps(params, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def get_mast_cache():
+    """Return the cache shared by the callers in this process, creating
+    it if needed."""
+    global _SHARED_CACHE
+    if _SHARED_CACHE is None:
+        _SHARED_CACHE = MastCache()
+
+    return _SHARED_CACHE
+
+
+def mast_service_request(service, params):
+    """Return the JSON result of a MAST service query, using the shared
+    cache. This replaces ``Mast.service_request_async(service,
+    params)[0].json()``.
+
+    Parameters
+    ----------
+    service : str
+        Name of the MAST service (e.g. ``Mast.Jwst.Filtered.Nircam``)
+    params : dict
+        Parameters of the query
+
+    Returns
+    -------
+    result : dict
+        The JSON result of the query
+    """
+    with profiled('mast', service):
+        return get_mast_cache().query(service, params)
+
+
+def query_mast_service(service, params):
+    """Query a MAST service with ``astroquery`` and return the JSON
+    result, without using the cache. Queries are limited to
+    ``MAST_RATE_LIMIT`` per second."""
+    _MAST_RATE_LIMITER.acquire()
+    response = Mast.service_request_async(service, params)
+    return response[0].json()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Manage the cache of MAST query results.')
+    parser.add_argument('--prune', action='store_true', help='Remove results that are too old to be returned')
+    parser.add_argument('--clear', action='store_true', help='Remove all results')
+    args = parser.parse_args()
+
+    cache = get_mast_cache()
+    if args.clear:
+        cache.clear()
+    elif args.prune:
+        print('Removed {} results'.format(cache.prune()))
+    print('{} results in the cache'.format(cache.size()))
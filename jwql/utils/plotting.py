@@ -23,12 +23,58 @@ Use:
                           'deliver': {'foo': 62, 'bar': 20, 'baz': 9}})
         data = data.reset_index()
         plt = plotting.bar_chart(data, 'index')
+
+    Long time series can be plotted from a downsampled source, which
+    is shown in more detail when the plot is zoomed in:
+
+    ::
+
+        source = plotting.downsampled_source(plt, data, 'time', 'value')
+        plt.line(x='time', y='value', source=source)
 """
 
-from bokeh.models import ColumnDataSource, FactorRange, HoverTool
+from bokeh.models import ColumnDataSource, CustomJS, FactorRange, HoverTool
 from bokeh.palettes import Category20c
 from bokeh.plotting import figure
 from bokeh.transform import factor_cmap
+import numpy as np
+
+from jwql.utils.downsample import DEFAULT_POINTS, downsample
+
+# Number of points of each level of detail of a downsampled series,
+# relative to the previous level, and the largest number of points of
+# the finest level. Only the levels are sent to the browser, so a long
+# series is never sent in full.
+ZOOM_LEVEL_FACTOR = 4
+MAX_ZOOM_POINTS = 20 * DEFAULT_POINTS
+
+# Show the points of the finest level of detail that has at most
+# ``n_out`` points in the visible part of a downsampled plot, and the
+# downsampled points if there is no such level
+DETAIL_ON_ZOOM = """
+function bisect(xs, value) {
+    let low = 0, high = xs.length;
+    while (low < high) {
+        const middle = (low + high) >> 1;
+        if (xs[middle] < value) { low = middle + 1; } else { high = middle; }
+    }
+    return low;
+}
+let data = Object.assign({}, reduced.data);
+for (let level = levels.length - 1; level >= 0; level--) {
+    const xs = levels[level].data[x];
+    const start = Math.max(bisect(xs, x_range.start) - 1, 0);
+    const end = Math.min(bisect(xs, x_range.end) + 1, xs.length);
+    if (end - start <= n_out) {
+        data = {};
+        for (const column in levels[level].data) {
+            data[column] = levels[level].data[column].slice(start, end);
+        }
+        break;
+    }
+}
+source.data = data;
+"""
 
 
 def bar_chart(dataframe, groupcol, datacols=None, **kwargs):
@@ -83,3 +129,76 @@ def bar_chart(dataframe, groupcol, datacols=None, **kwargs):
     plt.xgrid.grid_line_color = None
 
     return plt
+
+
+def downsampled_source(plot, data, x, y, n_out=DEFAULT_POINTS, method='lttb', source=None,
+                       max_points=MAX_ZOOM_POINTS):
+    """Return a ``ColumnDataSource`` of at most about ``n_out`` points
+    of a time series, selected with ``jwql.utils.downsample``, for the
+    glyphs of ``plot``.
+
+    Finer levels of detail, each with ``ZOOM_LEVEL_FACTOR`` times more
+    points than the previous one, are also sent to the browser, up to
+    the full series or ``max_points`` points, whichever is fewer. When
+    the plot is zoomed in, the points of the finest level that has at
+    most ``n_out`` points in the visible part of the series are shown
+    instead, so that series with at most ``max_points`` points are
+    shown at full resolution, and longer series are never sent in
+    full.
+
+    Parameters
+    ----------
+    plot : bokeh.plotting.figure.Figure
+        The plot that the glyphs of the source are drawn in
+    data : dict or pandas.DataFrame
+        The columns of the series, sorted by ``x``
+    x : str
+        Name of the column of ``x`` values (numbers or datetimes)
+    y : str
+        Name of the column of ``y`` values used to select the points
+    n_out : int
+        Number of points to show
+    method : str
+        ``lttb`` or ``min_max``
+    source : bokeh.models.ColumnDataSource
+        An existing source to fill with the downsampled points. A new
+        source is made if ``None``.
+    max_points : int
+        Largest number of points of the finest level of detail
+
+    Returns
+    -------
+    source : bokeh.models.ColumnDataSource
+        The source of the downsampled points
+    """
+    columns = {column: np.asarray(data[column]) for column in data.keys()}
+    length = len(columns[x])
+    indices = downsample(columns[x], columns[y], n_out, method=method)
+    reduced = {column: values[indices] for column, values in columns.items()}
+
+    if source is None:
+        source = ColumnDataSource(reduced)
+    else:
+        source.data = reduced
+
+    if len(indices) < length:
+        levels = []
+        n_level = n_out * ZOOM_LEVEL_FACTOR
+        while n_level < min(length, max_points):
+            level_indices = downsample(columns[x], columns[y], n_level, method=method)
+            levels.append({column: values[level_indices] for column, values in columns.items()})
+            n_level *= ZOOM_LEVEL_FACTOR
+        if length <= max_points:
+            levels.append(columns)
+        else:
+            level_indices = downsample(columns[x], columns[y], max_points, method=method)
+            levels.append({column: values[level_indices] for column, values in columns.items()})
+
+        callback = CustomJS(args={'source': source, 'levels': [ColumnDataSource(level) for level in levels],
+                                  'reduced': ColumnDataSource(reduced), 'x_range': plot.x_range,
+                                  'x': x, 'n_out': n_out},
+                            code=DETAIL_ON_ZOOM)
+        plot.x_range.js_on_change('start', callback)
+        plot.x_range.js_on_change('end', callback)
+
+    return source
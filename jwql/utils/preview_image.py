@@ -14,6 +14,19 @@ The lower and upper limits to be displayed are defined as the
 version of the image, with accompanying colorbar. The image is then
 saved.
 
+Alternatively, with ``renderer = 'pillow'``, the stretch and colormap
+are applied through a lookup table in ``numpy`` and the resulting RGB
+array is saved directly with ``Pillow``. The thumbnail and, unless
+``annotate`` is ``True``, the preview image are both made from this
+one array. The annotated preview (with axes and colorbar) is always
+made with ``matplotlib``.
+
+With ``tiled = True``, a multi-resolution pyramid of 256-pixel JPEG
+tiles is also saved for each integration, along with a JSON descriptor
+of the pyramid, so that large images can be viewed one region at a
+time. The levels of the pyramid are made by repeatedly block averaging
+the stretched, color-mapped RGB array by a factor of two.
+
 Authors:
 --------
 
@@ -34,14 +47,16 @@ Use:
         im.make_image()
 """
 
+import json
 import logging
 import os
 import socket
 
 from astropy.io import fits
 import numpy as np
+from PIL import Image
 
-from jwql.utils import permissions
+from jwql.utils import calculations, permissions
 
 # Use the 'Agg' backend to avoid invoking $DISPLAY
 import matplotlib
@@ -53,6 +68,18 @@ import matplotlib.colors as colors
 if 'build' and 'project' not in socket.gethostname():
     from jwst.datamodels import dqflags
 
+# Number of signal levels in the lookup table used by the pillow renderer
+STRETCH_LEVELS = 4096
+
+# Pixels per inch of ``max_img_size`` for images saved by the pillow renderer
+PREVIEW_DPI = 100
+
+# Size of the longest dimension of thumbnails saved by the pillow renderer
+THUMBNAIL_SIZE = 256
+
+# Width and height of the tiles in tile pyramids
+TILE_SIZE = 256
+
 
 class PreviewImage():
     """An object for generating and saving preview images, used by
@@ -60,6 +87,10 @@ class PreviewImage():
 
     Attributes
     ----------
+    annotate : bool
+        If ``True`` (default), the preview image is made with
+        ``matplotlib`` and includes axes, a title, and a colorbar.
+        Only used when ``renderer`` is ``pillow``.
     clip_percent : float
         The amount to sigma clip the input data by when scaling the
         preview image.  Default is 0.01.
@@ -69,16 +100,43 @@ class PreviewImage():
     data : obj
         The data used to generate the preview image.
     dq : obj
-        The DQ data used to generate the preview image.
+        The DQ data used to generate the preview image.  When
+        ``low_memory`` is ``True``, the ``PIXELDQ`` extension is only
+        read the first time this attribute is accessed.
     file : str
         The filename to generate the preview image from.
+    first_integration : int
+        The integration number of the first integration in ``data``,
+        used to label and name the outputs when the integrations of an
+        exposure are processed separately.  Default is 0.
+    limit_error : float or None
+        Maximum error on the percentile of the display limits, as a
+        fraction of the science pixels. Default is ``None``, which
+        finds the limits exactly.
+    low_memory : bool
+        If ``True``, only the first and last group of each integration
+        are read from the input file, as ``float32``.
     output_format : str
         The format to which the preview image is saved.  Options are
         ``jpg`` and ``thumb``
+    preview_images : list
+        The preview images saved by ``make_image``.
     preview_output_directory : str or None
         The output directory to which the preview image is saved.
+    renderer : str
+        The library used to make the images.  Options are
+        ``matplotlib`` (default) and ``pillow``.
     scaling : str
         The scaling used in the preview image.  Default is ``log``.
+    thumbnail_images : list
+        The thumbnails saved by ``make_image``.
+    tile_pyramids : list
+        The JSON descriptors of the tile pyramids saved by
+        ``make_image``.
+    tiled : bool
+        If ``True``, a tile pyramid is saved for each integration in
+        addition to the preview image and thumbnail.  Default is
+        ``False``.
     thumbnail_output_directory : str or None
         The output directory to which the thumbnail is saved.
 
@@ -86,20 +144,28 @@ class PreviewImage():
     -------
     difference_image(data)
         Create a difference image from the data
-    find_limits(data, pixmap, clipperc)
+    find_limits(data, pixmap, clipperc, max_error)
         Find the min and max signal levels after clipping by
         ``clipperc``
     get_data(filename, ext)
         Read in data from the given ``filename`` and ``ext``
+    get_dq(filename, shape)
+        Read in the map of science pixels from the given ``filename``
     make_figure(image, integration_number, min_value, max_value, scale, maxsize, thumbnail)
         Create the ``matplotlib`` figure
     make_image(max_img_size)
         Main function
+    make_rgb(image, min_value, max_value, scale)
+        Create a stretched, color-mapped RGB array of the image
     save_image(fname, thumbnail)
         Save the figure
+    save_rgb(rgb, fname, maxsize, thumbnail)
+        Save an RGB array with ``Pillow``
+    save_tiles(rgb, fname, min_value, max_value)
+        Save an RGB array as a tile pyramid
     """
 
-    def __init__(self, filename, extension):
+    def __init__(self, filename, extension, low_memory=False, read_data=True):
         """Initialize the class.
 
         Parameters
@@ -108,17 +174,49 @@ class PreviewImage():
             Name of fits file containing data
         extension : str
             Extension name to be read in
+        low_memory : bool
+            If ``True``, read only the first and last group of each
+            integration from the file, return ``float32`` data, and defer reading the ``PIXELDQ`` extension until
+            ``dq`` is needed
+        read_data : bool
+            If ``False``, the file is not read, and ``data`` and ``dq``
+            must be set before ``make_image`` is called (e.g. to a
+            mosaic of several files)
         """
+        self.annotate = True
         self.clip_percent = 0.01
         self.cmap = 'viridis'
         self.file = filename
+        self.first_integration = 0
+        self.limit_error = None
+        self.low_memory = low_memory
         self.output_format = 'jpg'
+        self.preview_images = []
         self.preview_output_directory = None
+        self.renderer = 'matplotlib'
         self.scaling = 'log'
+        self.thumbnail_images = []
         self.thumbnail_output_directory = None
+        self.tile_pyramids = []
+        self.tiled = False
 
         # Read in file
-        self.data, self.dq = self.get_data(self.file, extension)
+        if read_data:
+            self.data, self.dq = self.get_data(self.file, extension)
+        else:
+            self.data, self.dq = None, None
+
+    @property
+    def dq(self):
+        """The map of science pixels, read from the file on first access
+        if it was not read along with the data."""
+        if self._dq is None:
+            self._dq = self.get_dq(self.file, self.data.shape)
+        return self._dq
+
+    @dq.setter
+    def dq(self, value):
+        self._dq = value
 
     def difference_image(self, data):
         """
@@ -139,7 +237,7 @@ class PreviewImage():
         """
         return data[:, -1, :, :] - data[:, 0, :, :]
 
-    def find_limits(self, data, pixmap, clipperc):
+    def find_limits(self, data, pixmap, clipperc, max_error=None):
         """
         Find the minimum and maximum signal levels after clipping the
         top and bottom ``clipperc`` of the pixels.
@@ -155,24 +253,30 @@ class PreviewImage():
         clipperc : float
             Fraction of top and bottom signal levels to clip (e.g. 0.01
             means to clip brightest and dimmest 1% of pixels)
+        max_error : float
+            Maximum error on the percentile of each limit, as a
+            fraction of the science pixels. If ``None``, the limits are
+            exact. Otherwise they are estimated from a deterministic
+            subsample of the pixels.
 
         Returns
         -------
         results : tuple
             Tuple of floats, minimum and maximum signal levels
         """
-        nelem = np.sum(pixmap)
-        numclip = np.int(clipperc * nelem)
-        sorted = np.sort(data[pixmap], axis=None)
-        minval = sorted[numclip]
-        maxval = sorted[-numclip - 1]
-        return (minval, maxval)
+        return calculations.clipped_limits(data, pixmap, clipperc, max_error=max_error)
 
     def get_data(self, filename, ext):
         """
         Read in the data from the given file and extension.  Also find
         how many rows/cols of reference pixels are present.
 
+        If ``low_memory`` is ``True``, 4D data are read through the
+        extension's ``section`` so that only the first and last group of
+        each integration are read from disk. The data are returned as ``float32`` and the
+        ``PIXELDQ`` extension is not read (``dq`` is returned as
+        ``None`` and read later by ``get_dq`` when needed).
+
         Parameters
         ----------
         filename : str
@@ -187,28 +291,27 @@ class PreviewImage():
         dq : obj
             2D ``ndarray`` boolean map of reference pixels. Science
             pixels flagged as ``True`` and non-science pixels are
-            ``False``
+            ``False``. ``None`` if ``low_memory`` is ``True``.
         """
         if os.path.isfile(filename):
-            extnames = []
             with fits.open(filename) as hdulist:
-                for exten in hdulist:
-                    try:
-                        extnames.append(exten.header['EXTNAME'])
-                    except:
-                        pass
+                extnames = self._get_extnames(hdulist)
                 if ext in extnames:
-                    dimensions = len(hdulist[ext].data.shape)
-                    if dimensions == 4:
-                        data = hdulist[ext].data[:, [0, -1], :, :].astype(np.float)
+                    if self.low_memory:
+                        data = self._read_data_low_memory(hdulist[ext])
                     else:
-                        data = hdulist[ext].data.astype(np.float)
+                        dimensions = len(hdulist[ext].data.shape)
+                        if dimensions == 4:
+                            data = hdulist[ext].data[:, [0, -1], :, :].astype(np.float64)
+                        else:
+                            data = hdulist[ext].data.astype(np.float64)
                 else:
                     raise ValueError('WARNING: no {} extension in {}!'.format(ext, filename))
 
-                if 'PIXELDQ' in extnames:
-                    dq = hdulist['PIXELDQ'].data
-                    dq = (dq & dqflags.pixel['NON_SCIENCE'] == 0)
+                if self.low_memory:
+                    dq = None
+                elif 'PIXELDQ' in extnames:
+                    dq = self._science_pixel_map(hdulist['PIXELDQ'].data)
                 else:
                     yd, xd = data.shape[-2:]
                     dq = np.ones((yd, xd), dtype="bool")
@@ -229,6 +332,86 @@ class PreviewImage():
 
         return data, dq
 
+    def get_dq(self, filename, shape):
+        """
+        Read in the map of science pixels from the ``PIXELDQ`` extension
+        of the given file. If there is no ``PIXELDQ`` extension, all
+        pixels are treated as science pixels.
+
+        Parameters
+        ----------
+        filename : str
+            Name of fits file containing data
+        shape : tuple
+            Shape of the science data. The last two elements give the
+            shape of the returned map.
+
+        Returns
+        -------
+        dq : obj
+            2D ``ndarray`` boolean map of reference pixels. Science
+            pixels flagged as ``True`` and non-science pixels are
+            ``False``
+        """
+        dq = None
+        if os.path.isfile(filename):
+            with fits.open(filename) as hdulist:
+                if 'PIXELDQ' in self._get_extnames(hdulist):
+                    dq = self._science_pixel_map(hdulist['PIXELDQ'].data)
+
+        if dq is None:
+            yd, xd = shape[-2:]
+            dq = np.ones((yd, xd), dtype="bool")
+
+        return dq
+
+    def _get_extnames(self, hdulist):
+        """Return the ``EXTNAME`` of each extension in ``hdulist``."""
+        extnames = []
+        for exten in hdulist:
+            try:
+                extnames.append(exten.header['EXTNAME'])
+            except KeyError:
+                pass
+        return extnames
+
+    def _read_data_low_memory(self, hdu):
+        """Read the data needed for the preview image from an HDU as
+        ``float32``. For 4D data only the first and last group of each
+        integration are read from disk.
+
+        Parameters
+        ----------
+        hdu : obj
+            ``astropy.io.fits`` image HDU
+
+        Returns
+        -------
+        data : obj
+            ``float32`` ``numpy`` ``ndarray``. 4D data are returned
+            with shape ``(nints, 2, ny, nx)``.
+        """
+        shape = hdu.shape
+        if len(shape) == 4:
+            nints, ngroups, ny, nx = shape
+            data = np.empty((nints, 2, ny, nx), dtype=np.float32)
+
+            # Section access applies any BZERO/BSCALE scaling to the
+            # requested frames only, rather than to the whole ramp
+            for integration in range(nints):
+                data[integration, 0, :, :] = hdu.section[integration, 0, :, :]
+                data[integration, 1, :, :] = hdu.section[integration, ngroups - 1, :, :]
+        else:
+            data = np.array(hdu.data, dtype=np.float32)
+
+        return data
+
+    def _science_pixel_map(self, pixeldq):
+        """Convert a ``PIXELDQ`` array into a boolean map that is
+        ``True`` for science pixels and ``False`` for non-science
+        pixels."""
+        return (pixeldq & dqflags.pixel['NON_SCIENCE']) == 0
+
     def make_figure(self, image, integration_number, min_value, max_value,
                     scale, maxsize=8, thumbnail=False):
         """
@@ -349,7 +532,7 @@ class PreviewImage():
         # If preview image, set a title
         if not thumbnail:
             filename = os.path.split(self.file)[-1]
-            ax.set_title(filename + ' Int: {}'.format(np.int(integration_number)))
+            ax.set_title(filename + ' Int: {}'.format(int(integration_number)))
 
     def make_image(self, max_img_size=8):
         """The main function of the ``PreviewImage`` class."""
@@ -369,36 +552,124 @@ class PreviewImage():
             diff_img = np.expand_dims(diff_img, axis=0)
         nint, ny, nx = diff_img.shape
 
-        for i in range(nint):
-            frame = diff_img[i, :, :]
+        for index in range(nint):
+            frame = diff_img[index, :, :]
+            i = self.first_integration + index
 
             # Find signal limits for the display
             minval, maxval = self.find_limits(frame, self.dq,
-                                              self.clip_percent)
+                                              self.clip_percent,
+                                              max_error=self.limit_error)
 
-            # Create preview image matplotlib object
+            # Determine the output filenames
             indir, infile = os.path.split(self.file)
             suffix = '_integ{}.{}'.format(i, self.output_format)
             if self.preview_output_directory is None:
-                outdir = indir
+                preview_outdir = indir
             else:
-                outdir = self.preview_output_directory
-            outfile = os.path.join(outdir, infile.split('.')[0] + suffix)
-            self.make_figure(frame, i, minval, maxval, self.scaling.lower(),
-                             maxsize=max_img_size, thumbnail=False)
-            self.save_image(outfile, thumbnail=False)
-            plt.close()
-
-            # Create thumbnail image matplotlib object
+                preview_outdir = self.preview_output_directory
             if self.thumbnail_output_directory is None:
-                outdir = indir
+                thumbnail_outdir = indir
+            else:
+                thumbnail_outdir = self.thumbnail_output_directory
+            preview_outfile = os.path.join(preview_outdir, infile.split('.')[0] + suffix)
+            thumbnail_outfile = os.path.join(thumbnail_outdir, infile.split('.')[0] + suffix)
+
+            if self.renderer == 'pillow':
+
+                # Stretch and color map the frame once for all outputs
+                rgb = self.make_rgb(frame, minval, maxval, self.scaling.lower())
+
+                if self.annotate:
+                    self.make_figure(frame, i, minval, maxval, self.scaling.lower(),
+                                     maxsize=max_img_size, thumbnail=False)
+                    self.save_image(preview_outfile, thumbnail=False)
+                    plt.close()
+                else:
+                    self.save_rgb(rgb, preview_outfile, max_img_size * PREVIEW_DPI)
+
+                self.save_rgb(rgb, thumbnail_outfile, THUMBNAIL_SIZE, thumbnail=True)
+
+            elif self.renderer == 'matplotlib':
+
+                # Create preview image matplotlib object
+                self.make_figure(frame, i, minval, maxval, self.scaling.lower(),
+                                 maxsize=max_img_size, thumbnail=False)
+                self.save_image(preview_outfile, thumbnail=False)
+                plt.close()
+
+                # Create thumbnail image matplotlib object
+                self.make_figure(frame, i, minval, maxval, self.scaling.lower(),
+                                 maxsize=max_img_size, thumbnail=True)
+                self.save_image(thumbnail_outfile, thumbnail=True)
+                plt.close()
+
             else:
-                outdir = self.thumbnail_output_directory
-            outfile = os.path.join(outdir, infile.split('.')[0] + suffix)
-            self.make_figure(frame, i, minval, maxval, self.scaling.lower(),
-                             maxsize=max_img_size, thumbnail=True)
-            self.save_image(outfile, thumbnail=True)
-            plt.close()
+                raise ValueError('WARNING: renderer option {} not supported.'.format(self.renderer))
+
+            # Create the tile pyramid, reusing the RGB array of the
+            # pillow renderer if there is one
+            if self.tiled:
+                if self.renderer != 'pillow':
+                    rgb = self.make_rgb(frame, minval, maxval, self.scaling.lower())
+                tile_outfile = os.path.join(preview_outdir, infile.split('.')[0] + '_integ{}_tiles.json'.format(i))
+                self.save_tiles(rgb, tile_outfile, minval, maxval)
+
+    def make_rgb(self, image, min_value, max_value, scale):
+        """
+        Create an RGB array of the image, stretched and color mapped in
+        the same way as in ``make_figure``. The stretch and colormap
+        are combined into a single lookup table, indexed by the signal
+        level of each pixel.
+
+        Parameters
+        ----------
+        image : obj
+            2D ``numpy`` ``ndarray`` of floats
+
+        min_value : float
+            Minimum value for display
+
+        max_value : float
+            Maximum value for display
+
+        scale : str
+            Image scaling (``log``, ``linear``)
+
+        Returns
+        -------
+        rgb : obj
+            3D ``numpy`` ``ndarray`` of ``uint8`` with shape
+            ``(ny, nx, 3)``, flipped so that the first row of ``image``
+            is at the bottom. Pixels that are not finite are white.
+        """
+
+        # Check the input scaling
+        if scale not in ['linear', 'log']:
+            raise ValueError('WARNING: scaling option {} not supported.'.format(scale))
+
+        # Build the lookup table from signal level to color. For the log
+        # stretch, shift the data so that min_value maps to 1, as is done
+        # in make_figure
+        span = max_value - min_value
+        fraction = np.linspace(0., 1., STRETCH_LEVELS)
+        if scale == 'log' and span > 0:
+            fraction = np.log1p(fraction * span) / np.log1p(span)
+        lookup = plt.get_cmap(self.cmap)(fraction, bytes=True)[:, :3]
+
+        # Convert the image to signal levels, clipped to the display range
+        if span > 0:
+            levels = (image - min_value) * ((STRETCH_LEVELS - 1) / span)
+        else:
+            levels = np.zeros(image.shape)
+        bad = ~np.isfinite(levels)
+        levels[bad] = 0
+        np.clip(levels, 0, STRETCH_LEVELS - 1, out=levels)
+
+        rgb = lookup[levels.astype(np.uint16)]
+        rgb[bad] = 255
+
+        return rgb[::-1, :, :]
 
     def save_image(self, fname, thumbnail=False):
         """
@@ -425,6 +696,139 @@ class PreviewImage():
         if thumbnail:
             thumb_fname = fname.replace('.jpg', '.thumb')
             os.rename(fname, thumb_fname)
+            self.thumbnail_images.append(thumb_fname)
             logging.info('Saved image to {}'.format(thumb_fname))
         else:
+            self.preview_images.append(fname)
             logging.info('Saved image to {}'.format(fname))
+
+    def save_rgb(self, rgb, fname, maxsize, thumbnail=False):
+        """
+        Save an RGB array as an image using ``Pillow`` and set the
+        appropriate permissions. The image is block averaged down if
+        its longest dimension is larger than ``maxsize``.
+
+        Parameters
+        ----------
+        rgb : obj
+            3D ``numpy`` ``ndarray`` of ``uint8`` from ``make_rgb``
+
+        fname : str
+            Output filename
+
+        maxsize : int
+            Size of the longest dimension of the output image (pixels)
+
+        thumbnail : bool
+            True if saving a thumbnail image, false for the full
+            preview image.
+        """
+
+        image = Image.fromarray(rgb)
+        if max(image.size) > maxsize:
+            image.thumbnail((maxsize, maxsize), Image.BOX)
+
+        # Thumbnails are JPEGs with a '.thumb' extension
+        if thumbnail:
+            fname = fname.replace('.jpg', '.thumb')
+            image.save(fname, format='JPEG')
+            self.thumbnail_images.append(fname)
+        else:
+            image.save(fname)
+            self.preview_images.append(fname)
+        permissions.set_permissions(fname)
+        logging.info('Saved image to {}'.format(fname))
+
+    def save_tiles(self, rgb, fname, min_value, max_value):
+        """
+        Save an RGB array as a pyramid of ``TILE_SIZE`` JPEG tiles and
+        write a JSON descriptor of the pyramid. Each level of the
+        pyramid is made by block averaging the previous level by a
+        factor of two, down to a level that fits in a single tile.
+        Level 0 is the coarsest level. The tiles of each level are
+        saved as ``<level>/<column>_<row>.jpg`` in a directory with the
+        same name as the descriptor, where row 0 is the top of the
+        image.
+
+        Parameters
+        ----------
+        rgb : obj
+            3D ``numpy`` ``ndarray`` of ``uint8`` from ``make_rgb``
+
+        fname : str
+            Output filename of the JSON descriptor
+
+        min_value : float
+            Minimum value of the display range, recorded in the
+            descriptor
+
+        max_value : float
+            Maximum value of the display range, recorded in the
+            descriptor
+        """
+
+        # Make the levels from the finest to the coarsest
+        levels = [rgb]
+        while max(levels[-1].shape[:2]) > TILE_SIZE:
+            levels.append(_block_average(levels[-1]))
+        levels.reverse()
+
+        tile_directory = os.path.splitext(fname)[0]
+        os.makedirs(tile_directory, exist_ok=True)
+        permissions.set_permissions(tile_directory)
+        level_info = []
+        for level, level_rgb in enumerate(levels):
+            level_directory = os.path.join(tile_directory, str(level))
+            os.makedirs(level_directory, exist_ok=True)
+            permissions.set_permissions(level_directory)
+            ny, nx = level_rgb.shape[:2]
+            columns = -(-nx // TILE_SIZE)
+            rows = -(-ny // TILE_SIZE)
+            for row in range(rows):
+                for column in range(columns):
+                    tile = level_rgb[row * TILE_SIZE:(row + 1) * TILE_SIZE,
+                                     column * TILE_SIZE:(column + 1) * TILE_SIZE]
+                    tile_fname = os.path.join(level_directory, '{}_{}.jpg'.format(column, row))
+                    Image.fromarray(tile).save(tile_fname, format='JPEG')
+                    permissions.set_permissions(tile_fname)
+            level_info.append({'width': nx, 'height': ny, 'columns': columns, 'rows': rows})
+
+        descriptor = {'width': rgb.shape[1],
+                      'height': rgb.shape[0],
+                      'tile_size': TILE_SIZE,
+                      'format': 'jpg',
+                      'tiles': os.path.basename(tile_directory),
+                      'levels': level_info,
+                      'min_value': float(min_value),
+                      'max_value': float(max_value),
+                      'scaling': self.scaling.lower(),
+                      'cmap': self.cmap}
+        with open(fname, 'w') as f:
+            json.dump(descriptor, f)
+        permissions.set_permissions(fname)
+
+        self.tile_pyramids.append(fname)
+        logging.info('Saved {} level tile pyramid to {}'.format(len(levels), fname))
+
+
+def _block_average(rgb):
+    """Block average an RGB array by a factor of two in each direction.
+    Arrays with an odd number of rows or columns are padded by repeating
+    the last row or column.
+
+    Parameters
+    ----------
+    rgb : obj
+        3D ``numpy`` ``ndarray`` of ``uint8`` with shape ``(ny, nx, 3)``
+
+    Returns
+    -------
+    binned : obj
+        3D ``numpy`` ``ndarray`` of ``uint8`` with shape
+        ``(ceil(ny / 2), ceil(nx / 2), 3)``
+    """
+    ny, nx, nchannels = rgb.shape
+    if ny % 2 or nx % 2:
+        rgb = np.pad(rgb, ((0, ny % 2), (0, nx % 2), (0, 0)), mode='edge')
+    binned = rgb.reshape(rgb.shape[0] // 2, 2, rgb.shape[1] // 2, 2, nchannels).sum(axis=(1, 3), dtype=np.uint16)
+    return ((binned + 2) // 4).astype(np.uint8)
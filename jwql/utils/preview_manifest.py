@@ -0,0 +1,221 @@
+#! /usr/bin/env python
+
+"""A persistent record of the preview images and thumbnails made from
+the files in the ``jwql`` filesystem.
+
+The manifest is kept in tables of the ``jwqldb`` database, which
+record the size and modification time of each source file, the
+exposure group it was processed with, and the preview images and
+thumbnails that were made for that group.  ``generate_preview_images`` uses it to only process
+exposures that are new or that have been modified since their preview
+images were made, or whose preview images or thumbnails are missing.
+
+Authors
+-------
+
+    - Bryan Hilbert
+
+Use
+---
+
+    The tables of the manifest are created along with the other tables
+    of the database, by executing ``database_interface.py``. This
+    module can then be imported as such:
+
+    ::
+
+        from jwql.utils.preview_manifest import PreviewManifest
+        manifest = PreviewManifest()
+        stats = manifest.get_file_stats(file_list)
+        if manifest.status(file_list, stats) != 'current':
+            ...  # Make the preview images and thumbnails
+            manifest.record(file_list, stats, previews, thumbnails)
+        manifest.close()
+"""
+
+import os
+
+from sqlalchemy import select
+
+from jwql.database.database_interface import DatabaseStore
+from jwql.database.database_interface import PreviewManifestOutput
+from jwql.database.database_interface import PreviewManifestSource
+from jwql.database.database_interface import upsert
+
+# The possible results of ``PreviewManifest.status``
+MANIFEST_STATUSES = ['current', 'new', 'modified', 'stale']
+
+# Tables of the manifest
+OUTPUTS = PreviewManifestOutput.__table__
+SOURCES = PreviewManifestSource.__table__
+
+
+class PreviewManifest(DatabaseStore):
+    """A record, in the ``jwqldb`` database, of the source files and
+    outputs of ``generate_preview_images``.
+
+    Attributes
+    ----------
+    connection : obj
+        Connection to the database
+    engine : obj
+        Engine of the database
+
+    Methods
+    -------
+    clear()
+        Remove all entries from the manifest
+    close()
+        Close the connection to the database
+    get_file_stats(file_list)
+        Get the size and modification time of each file
+    group_id(file_list)
+        Return the identifier of an exposure group
+    outputs(file_list)
+        Return the recorded outputs of an exposure group
+    record(file_list, stats, previews, thumbnails, tiles)
+        Record the outputs made from an exposure group
+    status(file_list, stats)
+        Determine whether the outputs of an exposure group are up to date
+    """
+
+    def clear(self):
+        """Remove all entries from the manifest."""
+        with self.connection.begin():
+            self.connection.execute(SOURCES.delete())
+            self.connection.execute(OUTPUTS.delete())
+
+    @staticmethod
+    def get_file_stats(file_list):
+        """Get the size and modification time of each file.
+
+        Parameters
+        ----------
+        file_list : list
+            List of paths of the files in an exposure group
+
+        Returns
+        -------
+        stats : dict
+            Dictionary of ``(size, mtime)`` tuples keyed by filename,
+            where ``mtime`` is in nanoseconds
+        """
+        stats = {}
+        for filename in file_list:
+            file_stat = os.stat(filename)
+            stats[filename] = (file_stat.st_size, file_stat.st_mtime_ns)
+        return stats
+
+    @staticmethod
+    def group_id(file_list):
+        """Return the identifier of an exposure group. This changes if
+        files are added to or removed from the group.
+
+        Parameters
+        ----------
+        file_list : list
+            List of paths of the files in an exposure group
+
+        Returns
+        -------
+        group_id : str
+            The sorted basenames of the files, separated by ``;``
+        """
+        return ';'.join(sorted(os.path.basename(filename) for filename in file_list))
+
+    def outputs(self, file_list):
+        """Return the recorded outputs of an exposure group.
+
+        Parameters
+        ----------
+        file_list : list
+            List of paths of the files in an exposure group
+
+        Returns
+        -------
+        outputs : list
+            List of ``(path, output_type)`` tuples, where
+            ``output_type`` is ``preview``, ``thumbnail`` or ``tiles``
+        """
+        query = select([OUTPUTS.c.path, OUTPUTS.c.output_type]).where(
+            OUTPUTS.c.group_id == self.group_id(file_list))
+        return sorted((row.path, row.output_type) for row in self.connection.execute(query))
+
+    def record(self, file_list, stats, previews, thumbnails, tiles=None):
+        """Record the preview images and thumbnails made from an
+        exposure group, replacing any previous entries for its files.
+
+        Parameters
+        ----------
+        file_list : list
+            List of paths of the files in an exposure group
+        stats : dict
+            Sizes and modification times of the files, as returned by
+            ``get_file_stats`` before the outputs were made
+        previews : list
+            Paths of the preview images made from the group
+        thumbnails : list
+            Paths of the thumbnails made from the group
+        tiles : list
+            Paths of the JSON descriptors of the tile pyramids made
+            from the group, if any
+        """
+        group_id = self.group_id(file_list)
+        outputs = ([{'group_id': group_id, 'path': path, 'output_type': 'preview'} for path in previews]
+                   + [{'group_id': group_id, 'path': path, 'output_type': 'thumbnail'} for path in thumbnails]
+                   + [{'group_id': group_id, 'path': path, 'output_type': 'tiles'} for path in (tiles or [])])
+        with self.connection.begin():
+
+            # Forget the outputs of any group these files were in before
+            previous_groups = select([SOURCES.c.group_id]).where(SOURCES.c.filename.in_(file_list))
+            self.connection.execute(OUTPUTS.delete().where(OUTPUTS.c.group_id.in_(previous_groups)))
+            self.connection.execute(OUTPUTS.delete().where(OUTPUTS.c.group_id == group_id))
+
+            upsert(self.connection, SOURCES,
+                   [{'filename': filename, 'size': stats[filename][0], 'mtime': stats[filename][1],
+                     'group_id': group_id} for filename in file_list])
+            if len(outputs) > 0:
+                self.connection.execute(OUTPUTS.insert(), outputs)
+
+    def status(self, file_list, stats):
+        """Determine whether the outputs of an exposure group are up to
+        date.
+
+        Parameters
+        ----------
+        file_list : list
+            List of paths of the files in an exposure group
+        stats : dict
+            Sizes and modification times of the files, as returned by
+            ``get_file_stats``
+
+        Returns
+        -------
+        status : str
+            ``new`` if none of the files have been recorded,
+            ``modified`` if any of the files have changed size or
+            modification time since the outputs were made or the files
+            in the group have changed, ``stale`` if any of the recorded
+            outputs no longer exist, and ``current`` otherwise
+        """
+        group_id = self.group_id(file_list)
+        query = select([SOURCES]).where(SOURCES.c.filename.in_(file_list))
+        recorded = {row.filename: (row.size, row.mtime, row.group_id) for row in self.connection.execute(query)}
+
+        if len(recorded) == 0:
+            return 'new'
+
+        # Files added to or removed from the group count as modifications
+        if set(recorded) != set(file_list):
+            return 'modified'
+
+        for filename in file_list:
+            size, mtime, file_group_id = recorded[filename]
+            if file_group_id != group_id or (size, mtime) != stats[filename]:
+                return 'modified'
+
+        outputs = self.outputs(file_list)
+        if len(outputs) == 0 or not all(os.path.isfile(path) for path, output_type in outputs):
+            return 'stale'
+
+        return 'current'
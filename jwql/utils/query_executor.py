@@ -0,0 +1,231 @@
+#! /usr/bin/env python
+
+"""Run independent queries, such as MAST service requests, in parallel.
+
+Views and monitors that query MAST for several instruments or data
+products would otherwise wait for each query in turn. The
+``QueryExecutor`` runs the queries in a bounded pool of threads. Each
+attempt at a query is given a timeout, failed attempts are retried
+after an exponentially increasing delay, and the attempts can be
+limited to a rate shared by all threads. The results are returned in
+the order of the queries, whatever the order in which they finish.
+
+An attempt that times out cannot be stopped, and is left to finish in
+the background. It keeps its place among the ``max_workers`` queries
+that the executor runs at once until it finishes, so that queries that
+time out and are retried do not pile up.
+
+Authors
+-------
+
+    - Matthew Bourque
+
+Use
+---
+
+    This module can be imported and used as such:
+
+    ::
+
+        from jwql.utils.query_executor import QueryExecutor
+        executor = QueryExecutor()
+        results = executor.query_all([('Mast.Jwst.Filtered.Nircam', params),
+                                      ('Mast.Jwst.Filtered.Niriss', params)])
+
+    Any functions can be run in the same way:
+
+    ::
+
+        from functools import partial
+        counts = executor.run([partial(instrument_inventory, 'nircam'),
+                               partial(instrument_inventory, 'niriss')])
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+from jwql.utils.mast_cache import mast_service_request
+from jwql.utils.request_profile import bind_profile
+
+# Default number of queries run at once
+MAX_WORKERS = 8
+
+# Default time, in seconds, allowed for each attempt at a query
+QUERY_TIMEOUT = 300
+
+# Default number of times a failed query is tried again, and the delay,
+# in seconds, before the first retry. The delay doubles with each retry.
+QUERY_RETRIES = 2
+RETRY_BACKOFF = 1.
+
+
+class QueryExecutor():
+    """Run independent queries in a bounded pool of threads, with
+    timeouts, retries and an optional rate limit.
+
+    Attributes
+    ----------
+    max_workers : int
+        Largest number of queries run at once
+    timeout : float
+        Time, in seconds, allowed for each attempt at a query
+    retries : int
+        Number of times a failed or timed out query is tried again
+    backoff : float
+        Delay, in seconds, before the first retry. The delay doubles
+        with each retry.
+    rate_limiter : RateLimiter
+        Limit of the rate of attempts, shared by all threads, or
+        ``None``
+    service_function : function
+        Function that takes a service name and parameters and returns
+        the JSON result of the query, used by ``query_all``
+
+    Methods
+    -------
+    query_all(requests)
+        Return the results of service requests, made in parallel
+    run(calls)
+        Return the results of functions, called in parallel
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, timeout=QUERY_TIMEOUT, retries=QUERY_RETRIES,
+                 backoff=RETRY_BACKOFF, rate_limiter=None, service_function=None):
+        """Initialize the class.
+
+        Parameters
+        ----------
+        max_workers : int
+            Largest number of queries run at once
+        timeout : float
+            Time, in seconds, allowed for each attempt at a query
+        retries : int
+            Number of times a failed or timed out query is tried again
+        backoff : float
+            Delay, in seconds, before the first retry
+        rate_limiter : RateLimiter
+            Limit of the rate of attempts, shared by all threads. Queries
+            sent to MAST by ``mast_service_request`` are already limited,
+            so this is only needed for other services.
+        service_function : function
+            Function that takes a service name and parameters and
+            returns the JSON result of the query. If ``None``, MAST is
+            queried through the cache with ``mast_service_request``.
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = rate_limiter
+        self.service_function = service_function or mast_service_request
+
+        # The attempts running at once, including those that have timed
+        # out but not finished
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def _attempt(self, call):
+        """Make one attempt at a call, raising ``TimeoutError`` if it
+        does not finish within the timeout, or if no more calls can be
+        made because earlier attempts that timed out have not finished
+        within the timeout. A call that times out is left to finish in
+        the background."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError('No query finished within {} s to make room for another'.format(self.timeout))
+
+        outcome = {}
+
+        def target():
+            try:
+                outcome['result'] = call()
+            except Exception as error:
+                outcome['error'] = error
+            finally:
+                self._slots.release()
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            raise TimeoutError('Query did not finish within {} s'.format(self.timeout))
+        if 'error' in outcome:
+            raise outcome['error']
+
+        return outcome['result']
+
+    def _call(self, call):
+        """Make a call, retrying it after a delay if it fails."""
+        for attempt in range(self.retries + 1):
+            try:
+                return self._attempt(call)
+            except Exception as error:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logging.warning('Query failed ({}); retrying in {} s'.format(error, delay))
+                time.sleep(delay)
+
+    def query_all(self, requests, return_exceptions=False):
+        """Return the results of service requests, made in parallel.
+
+        Parameters
+        ----------
+        requests : list
+            ``(service, params)`` tuples of the service name and the
+            parameters of each request
+        return_exceptions : bool
+            If ``True``, the exception of a request that failed after
+            all retries is returned in place of its result
+
+        Returns
+        -------
+        results : list
+            The JSON result of each request, in the order of
+            ``requests``
+        """
+        calls = [lambda service=service, params=params: self.service_function(service, params)
+                 for service, params in requests]
+
+        return self.run(calls, return_exceptions=return_exceptions)
+
+    def run(self, calls, return_exceptions=False):
+        """Return the results of functions, called in parallel.
+
+        Parameters
+        ----------
+        calls : list
+            Functions that take no arguments (e.g. made with
+            ``functools.partial``)
+        return_exceptions : bool
+            If ``True``, the exception of a call that failed after all
+            retries is returned in place of its result. Otherwise the
+            exception of the first call that failed, in the order of
+            ``calls``, is raised once all calls have finished.
+
+        Returns
+        -------
+        results : list
+            The result of each call, in the order of ``calls``
+        """
+        if len(calls) == 0:
+            return []
+
+        # The calls are profiled as part of the caller's request
+        calls = [bind_profile(call) for call in calls]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(calls))) as pool:
+            futures = [pool.submit(self._call, call) for call in calls]
+
+        results = []
+        for future in futures:
+            error = future.exception()
+            if error is None:
+                results.append(future.result())
+            elif return_exceptions:
+                results.append(error)
+            else:
+                raise error
+
+        return results
@@ -0,0 +1,370 @@
+#! /usr/bin/env python
+
+"""A persistent queue of preview images to be made in the background.
+
+The web application submits a job to the queue when the preview image
+of a file is missing (or needs to be rewritten), rather than making it
+during the request. The jobs are stored in a table of the ``jwqldb``
+database, and are made by a pool of worker processes that take the
+oldest pending job from the queue. A job for a
+file that is already pending or being made is not submitted again;
+the existing job is returned instead. Jobs that have been running for
+longer than ``STALE_JOB_AGE`` are assumed to have been abandoned by a
+worker that stopped, and are returned to the queue whenever a job is
+claimed or submitted. The web application can poll the status of a job
+and its position in the queue.
+
+Authors
+-------
+
+    - Bryan Hilbert
+
+Use
+---
+
+    The table of the queue is created along with the other tables of
+    the database, by executing ``database_interface.py``. The worker
+    processes are started as such:
+
+    ::
+
+        python render_queue.py --processes 4
+
+    Jobs are submitted and polled from the web application as such:
+
+    ::
+
+        from jwql.utils.render_queue import RenderQueue
+        queue = RenderQueue()
+        job_id = queue.submit(filename, preview_output_directory, thumbnail_output_directory)
+        job = queue.job(job_id)
+        queue.close()
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+
+from sqlalchemy import and_, func, select
+
+from jwql.database.database_interface import engine
+from jwql.database.database_interface import DatabaseStore
+from jwql.database.database_interface import RenderJob
+from jwql.utils.logging_functions import configure_logging
+from jwql.utils.preview_image import PreviewImage
+from jwql.utils.utils import get_config
+
+# The possible statuses of a job
+JOB_STATUSES = ['pending', 'running', 'done', 'failed']
+
+# Time, in seconds, that idle workers wait before checking for new jobs
+POLL_INTERVAL = 1
+
+# Time, in seconds, after which a running job is assumed to have been
+# abandoned by its worker and is returned to the queue
+STALE_JOB_AGE = 3600
+
+# Table of the queue
+JOBS = RenderJob.__table__
+
+
+class RenderQueue(DatabaseStore):
+    """A queue, in the ``jwqldb`` database, of preview images to be
+    made.
+
+    Attributes
+    ----------
+    connection : obj
+        Connection to the database
+    engine : obj
+        Engine of the database
+
+    Methods
+    -------
+    claim(max_age)
+        Take the oldest pending job from the queue
+    close()
+        Close the connection to the database
+    complete(job_id, outputs)
+        Record that a job has been done
+    fail(job_id, error)
+        Record that a job has failed
+    job(job_id)
+        Return the status of a job
+    requeue_stale(max_age)
+        Return abandoned running jobs to the queue
+    submit(filename, preview_output_directory, thumbnail_output_directory, max_age)
+        Add a job to the queue, unless the same job is already queued
+    """
+
+    def claim(self, max_age=STALE_JOB_AGE):
+        """Take the oldest pending job from the queue and mark it as
+        running, after returning abandoned running jobs to the queue.
+
+        Parameters
+        ----------
+        max_age : float
+            Time, in seconds, after which a running job is requeued
+
+        Returns
+        -------
+        job : dict
+            The job (see ``job``), or ``None`` if there are no pending
+            jobs
+        """
+
+        self.requeue_stale(max_age)
+
+        # Claim the job with a single statement, so that two workers
+        # cannot take the same job. PostgreSQL skips jobs that another
+        # worker is claiming, and the status is checked again in case
+        # the job was claimed while waiting for it.
+        claim = uuid.uuid4().hex
+        oldest = select([JOBS.c.id]).where(JOBS.c.status == 'pending').order_by(JOBS.c.id).limit(1).with_for_update(
+            skip_locked=True).as_scalar()
+        with self.connection.begin():
+            self.connection.execute(JOBS.update().where(and_(JOBS.c.id == oldest, JOBS.c.status == 'pending')).values(
+                status='running', claim=claim, started=time.time()))
+        job_id = self.connection.execute(select([JOBS.c.id]).where(JOBS.c.claim == claim)).scalar()
+
+        if job_id is None:
+            return None
+        return self.job(job_id)
+
+    def complete(self, job_id, outputs):
+        """Record that a job has been done.
+
+        Parameters
+        ----------
+        job_id : int
+            The job identifier
+        outputs : list
+            Paths of the preview images made by the job
+        """
+        self.connection.execute(JOBS.update().where(JOBS.c.id == job_id).values(
+            status='done', finished=time.time(), outputs=json.dumps(outputs)))
+
+    def fail(self, job_id, error):
+        """Record that a job has failed.
+
+        Parameters
+        ----------
+        job_id : int
+            The job identifier
+        error : str
+            Description of the error
+        """
+        self.connection.execute(JOBS.update().where(JOBS.c.id == job_id).values(
+            status='failed', finished=time.time(), error=error))
+
+    def job(self, job_id):
+        """Return the status of a job.
+
+        Parameters
+        ----------
+        job_id : int
+            The job identifier
+
+        Returns
+        -------
+        job : dict
+            Dictionary with keys ``id``, ``filename``,
+            ``preview_output_directory``, ``thumbnail_output_directory``,
+            ``status`` (one of ``JOB_STATUSES``), ``position`` (the
+            number of pending jobs ahead of this one, or ``None`` if it
+            is not pending), ``submitted``, ``started`` and
+            ``finished`` (times, or ``None``), ``outputs`` (paths of
+            the preview images made) and ``error``. ``None`` if there
+            is no such job.
+        """
+        row = self.connection.execute(select([JOBS]).where(JOBS.c.id == job_id)).fetchone()
+        if row is None:
+            return None
+
+        job = {key: row[key] for key in ['id', 'filename', 'preview_output_directory',
+                                         'thumbnail_output_directory', 'status', 'submitted',
+                                         'started', 'finished', 'error']}
+        job['outputs'] = json.loads(row['outputs']) if row['outputs'] else []
+        job['position'] = None
+        if job['status'] == 'pending':
+            job['position'] = self.connection.execute(select([func.count()]).select_from(JOBS).where(
+                and_(JOBS.c.status == 'pending', JOBS.c.id < job_id))).scalar()
+
+        return job
+
+    def requeue_stale(self, max_age=STALE_JOB_AGE):
+        """Return jobs that have been running for longer than
+        ``max_age`` to the queue, as their worker has probably stopped.
+
+        Parameters
+        ----------
+        max_age : float
+            Time, in seconds, after which a running job is requeued
+
+        Returns
+        -------
+        count : int
+            The number of jobs returned to the queue
+        """
+        result = self.connection.execute(JOBS.update().where(
+            and_(JOBS.c.status == 'running', JOBS.c.started < time.time() - max_age)).values(
+            status='pending', claim=None, started=None))
+        return result.rowcount
+
+    def submit(self, filename, preview_output_directory, thumbnail_output_directory, max_age=STALE_JOB_AGE):
+        """Add a job to make the preview images of a file to the queue.
+        If a job for the same file and output directories is already
+        pending or running, it is returned instead. A job that has been
+        running for longer than ``max_age`` is returned to the queue
+        first, so that it is returned as pending rather than as running
+        forever.
+
+        Parameters
+        ----------
+        filename : str
+            Path of the fits file
+        preview_output_directory : str
+            Directory in which to save the preview images
+        thumbnail_output_directory : str
+            Directory in which to save the thumbnails
+        max_age : float
+            Time, in seconds, after which a running job is requeued
+
+        Returns
+        -------
+        job_id : int
+            The job identifier
+        """
+        self.requeue_stale(max_age)
+        with self.connection.begin():
+            job_id = self.connection.execute(select([JOBS.c.id]).where(
+                and_(JOBS.c.filename == filename, JOBS.c.preview_output_directory == preview_output_directory,
+                     JOBS.c.thumbnail_output_directory == thumbnail_output_directory,
+                     JOBS.c.status.in_(['pending', 'running']))).order_by(JOBS.c.id).limit(1)).scalar()
+            if job_id is not None:
+                return job_id
+
+            result = self.connection.execute(JOBS.insert().values(
+                filename=filename, preview_output_directory=preview_output_directory,
+                thumbnail_output_directory=thumbnail_output_directory, status='pending', submitted=time.time()))
+
+        return result.inserted_primary_key[0]
+
+
+def render_job(job):
+    """Make the preview images and thumbnails of a job.
+
+    Parameters
+    ----------
+    job : dict
+        The job, as returned by ``RenderQueue.claim``
+
+    Returns
+    -------
+    outputs : list
+        Paths of the preview images that were made
+    """
+    for directory in [job['preview_output_directory'], job['thumbnail_output_directory']]:
+        os.makedirs(directory, exist_ok=True)
+
+    im = PreviewImage(job['filename'], 'SCI', low_memory=True)
+    im.preview_output_directory = job['preview_output_directory']
+    im.thumbnail_output_directory = job['thumbnail_output_directory']
+    im.make_image()
+
+    return im.preview_images
+
+
+def run_worker(poll_interval=POLL_INTERVAL, max_jobs=None, bind=None):
+    """Take jobs from the queue and make their preview images until
+    stopped, or until ``max_jobs`` jobs have been made.
+
+    Parameters
+    ----------
+    poll_interval : float
+        Time, in seconds, to wait before checking for new jobs when
+        the queue is empty
+
+    max_jobs : int
+        Number of jobs after which to stop. If ``None``, the worker
+        runs until it is stopped.
+
+    bind : obj
+        The engine of the database of the queue. The ``engine`` of
+        ``database_interface`` is used if ``None``.
+    """
+    queue = RenderQueue(bind)
+    jobs = 0
+    try:
+        while max_jobs is None or jobs < max_jobs:
+            job = queue.claim()
+            if job is None:
+                if max_jobs is not None:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            try:
+                outputs = render_job(job)
+            except Exception as error:
+                logging.error('Failed to make preview images for {}: {}'.format(job['filename'], error))
+                queue.fail(job['id'], str(error))
+            else:
+                logging.info('Made preview images for {}'.format(job['filename']))
+                queue.complete(job['id'], outputs)
+            jobs += 1
+    finally:
+        queue.close()
+
+
+def start_workers(processes, poll_interval=POLL_INTERVAL):
+    """Start a pool of worker processes and wait for them, returning
+    abandoned jobs to the queue first. The workers also return jobs
+    abandoned while they run to the queue.
+
+    Parameters
+    ----------
+    processes : int
+        Number of worker processes
+
+    poll_interval : float
+        Time, in seconds, that idle workers wait before checking for
+        new jobs
+    """
+    queue = RenderQueue()
+    requeued = queue.requeue_stale()
+    queue.close()
+    if requeued > 0:
+        logging.info('Returned {} abandoned jobs to the queue'.format(requeued))
+
+    # The workers must not share the database connections of this process
+    engine.dispose()
+    workers = [multiprocessing.Process(target=run_worker, args=(poll_interval,))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    logging.info('Started {} render workers'.format(processes))
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Make queued preview images in the background.')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Number of worker processes. Default is the number of cores in the config file.')
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL,
+                        help='Time, in seconds, that idle workers wait before checking for new jobs')
+    args = parser.parse_args()
+
+    module = os.path.basename(__file__).strip('.py')
+    configure_logging(module)
+
+    processes = args.processes
+    if processes is None:
+        processes = int(get_config()['cores'])
+    start_workers(processes, poll_interval=args.poll_interval)
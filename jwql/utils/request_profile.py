@@ -0,0 +1,438 @@
+#! /usr/bin/env python
+
+"""Profiles of where the requests of the web application spend their
+time.
+
+While a request is profiled, the database queries made through Django
+and through the ``SQLAlchemy`` engine of ``database_interface``, the
+scans of the filesystem and the MAST queries made by the thread
+handling it are recorded in a ``RequestProfile``, with their time. The
+profiles are written by the ``RequestProfilingMiddleware`` of the web
+application, which is enabled by setting ``profile_requests`` to
+``true`` in the config file, to a table of the ``jwqldb`` database that
+keeps the ``MAX_PROFILES`` most recent requests. The slowest views
+and the breakdown of each request are shown on the
+``admin/request_profiles/`` page.
+
+Authors
+-------
+
+    - Lauren Chambers
+
+Use
+---
+
+    Code that scans the filesystem or calls a service records the time
+    it takes in the profile of the current request, if any:
+
+    ::
+
+        from jwql.utils.request_profile import profiled
+        with profiled('filesystem', search_string):
+            all_files = glob.glob(search_string)
+
+    The table of the profiles is created along with the other tables of
+    the database, by executing ``database_interface.py``. The slowest
+    views can be listed, and the profiles removed, from the command
+    line:
+
+    ::
+
+        python request_profile.py
+        python request_profile.py --clear
+"""
+
+import argparse
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+from sqlalchemy import event, func, select
+
+from jwql.database.database_interface import engine
+from jwql.database.database_interface import DatabaseStore
+from jwql.database.database_interface import RequestProfileRecord
+
+# Number of most recent requests whose profiles are kept
+MAX_PROFILES = 10000
+
+# Number of individual queries and scans kept in the breakdown of a
+# request. The counts and times of each category include all of them.
+MAX_EVENTS = 200
+
+# The categories of the time spent by a request
+CATEGORIES = ['django', 'sqlalchemy', 'filesystem', 'mast']
+
+# Table of the profiles
+PROFILES = RequestProfileRecord.__table__
+
+# The profile of the request handled by each thread
+_CURRENT = threading.local()
+
+
+class RequestProfile():
+    """The queries and scans made while handling a request, and their
+    time.
+
+    Attributes
+    ----------
+    counts : dict
+        The number of events of each category
+    events : list
+        ``(category, start, duration, detail)`` of the first
+        ``MAX_EVENTS`` events, with their start relative to the start
+        of the request
+    start : float
+        The ``time.perf_counter`` at which the request started
+    times : dict
+        The total time, in seconds, of the events of each category
+
+    Methods
+    -------
+    record(category, duration, detail)
+        Record an event that has just finished
+    """
+
+    def __init__(self):
+        """Initialize the class, starting the profile now."""
+        self.start = time.perf_counter()
+        self.counts = {category: 0 for category in CATEGORIES}
+        self.times = {category: 0. for category in CATEGORIES}
+        self.events = []
+        self._lock = threading.Lock()
+
+    def record(self, category, duration, detail=None):
+        """Record an event that has just finished. Events may be
+        recorded by any thread working for the request.
+
+        Parameters
+        ----------
+        category : str
+            The category of the event, from ``CATEGORIES``
+        duration : float
+            The time taken by the event, in seconds
+        detail : str
+            A description of the event (e.g. the SQL statement)
+        """
+        start = time.perf_counter() - duration - self.start
+        with self._lock:
+            self.counts[category] += 1
+            self.times[category] += duration
+            if len(self.events) < MAX_EVENTS:
+                self.events.append((category, start, duration, None if detail is None else str(detail)[:1000]))
+
+
+class ProfileStore(DatabaseStore):
+    """A store, in the ``jwqldb`` database, of the profiles of the most
+    recent requests.
+
+    Attributes
+    ----------
+    connection : obj
+        Connection to the database
+    engine : obj
+        Engine of the database
+    max_profiles : int
+        Number of most recent profiles that are kept
+
+    Methods
+    -------
+    add(method, path, view, status, wall, profile)
+        Store the profile of a request
+    clear()
+        Remove all profiles
+    close()
+        Close the connection to the database
+    get(profile_id)
+        Return the profile of a request, with its breakdown
+    slowest_requests(view, limit)
+        Return the slowest profiled requests
+    slowest_views(limit)
+        Return the views with the slowest requests on average
+    """
+
+    def __init__(self, bind=None, max_profiles=MAX_PROFILES):
+        """Initialize the class, connecting to the database.
+
+        Parameters
+        ----------
+        bind : obj
+            The ``SQLAlchemy`` engine of the database. The ``engine``
+            of ``database_interface`` is used if ``None``.
+        max_profiles : int
+            Number of most recent profiles that are kept
+        """
+        super().__init__(bind)
+        self.max_profiles = max_profiles
+
+    def add(self, method, path, view, status, wall, profile):
+        """Store the profile of a request, removing the oldest profiles
+        beyond ``max_profiles``.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method of the request
+        path : str
+            The path of the request
+        view : str
+            The name of the view that handled the request
+        status : int
+            The status code of the response
+        wall : float
+            The time taken by the request, in seconds
+        profile : RequestProfile
+            The profile of the request
+
+        Returns
+        -------
+        profile_id : int
+            The identifier of the stored profile
+        """
+        values = {'started': time.time(), 'method': method, 'path': path, 'view': view, 'status': status,
+                  'wall': wall, 'events': json.dumps(profile.events)}
+        for category in CATEGORIES:
+            values['{}_count'.format(category)] = profile.counts[category]
+            values['{}_time'.format(category)] = profile.times[category]
+
+        with self.connection.begin():
+            profile_id = self.connection.execute(PROFILES.insert().values(**values)).inserted_primary_key[0]
+            self.connection.execute(PROFILES.delete().where(PROFILES.c.id <= profile_id - self.max_profiles))
+
+        return profile_id
+
+    def clear(self):
+        """Remove all profiles."""
+        self.connection.execute(PROFILES.delete())
+
+    def get(self, profile_id):
+        """Return the profile of a request, with its breakdown.
+
+        Parameters
+        ----------
+        profile_id : int
+            The identifier of the profile
+
+        Returns
+        -------
+        profile : dict
+            The ``id``, ``started`` time, ``method``, ``path``,
+            ``view``, ``status`` and ``wall`` time of the request, the
+            ``count`` and ``time`` of each category in ``categories``,
+            the time not spent in any category (``other_time``), and
+            the ``events`` of the request, or ``None`` if there is no
+            such profile
+        """
+        row = self.connection.execute(select([PROFILES]).where(PROFILES.c.id == profile_id)).fetchone()
+        if row is None:
+            return None
+
+        profile = self._summary(row)
+        profile['events'] = [dict(zip(['category', 'start', 'duration', 'detail'], event))
+                             for event in json.loads(row['events'])]
+
+        return profile
+
+    def slowest_requests(self, view=None, limit=50):
+        """Return the slowest profiled requests.
+
+        Parameters
+        ----------
+        view : str
+            Only return the requests of this view, if given
+        limit : int
+            Largest number of requests returned
+
+        Returns
+        -------
+        requests : list
+            The summary of each request, in the form returned by
+            ``get`` without its ``events``, slowest first
+        """
+        query = select([PROFILES]).order_by(PROFILES.c.wall.desc()).limit(limit)
+        if view is not None:
+            query = query.where(PROFILES.c.view == view)
+        rows = self.connection.execute(query)
+
+        return [self._summary(row) for row in rows]
+
+    def slowest_views(self, limit=50):
+        """Return the views with the slowest requests on average.
+
+        Parameters
+        ----------
+        limit : int
+            Largest number of views returned
+
+        Returns
+        -------
+        views : list
+            The ``view``, number of ``requests``, ``mean_wall`` and
+            ``max_wall`` time, and the mean ``queries`` and the mean
+            time of each category (e.g. ``mast_time``) of each view,
+            slowest first
+        """
+        mean_wall = func.avg(PROFILES.c.wall).label('mean_wall')
+        columns = [PROFILES.c.view, func.count().label('requests'), mean_wall,
+                   func.max(PROFILES.c.wall).label('max_wall'),
+                   func.avg(PROFILES.c.django_count + PROFILES.c.sqlalchemy_count).label('queries')]
+        columns += [func.avg(PROFILES.c['{}_time'.format(category)]).label('{}_time'.format(category))
+                    for category in CATEGORIES]
+        query = select(columns).group_by(PROFILES.c.view).order_by(mean_wall.desc()).limit(limit)
+
+        # PostgreSQL returns the averages as decimals
+        return [{key: value if key in ['view', 'requests'] else float(value) for key, value in row.items()}
+                for row in self.connection.execute(query)]
+
+    def _summary(self, row):
+        """Return the summary of a profile from its row."""
+        summary = {key: row[key] for key in ['id', 'started', 'method', 'path', 'view', 'status', 'wall']}
+        summary['categories'] = {category: {'count': row['{}_count'.format(category)],
+                                            'time': row['{}_time'.format(category)]}
+                                 for category in CATEGORIES}
+
+        # Queries made by other threads can overlap, so the time in the
+        # categories can exceed the wall time
+        summary['other_time'] = max(row['wall'] - sum(row['{}_time'.format(category)]
+                                                      for category in CATEGORIES), 0.)
+
+        return summary
+
+
+def bind_profile(function):
+    """Return a function that calls ``function`` with the profile of
+    the calling thread, so that it is profiled when it is run by
+    another thread (e.g. by a ``QueryExecutor``).
+
+    Parameters
+    ----------
+    function : function
+        The function to call
+
+    Returns
+    -------
+    bound : function
+        The function, which takes the same arguments
+    """
+    profile = current_profile()
+    if profile is None:
+        return function
+
+    def bound(*args, **kwargs):
+        previous = current_profile()
+        _CURRENT.profile = profile
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _CURRENT.profile = previous
+
+    return bound
+
+
+def current_profile():
+    """Return the profile of the request handled by the calling thread,
+    or ``None`` if it is not profiled."""
+    return getattr(_CURRENT, 'profile', None)
+
+
+def django_execute_wrapper(execute, sql, params, many, context):
+    """Run and profile a Django database query. This is installed with
+    ``connection.execute_wrapper``."""
+    with profiled('django', sql):
+        return execute(sql, params, many, context)
+
+
+def open_profile_store():
+    """Open the profile store in the ``jwqldb`` database.
+
+    Returns
+    -------
+    store : ProfileStore
+        The open store, which should be closed after use
+    """
+    return ProfileStore()
+
+
+@contextmanager
+def profiled(category, detail=None):
+    """Record the time taken by the body of the ``with`` statement in
+    the profile of the current request, if it is profiled.
+
+    Parameters
+    ----------
+    category : str
+        The category of the time, from ``CATEGORIES``
+    detail : str
+        A description of what is timed (e.g. the glob pattern)
+    """
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record(category, time.perf_counter() - start, detail)
+
+
+def start_profile():
+    """Start profiling the request handled by the calling thread.
+
+    Returns
+    -------
+    profile : RequestProfile
+        The new profile
+    """
+    _CURRENT.profile = RequestProfile()
+    return _CURRENT.profile
+
+
+def stop_profile():
+    """Stop profiling the request handled by the calling thread.
+
+    Returns
+    -------
+    profile : RequestProfile
+        The profile of the request, or ``None`` if it was not profiled
+    """
+    profile = current_profile()
+    _CURRENT.profile = None
+
+    return profile
+
+
+# Record the queries made through the engine of ``database_interface``
+# in the profile of the current request, if it is profiled
+@event.listens_for(engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Record the start time of a query"""
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Record the time taken by a query in the profile of the current
+    request"""
+    duration = time.perf_counter() - conn.info['query_start_time'].pop()
+    profile = current_profile()
+    if profile is not None:
+        profile.record('sqlalchemy', duration, statement)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Show or remove the profiles of the web application requests.')
+    parser.add_argument('--clear', action='store_true',
+                        help='Remove all profiles')
+    args = parser.parse_args()
+
+    with open_profile_store() as store:
+        if args.clear:
+            store.clear()
+        else:
+            for view in store.slowest_views():
+                print('{:<40s} {:>6d} requests  mean {:8.3f} s  max {:8.3f} s  {:6.1f} queries'.format(
+                    view['view'], view['requests'], view['mean_wall'], view['max_wall'], view['queries']))
@@ -30,6 +30,7 @@ References
  """
 
 import datetime
+import functools
 import getpass
 import json
 import os
@@ -37,12 +38,127 @@ import re
 import shutil
 
 import jsonschema
+import pandas as pd
 
 from jwql.utils import permissions
 from jwql.utils.constants import FILE_SUFFIX_TYPES, JWST_INSTRUMENT_NAMES_SHORTHAND
 
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
 
+# Maximum number of parsed filenames kept by ``filename_parser``
+FILENAME_PARSER_CACHE_SIZE = 65536
+
+# Stage 1 and 2 filenames
+# e.g. "jw80500012009_01101_00012_nrcalong_uncal.fits"
+STAGE_1_AND_2 = \
+    r"jw" \
+    r"(?P<program_id>\d{5})"\
+    r"(?P<observation>\d{3})"\
+    r"(?P<visit>\d{3})"\
+    r"_(?P<visit_group>\d{2})"\
+    r"(?P<parallel_seq_id>\d{1})"\
+    r"(?P<activity>\w{2})"\
+    r"_(?P<exposure_id>\d+)"\
+    r"_(?P<detector>((?!_)[\w])+)"
+
+# Stage 2c outlier detection filenames
+# e.g. "jw94015002002_02108_00001_mirimage_o002_crf.fits"
+STAGE_2C = \
+    r"jw" \
+    r"(?P<program_id>\d{5})" \
+    r"(?P<observation>\d{3})" \
+    r"(?P<visit>\d{3})" \
+    r"_(?P<visit_group>\d{2})" \
+    r"(?P<parallel_seq_id>\d{1})" \
+    r"(?P<activity>\w{2})" \
+    r"_(?P<exposure_id>\d+)" \
+    r"_(?P<detector>((?!_)[\w])+)"\
+    r"_(?P<ac_id>(o\d{3}|(c|a|r)\d{4}))"
+
+# Stage 3 filenames with target ID
+# e.g. "jw80600-o009_t001_miri_f1130w_i2d.fits"
+STAGE_3_TARGET_ID = \
+    r"jw" \
+    r"(?P<program_id>\d{5})"\
+    r"-(?P<ac_id>(o\d{3}|(c|a|r)\d{4}))"\
+    r"_(?P<target_id>(t)\d{3})"\
+    r"_(?P<instrument>(nircam|niriss|nirspec|miri|fgs))"\
+    r"_(?P<optical_elements>((?!_)[\w-])+)"
+
+# Stage 3 filenames with source ID
+# e.g. "jw80600-o009_s00001_miri_f1130w_i2d.fits"
+STAGE_3_SOURCE_ID = \
+    r"jw" \
+    r"(?P<program_id>\d{5})"\
+    r"-(?P<ac_id>(o\d{3}|(c|a|r)\d{4}))"\
+    r"_(?P<source_id>(s)\d{5})"\
+    r"_(?P<instrument>(nircam|niriss|nirspec|miri|fgs))"\
+    r"_(?P<optical_elements>((?!_)[\w-])+)"
+
+# Stage 3 filenames with target ID and epoch
+# e.g. "jw80600-o009_t001-epoch1_miri_f1130w_i2d.fits"
+STAGE_3_TARGET_ID_EPOCH = \
+    r"jw" \
+    r"(?P<program_id>\d{5})"\
+    r"-(?P<ac_id>(o\d{3}|(c|a|r)\d{4}))"\
+    r"_(?P<target_id>(t)\d{3})"\
+    r"-epoch(?P<epoch>\d{1})"\
+    r"_(?P<instrument>(nircam|niriss|nirspec|miri|fgs))"\
+    r"_(?P<optical_elements>((?!_)[\w-])+)"
+
+# Stage 3 filenames with source ID and epoch
+# e.g. "jw80600-o009_s00001-epoch1_miri_f1130w_i2d.fits"
+STAGE_3_SOURCE_ID_EPOCH = \
+    r"jw" \
+    r"(?P<program_id>\d{5})"\
+    r"-(?P<ac_id>(o\d{3}|(c|a|r)\d{4}))"\
+    r"_(?P<source_id>(s)\d{5})"\
+    r"-epoch(?P<epoch>\d{1})"\
+    r"_(?P<instrument>(nircam|niriss|nirspec|miri|fgs))"\
+    r"_(?P<optical_elements>((?!_)[\w-])+)"
+
+# Time series filenames
+# e.g. "jw00733003001_02101_00002-seg001_nrs1_rate.fits"
+TIME_SERIES = \
+    r"jw" \
+    r"(?P<program_id>\d{5})"\
+    r"(?P<observation>\d{3})"\
+    r"(?P<visit>\d{3})"\
+    r"_(?P<visit_group>\d{2})"\
+    r"(?P<parallel_seq_id>\d{1})"\
+    r"(?P<activity>\w{2})"\
+    r"_(?P<exposure_id>\d+)"\
+    r"-seg(?P<segment>\d{3})"\
+    r"_(?P<detector>\w+)"
+
+# Guider filenames
+# e.g. "jw00729011001_gs-id_1_image_cal.fits" or
+# "jw00799003001_gs-acq1_2019154181705_stream.fits"
+GUIDER = \
+    r"jw" \
+    r"(?P<program_id>\d{5})" \
+    r"(?P<observation>\d{3})" \
+    r"(?P<visit>\d{3})" \
+    r"_gs-(?P<guider_mode>(id|acq1|acq2|track|fg))" \
+    r"_((?P<date_time>\d{13})|(?P<guide_star_attempt_id>\d{1}))"
+
+# The types of filename, in the order in which they are tried
+FILENAME_TYPES = [('stage_1_and_2', STAGE_1_AND_2),
+                  ('stage_2c', STAGE_2C),
+                  ('stage_3_target_id', STAGE_3_TARGET_ID),
+                  ('stage_3_source_id', STAGE_3_SOURCE_ID),
+                  ('stage_3_target_id_epoch', STAGE_3_TARGET_ID_EPOCH),
+                  ('stage_3_source_id_epoch', STAGE_3_SOURCE_ID_EPOCH),
+                  ('time_series', TIME_SERIES),
+                  ('guider', GUIDER)]
+
+# The compiled patterns of each type of filename: the first matches a
+# full filename (with a suffix), and the second an entire rootname
+FILENAME_PATTERNS = [(name,
+                      re.compile(pattern + r"_(?P<suffix>{}).*".format('|'.join(FILE_SUFFIX_TYPES))),
+                      re.compile(pattern + r"$"))
+                     for name, pattern in FILENAME_TYPES]
+
 
 def copy_files(files, out_dir):
     """Copy a given file to a given directory. Only try to copy the file
@@ -141,161 +257,25 @@ def ensure_dir_exists(fullpath):
         permissions.set_permissions(fullpath)
 
 
-def filename_parser(filename):
-    """Return a dictionary that contains the properties of a given
-    JWST file (e.g. program ID, visit number, detector, etc.).
-
-    Parameters
-    ----------
-    filename : str
-        Path or name of JWST file to parse
-
-    Returns
-    -------
-    filename_dict : dict
-        Collection of file properties
-
-    Raises
-    ------
-    ValueError
-        When the provided file does not follow naming conventions
+@functools.lru_cache(maxsize=FILENAME_PARSER_CACHE_SIZE)
+def _parse_filename(filename):
+    """Parse the name of a JWST file, without its directory. The
+    results are cached, so the returned dictionary must not be
+    modified; see ``filename_parser``.
     """
-
-    filename = os.path.basename(filename)
     file_root_name = (len(filename.split('.')) < 2)
 
-    # Stage 1 and 2 filenames
-    # e.g. "jw80500012009_01101_00012_nrcalong_uncal.fits"
-    stage_1_and_2 = \
-        r"jw" \
-        r"(?P<program_id>\d{5})"\
-        r"(?P<observation>\d{3})"\
-        r"(?P<visit>\d{3})"\
-        r"_(?P<visit_group>\d{2})"\
-        r"(?P<parallel_seq_id>\d{1})"\
-        r"(?P<activity>\w{2})"\
-        r"_(?P<exposure_id>\d+)"\
-        r"_(?P<detector>((?!_)[\w])+)"
-
-    # Stage 2c outlier detection filenames
-    # e.g. "jw94015002002_02108_00001_mirimage_o002_crf.fits"
-    stage_2c = \
-        r"jw" \
-        r"(?P<program_id>\d{5})" \
-        r"(?P<observation>\d{3})" \
-        r"(?P<visit>\d{3})" \
-        r"_(?P<visit_group>\d{2})" \
-        r"(?P<parallel_seq_id>\d{1})" \
-        r"(?P<activity>\w{2})" \
-        r"_(?P<exposure_id>\d+)" \
-        r"_(?P<detector>((?!_)[\w])+)"\
-        r"_(?P<ac_id>(o\d{3}|(c|a|r)\d{4}))"
-
-    # Stage 3 filenames with target ID
-    # e.g. "jw80600-o009_t001_miri_f1130w_i2d.fits"
-    stage_3_target_id = \
-        r"jw" \
-        r"(?P<program_id>\d{5})"\
-        r"-(?P<ac_id>(o\d{3}|(c|a|r)\d{4}))"\
-        r"_(?P<target_id>(t)\d{3})"\
-        r"_(?P<instrument>(nircam|niriss|nirspec|miri|fgs))"\
-        r"_(?P<optical_elements>((?!_)[\w-])+)"
-
-    # Stage 3 filenames with source ID
-    # e.g. "jw80600-o009_s00001_miri_f1130w_i2d.fits"
-    stage_3_source_id = \
-        r"jw" \
-        r"(?P<program_id>\d{5})"\
-        r"-(?P<ac_id>(o\d{3}|(c|a|r)\d{4}))"\
-        r"_(?P<source_id>(s)\d{5})"\
-        r"_(?P<instrument>(nircam|niriss|nirspec|miri|fgs))"\
-        r"_(?P<optical_elements>((?!_)[\w-])+)"
-
-    # Stage 3 filenames with target ID and epoch
-    # e.g. "jw80600-o009_t001-epoch1_miri_f1130w_i2d.fits"
-    stage_3_target_id_epoch = \
-        r"jw" \
-        r"(?P<program_id>\d{5})"\
-        r"-(?P<ac_id>(o\d{3}|(c|a|r)\d{4}))"\
-        r"_(?P<target_id>(t)\d{3})"\
-        r"-epoch(?P<epoch>\d{1})"\
-        r"_(?P<instrument>(nircam|niriss|nirspec|miri|fgs))"\
-        r"_(?P<optical_elements>((?!_)[\w-])+)"
-
-    # Stage 3 filenames with source ID and epoch
-    # e.g. "jw80600-o009_s00001-epoch1_miri_f1130w_i2d.fits"
-    stage_3_source_id_epoch = \
-        r"jw" \
-        r"(?P<program_id>\d{5})"\
-        r"-(?P<ac_id>(o\d{3}|(c|a|r)\d{4}))"\
-        r"_(?P<source_id>(s)\d{5})"\
-        r"-epoch(?P<epoch>\d{1})"\
-        r"_(?P<instrument>(nircam|niriss|nirspec|miri|fgs))"\
-        r"_(?P<optical_elements>((?!_)[\w-])+)"
-
-    # Time series filenames
-    # e.g. "jw00733003001_02101_00002-seg001_nrs1_rate.fits"
-    time_series = \
-        r"jw" \
-        r"(?P<program_id>\d{5})"\
-        r"(?P<observation>\d{3})"\
-        r"(?P<visit>\d{3})"\
-        r"_(?P<visit_group>\d{2})"\
-        r"(?P<parallel_seq_id>\d{1})"\
-        r"(?P<activity>\w{2})"\
-        r"_(?P<exposure_id>\d+)"\
-        r"-seg(?P<segment>\d{3})"\
-        r"_(?P<detector>\w+)"
-
-    # Guider filenames
-    # e.g. "jw00729011001_gs-id_1_image_cal.fits" or
-    # "jw00799003001_gs-acq1_2019154181705_stream.fits"
-    guider = \
-        r"jw" \
-        r"(?P<program_id>\d{5})" \
-        r"(?P<observation>\d{3})" \
-        r"(?P<visit>\d{3})" \
-        r"_gs-(?P<guider_mode>(id|acq1|acq2|track|fg))" \
-        r"_((?P<date_time>\d{13})|(?P<guide_star_attempt_id>\d{1}))"
-
-    # Build list of filename types
-    filename_types = [
-        stage_1_and_2,
-        stage_2c,
-        stage_3_target_id,
-        stage_3_source_id,
-        stage_3_target_id_epoch,
-        stage_3_source_id_epoch,
-        time_series,
-        guider]
-
-    filename_type_names = [
-        'stage_1_and_2',
-        'stage_2c',
-        'stage_3_target_id',
-        'stage_3_source_id',
-        'stage_3_target_id_epoch',
-        'stage_3_source_id_epoch',
-        'time_series',
-        'guider'
-    ]
-
-    # Try to parse the filename
-    for filename_type, filename_type_name in zip(filename_types, filename_type_names):
-
-        # If full filename, try using suffix
-        if not file_root_name:
-            filename_type += r"_(?P<suffix>{}).*".format('|'.join(FILE_SUFFIX_TYPES))
-        # If not, make sure the provided regex matches the entire filename root
+    # Try to parse the filename. If it is a full filename, the patterns
+    # that include the suffix are used. If not, the patterns must match
+    # the entire filename root.
+    for name_match, full_pattern, root_pattern in FILENAME_PATTERNS:
+        if file_root_name:
+            jwst_file = root_pattern.match(filename)
         else:
-            filename_type += r"$"
-
-        elements = re.compile(filename_type)
-        jwst_file = elements.match(filename)
+            jwst_file = full_pattern.match(filename)
 
         # Stop when you find a format that matches
         if jwst_file is not None:
-            name_match = filename_type_name
             break
 
     try:
@@ -326,6 +306,98 @@ def filename_parser(filename):
     return filename_dict
 
 
+def filename_parser(filename):
+    """Return a dictionary that contains the properties of a given
+    JWST file (e.g. program ID, visit number, detector, etc.).
+
+    The patterns of the JWST filenames are compiled once, and the
+    results of the most recently parsed filenames are cached.
+
+    Parameters
+    ----------
+    filename : str
+        Path or name of JWST file to parse
+
+    Returns
+    -------
+    filename_dict : dict
+        Collection of file properties
+
+    Raises
+    ------
+    ValueError
+        When the provided file does not follow naming conventions
+    """
+
+    # Return a copy, so that callers can modify it without changing
+    # the cached result
+    return dict(_parse_filename(os.path.basename(filename)))
+
+
+def filename_parser_batch(filenames):
+    """Return a table of the properties of many JWST files (see
+    ``filename_parser``), parsed column-wise rather than one file at a
+    time.
+
+    Each type of filename is matched against all of the files that have
+    not yet been parsed in a single vectorized pass, in the same order
+    as ``filename_parser`` tries them.
+
+    Parameters
+    ----------
+    filenames : list
+        Paths or names of JWST files to parse
+
+    Returns
+    -------
+    filename_table : pandas.DataFrame
+        One row per file, in the order of ``filenames``, with a
+        ``filename`` column and a column for each file property.
+        Properties that a file does not have are ``None``, as are all
+        of the properties (including ``filename_type``) of files that
+        do not follow naming conventions.
+    """
+    names = pd.Series([os.path.basename(filename) for filename in filenames], dtype=object)
+    filename_table = pd.DataFrame({'filename': names, 'filename_type': None}, dtype=object)
+
+    # Full filenames are matched with the patterns that include the
+    # suffix, and rootnames with the patterns of an entire rootname
+    file_root_name = ~names.str.contains('.', regex=False)
+
+    unparsed = pd.Series(True, index=names.index)
+    for name_match, full_pattern, root_pattern in FILENAME_PATTERNS:
+        for pattern, candidates in ((full_pattern, ~file_root_name), (root_pattern, file_root_name)):
+            rows = names[unparsed & candidates]
+            if rows.empty:
+                continue
+
+            # Anchor the pattern at the start of the name, as re.match does
+            properties = rows.str.extract('^' + pattern.pattern, expand=True)
+            properties = properties[list(pattern.groupindex)]
+            properties = properties[properties.notna().any(axis=1)]
+            if properties.empty:
+                continue
+
+            for column in properties.columns:
+                if column not in filename_table.columns:
+                    filename_table[column] = None
+                filename_table.loc[properties.index, column] = properties[column]
+            filename_table.loc[properties.index, 'filename_type'] = name_match
+            unparsed[properties.index] = False
+
+    # Add the instrument of files whose names do not include it
+    if 'instrument' not in filename_table.columns:
+        filename_table['instrument'] = None
+    missing = filename_table['instrument'].isna() & filename_table['filename_type'].notna()
+    if 'detector' in filename_table.columns:
+        detectors = filename_table.loc[missing, 'detector'].dropna()
+        filename_table.loc[detectors.index, 'instrument'] = \
+            detectors.str[:3].str.lower().map(JWST_INSTRUMENT_NAMES_SHORTHAND)
+    filename_table.loc[missing & (filename_table['filename_type'] == 'guider'), 'instrument'] = 'fgs'
+
+    return filename_table.astype(object).where(filename_table.notna(), None)
+
+
 def filesystem_path(filename):
     """Return the full path to a given file in the filesystem
 
@@ -483,8 +555,9 @@ def _validate_config(config_file_dict):
             "client_id": {"type": "string"},
             "client_secret": {"type": "string"},
             "mast_token": {"type": "string"},
+            "profile_requests": {"type": "boolean"},
         },
-        # List which entries are needed (all of them)
+        # List which entries are needed (all of them but profile_requests)
         "required": ["connection_string", "database", "filesystem",
                      "preview_image_filesystem", "thumbnail_filesystem",
                      "outputs", "jwql_dir", "admin_account", "log_dir",
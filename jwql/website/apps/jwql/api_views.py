@@ -22,6 +22,25 @@ not be the full rootname, but can be any shortened version, (e.g.
 ``jw8660000801_02101``, or ``jw8660``); using an abbreviated version
 will return all filenames associated with the rootname up to that point.
 
+The lists are sorted and returned a page at a time, with the ``count``
+of all items and a ``next`` cursor. The following query parameters are
+accepted by every service:
+
+    - ``limit``: the number of items per page (``1000`` by default, at
+      most ``10000``)
+    - ``cursor``: the ``next`` cursor of the previous page
+    - ``fields``: a comma-separated list of the fields of each file to
+      return (``filename``, ``rootname``, ``program``, ``instrument``
+      and ``suffix``), instead of its filename. This is not available
+      for lists of proposals.
+
+Responses have ``ETag`` and ``Last-Modified`` headers computed from the
+version of the filesystem index and of the cached MAST queries they
+are built from, and conditional requests (``If-None-Match`` or
+``If-Modified-Since``) for unchanged data get a ``304`` response. The
+full lists are cached in the ``jwqldb`` database by
+``jwql.utils.api_cache``.
+
 Authors
 -------
 
@@ -45,12 +64,24 @@ References
         ``https://docs.djangoproject.com/en/2.0/topics/http/views/``
 """
 
+import base64
+import bisect
+from functools import partial
+import hashlib
+
 from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from jwql.utils.api_cache import open_api_cache
+from jwql.utils.filesystem_index import open_filesystem_index, parse_index_filename
+from jwql.utils.mast_cache import get_mast_cache
 
 from .data_containers import get_all_proposals
 from .data_containers import get_filenames_by_proposal
 from .data_containers import get_filenames_by_rootname
 from .data_containers import get_instrument_proposals
+from .data_containers import get_instrument_query
 from .data_containers import get_preview_images_by_instrument
 from .data_containers import get_preview_images_by_proposal
 from .data_containers import get_preview_images_by_rootname
@@ -58,6 +89,13 @@ from .data_containers import get_thumbnails_by_instrument
 from .data_containers import get_thumbnails_by_proposal
 from .data_containers import get_thumbnails_by_rootname
 
+# Number of items in a page of a list, by default and at most
+API_PAGE_LENGTH = 1000
+API_PAGE_MAX_LENGTH = 10000
+
+# The fields of a file that can be selected with ``fields``
+FILE_FIELDS = ['filename', 'rootname', 'program', 'instrument', 'suffix']
+
 
 def all_proposals(request):
     """Return a list of proposals for the mission
@@ -73,8 +111,7 @@ def all_proposals(request):
         Outgoing response sent to the webpage
     """
 
-    proposals = get_all_proposals()
-    return JsonResponse({'proposals': proposals}, json_dumps_params={'indent': 2})
+    return _paginated_response(request, 'all_proposals', '', 'proposals', _index_version, get_all_proposals)
 
 
 def filenames_by_proposal(request, proposal):
@@ -93,8 +130,8 @@ def filenames_by_proposal(request, proposal):
         Outgoing response sent to the webpage
     """
 
-    filenames = get_filenames_by_proposal(proposal)
-    return JsonResponse({'filenames': filenames}, json_dumps_params={'indent': 2})
+    return _paginated_response(request, 'filenames_by_proposal', '{:05d}'.format(int(proposal)), 'filenames',
+                               _index_version, partial(get_filenames_by_proposal, proposal), _file_fields)
 
 
 def filenames_by_rootname(request, rootname):
@@ -113,8 +150,8 @@ def filenames_by_rootname(request, rootname):
         Outgoing response sent to the webpage
     """
 
-    filenames = get_filenames_by_rootname(rootname)
-    return JsonResponse({'filenames': filenames}, json_dumps_params={'indent': 2})
+    return _paginated_response(request, 'filenames_by_rootname', rootname, 'filenames', _index_version,
+                               partial(get_filenames_by_rootname, rootname), _file_fields)
 
 
 def instrument_proposals(request, inst):
@@ -136,8 +173,8 @@ def instrument_proposals(request, inst):
         Outgoing response sent to the webpage
     """
 
-    proposals = get_instrument_proposals(inst)
-    return JsonResponse({'proposals': proposals}, json_dumps_params={'indent': 2})
+    return _paginated_response(request, 'instrument_proposals', inst.lower(), 'proposals',
+                               partial(_mast_version, inst, 'program'), partial(get_instrument_proposals, inst))
 
 
 def preview_images_by_instrument(request, inst):
@@ -160,8 +197,9 @@ def preview_images_by_instrument(request, inst):
         Outgoing response sent to the webpage
     """
 
-    preview_images = get_preview_images_by_instrument(inst)
-    return JsonResponse({'preview_images': preview_images}, json_dumps_params={'indent': 2})
+    return _paginated_response(request, 'preview_images_by_instrument', inst.lower(), 'preview_images',
+                               partial(_index_and_mast_version, inst, 'filename'),
+                               partial(get_preview_images_by_instrument, inst), _file_fields)
 
 
 def preview_images_by_proposal(request, proposal):
@@ -181,8 +219,8 @@ def preview_images_by_proposal(request, proposal):
         Outgoing response sent to the webpage
     """
 
-    preview_images = get_preview_images_by_proposal(proposal)
-    return JsonResponse({'preview_images': preview_images}, json_dumps_params={'indent': 2})
+    return _paginated_response(request, 'preview_images_by_proposal', '{:05d}'.format(int(proposal)), 'preview_images',
+                               _index_version, partial(get_preview_images_by_proposal, proposal), _file_fields)
 
 
 def preview_images_by_rootname(request, rootname):
@@ -202,8 +240,8 @@ def preview_images_by_rootname(request, rootname):
         Outgoing response sent to the webpage
     """
 
-    preview_images = get_preview_images_by_rootname(rootname)
-    return JsonResponse({'preview_images': preview_images}, json_dumps_params={'indent': 2})
+    return _paginated_response(request, 'preview_images_by_rootname', rootname, 'preview_images', _index_version,
+                               partial(get_preview_images_by_rootname, rootname), _file_fields)
 
 
 def thumbnails_by_instrument(request, inst):
@@ -226,8 +264,9 @@ def thumbnails_by_instrument(request, inst):
         Outgoing response sent to the webpage
     """
 
-    thumbnails = get_thumbnails_by_instrument(inst)
-    return JsonResponse({'thumbnails': thumbnails}, json_dumps_params={'indent': 2})
+    return _paginated_response(request, 'thumbnails_by_instrument', inst.lower(), 'thumbnails',
+                               partial(_index_and_mast_version, inst, 'filename'),
+                               partial(get_thumbnails_by_instrument, inst), _file_fields)
 
 
 def thumbnails_by_proposal(request, proposal):
@@ -247,8 +286,8 @@ def thumbnails_by_proposal(request, proposal):
         Outgoing response sent to the webpage
     """
 
-    thumbnails = get_thumbnails_by_proposal(proposal)
-    return JsonResponse({'thumbnails': thumbnails}, json_dumps_params={'indent': 2})
+    return _paginated_response(request, 'thumbnails_by_proposal', '{:05d}'.format(int(proposal)), 'thumbnails',
+                               _index_version, partial(get_thumbnails_by_proposal, proposal), _file_fields)
 
 
 def thumbnails_by_rootname(request, rootname):
@@ -268,5 +307,176 @@ def thumbnails_by_rootname(request, rootname):
         Outgoing response sent to the webpage
     """
 
-    thumbnails = get_thumbnails_by_rootname(rootname)
-    return JsonResponse({'thumbnails': thumbnails}, json_dumps_params={'indent': 2})
+    return _paginated_response(request, 'thumbnails_by_rootname', rootname, 'thumbnails', _index_version,
+                               partial(get_thumbnails_by_rootname, rootname), _file_fields)
+
+
+def _decode_cursor(cursor):
+    """Return the last item of the previous page from a ``next``
+    cursor, raising a ``ValueError`` if it is not a cursor returned by
+    ``_encode_cursor``."""
+    try:
+        after = base64.urlsafe_b64decode(cursor.encode()).decode()
+    except ValueError:
+        after = None
+
+    # Characters outside of the alphabet are ignored when decoding, so
+    # check that the cursor is exactly the encoding of its item
+    if not after or _encode_cursor(after) != cursor:
+        raise ValueError('Invalid cursor: {}'.format(cursor))
+
+    return after
+
+
+def _encode_cursor(item):
+    """Return the ``next`` cursor of a page that ends with ``item``."""
+    return base64.urlsafe_b64encode(str(item).encode()).decode()
+
+
+def _file_fields(filename, fields):
+    """Return the selected ``fields`` of a file.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file
+    fields : list
+        The selected fields, from ``FILE_FIELDS``
+
+    Returns
+    -------
+    file_fields : dict
+        The value of each field
+    """
+    entry = parse_index_filename(filename) or (None,) * 5
+    _, program, instrument, rootname, suffix = entry
+    values = {'filename': filename, 'rootname': rootname, 'program': program, 'instrument': instrument,
+              'suffix': suffix}
+
+    return {field: values[field] for field in fields}
+
+
+def _index_and_mast_version(inst, columns):
+    """Return the version of the data built from the filesystem index
+    and from a MAST query of all of the files of an instrument, or
+    ``None`` if the query is not cached."""
+    mast_version = _mast_version(inst, columns)
+    if mast_version is None:
+        return None
+
+    index_version, index_modified = _index_version()
+    last_modified = max(mast_version[1], index_modified or 0)
+
+    return '{};{}'.format(index_version, mast_version[0]), last_modified
+
+
+def _index_version():
+    """Return the version of the filesystem index and the time it last
+    changed."""
+    with open_filesystem_index() as index:
+        return index.version()
+
+
+def _mast_version(inst, columns):
+    """Return the version of a MAST query of all of the files of an
+    instrument, and the time its result was fetched, or ``None`` if the
+    query is not cached."""
+    fetched = get_mast_cache().fetched(*get_instrument_query(inst, columns))
+    if fetched is None:
+        return None
+
+    return repr(fetched), fetched
+
+
+def _paginated_response(request, endpoint, key, data_key, version_function, build, describe=None):
+    """Return a page of the result of an API endpoint, from the API
+    cache if possible, or a ``304`` response if the client has the
+    current version.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        Incoming request from the webpage
+    endpoint : str
+        Name of the endpoint (e.g. ``thumbnails_by_proposal``)
+    key : str
+        Argument of the endpoint (e.g. ``86600``)
+    data_key : str
+        Key of the list in the response (e.g. ``thumbnails``)
+    version_function : function
+        Function that takes no arguments and returns the version of the
+        data of the endpoint and the time it last changed, or ``None``
+        if the version is not known without building the result
+    build : function
+        Function that takes no arguments and returns the list of the
+        endpoint
+    describe : function
+        Function that takes an item of the list and the selected
+        ``fields`` and returns a dictionary of the fields. Field
+        selection is not available if ``None``.
+
+    Returns
+    -------
+    HttpResponse object
+        Outgoing response sent to the webpage
+    """
+    try:
+        limit = int(request.GET.get('limit', API_PAGE_LENGTH))
+        if not 0 < limit <= API_PAGE_MAX_LENGTH:
+            raise ValueError('limit must be between 1 and {}'.format(API_PAGE_MAX_LENGTH))
+        cursor = request.GET.get('cursor')
+        after = None if cursor is None else _decode_cursor(cursor)
+        fields = request.GET.get('fields')
+        if fields is not None:
+            if describe is None:
+                raise ValueError('Field selection is not available for {}'.format(data_key))
+            fields = fields.split(',')
+            unknown = [field for field in fields if field not in FILE_FIELDS]
+            if len(unknown) > 0:
+                raise ValueError('Unrecognized fields: {}'.format(', '.join(unknown)))
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    # Data whose version is only known once it is fetched (e.g. an
+    # uncached MAST query) is built first
+    items = None
+    version = version_function()
+    if version is None:
+        items = build()
+        version = version_function()
+
+    etag = None
+    if version is not None:
+        version, last_modified = version
+        etag = quote_etag(hashlib.sha256('{}\n{}\n{}'.format(endpoint, key, version).encode()).hexdigest())
+        last_modified = None if last_modified is None else int(last_modified)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        with open_api_cache() as cache:
+            cached = None if items is not None else cache.get(endpoint, key, version)
+            if cached is not None:
+                items = cached
+            else:
+                items = sorted(build() if items is None else items, key=str)
+                cache.set(endpoint, key, version, items)
+    else:
+        items = sorted(items, key=str)
+
+    # The page starts after the last item of the previous page
+    start = 0 if after is None else bisect.bisect_right([str(item) for item in items], after)
+    page = items[start:start + limit]
+    next_cursor = _encode_cursor(page[-1]) if start + limit < len(items) else None
+    if fields is not None:
+        page = [describe(item, fields) for item in page]
+
+    response = JsonResponse({data_key: page, 'count': len(items), 'next': next_cursor},
+                            json_dumps_params={'indent': 2})
+    if etag is not None:
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+
+    return response
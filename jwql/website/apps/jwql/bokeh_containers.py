@@ -17,16 +17,26 @@ Use
 
     ::
         from .bokeh_containers import dark_monitor_tabs
+
+    The tabs of a monitor page are cached, and built again when the
+    monitor has new results, with ``cached_monitor_tabs``, e.g.:
+
+    ::
+        div, script = cached_monitor_tabs('dark_monitor', 'NIRCam')
 """
 
+from functools import partial
 import os
 
 from bokeh.embed import components
 from bokeh.layouts import layout
 from bokeh.models.widgets import Tabs, Panel
+from sqlalchemy import func, select
 
 from . import monitor_pages
-from jwql.utils.constants import BAD_PIXEL_TYPES, FULL_FRAME_APERTURES
+from jwql.database import database_interface as di
+from jwql.utils.component_cache import build_components, get_components, open_component_cache
+from jwql.utils.constants import BAD_PIXEL_TYPES, FULL_FRAME_APERTURES, JWST_INSTRUMENT_NAMES_MIXEDCASE, MONITORS
 from jwql.utils.utils import get_config
 
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
@@ -34,6 +44,14 @@ FILESYSTEM_DIR = os.path.join(get_config()['jwql_dir'], 'filesystem')
 PACKAGE_DIR = os.path.dirname(__location__.split('website')[0])
 REPO_DIR = os.path.split(PACKAGE_DIR)[0]
 
+# The stats tables of each monitor, whose latest ``entry_date`` is the
+# version of the monitor results of an instrument
+MONITOR_STATS_TABLES = {'bad_pixel_monitor': ['{}_bad_pixel_stats'],
+                        'bias_monitor': ['{}_bias_stats'],
+                        'dark_monitor': ['{}_dark_dark_current', '{}_dark_pixel_stats'],
+                        'readnoise_monitor': ['{}_readnoise_stats']}
+
+
 def bad_pixel_monitor_tabs(instrument):
     """Creates the various tabs of the bad pixel monitor results page.
 
@@ -172,6 +190,30 @@ def bias_monitor_tabs(instrument):
     return div, script
 
 
+def cached_monitor_tabs(monitor, instrument):
+    """Return the tabs of a monitor results page from the component
+    cache. If the monitor has new results, the cached tabs are returned
+    while new tabs are built in the background.
+
+    Parameters
+    ----------
+    monitor : str
+        The name of the monitor (e.g. ``dark_monitor``)
+    instrument : str
+        The JWST instrument of interest (e.g. ``NIRCam``).
+
+    Returns
+    -------
+    div : str
+        The HTML div to render the monitor plots
+    script : str
+        The JS script to render the monitor plots
+    """
+    build = partial(monitor_tabs_function(monitor), instrument)
+
+    return get_components(monitor, instrument, monitor_results_version(monitor, instrument), build)
+
+
 def dark_monitor_tabs(instrument):
     """Creates the various tabs of the dark monitor results page.
 
@@ -282,6 +324,60 @@ def dark_monitor_tabs(instrument):
     return div, script
 
 
+def monitor_results_version(monitor, instrument):
+    """Return the version of the results of a monitor for an instrument:
+    the latest ``entry_date`` of its stats tables.
+
+    Parameters
+    ----------
+    monitor : str
+        The name of the monitor (e.g. ``dark_monitor``)
+    instrument : str
+        The JWST instrument of interest (e.g. ``NIRCam``).
+
+    Returns
+    -------
+    version : str
+        The latest ``entry_date`` in ISO format, or an empty string if
+        the monitor has no results
+    """
+    entry_dates = []
+    with di.engine.connect() as connection:
+        for table_name in MONITOR_STATS_TABLES[monitor]:
+            table = di.base.metadata.tables.get(table_name.format(instrument.lower()))
+            if table is not None:
+                entry_dates.append(connection.execute(select([func.max(table.c.entry_date)])).scalar())
+
+    entry_dates = [entry_date for entry_date in entry_dates if entry_date is not None]
+    if len(entry_dates) == 0:
+        return ''
+
+    return max(entry_dates).isoformat()
+
+
+def monitor_tabs_function(monitor):
+    """Return the function that builds the tabs of a monitor results
+    page.
+
+    Parameters
+    ----------
+    monitor : str
+        The name of the monitor (e.g. ``dark_monitor``)
+
+    Returns
+    -------
+    tabs_function : function
+        The function, which takes the instrument and returns the
+        ``div`` and ``script`` of the page
+    """
+    tabs_functions = {'bad_pixel_monitor': bad_pixel_monitor_tabs,
+                      'bias_monitor': bias_monitor_tabs,
+                      'dark_monitor': dark_monitor_tabs,
+                      'readnoise_monitor': readnoise_monitor_tabs}
+
+    return tabs_functions[monitor]
+
+
 def readnoise_monitor_tabs(instrument):
     """Creates the various tabs of the readnoise monitor results page.
 
@@ -341,3 +437,36 @@ def readnoise_monitor_tabs(instrument):
     script, div = components(tabs)
 
     return div, script
+
+
+def refresh_monitor_tabs(force=False):
+    """Build the tabs of the monitor results pages of the web
+    application whose results have changed since they were cached.
+
+    Parameters
+    ----------
+    force : bool
+        Build the tabs of every page, even if they are up to date
+
+    Returns
+    -------
+    refreshed : list
+        ``(monitor, instrument)`` of each page that was built
+    """
+    refreshed = []
+    for instrument, monitors in sorted(MONITORS.items()):
+        for _, url in monitors:
+            monitor = url.split('/')[-1]
+            if monitor not in MONITOR_STATS_TABLES:
+                continue
+
+            instrument_name = JWST_INSTRUMENT_NAMES_MIXEDCASE[instrument]
+            version = monitor_results_version(monitor, instrument_name)
+            with open_component_cache() as cache:
+                cached = cache.get(monitor, instrument_name)
+            if force or cached is None or cached['version'] != version:
+                build_components(monitor, instrument_name, version,
+                                 partial(monitor_tabs_function(monitor), instrument_name))
+                refreshed.append((monitor, instrument_name))
+
+    return refreshed
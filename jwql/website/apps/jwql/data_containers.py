@@ -23,21 +23,30 @@ Use
 """
 
 import copy
-import glob
+import csv
+import datetime
+import io
 import os
 import re
 import tempfile
 
-from astropy.io import fits
 from astropy.table import Table
 from astropy.time import Time
 from django.conf import settings
 import numpy as np
 from operator import itemgetter
 import pandas as pd
+from sqlalchemy import String, and_, cast, func, or_, select
+from sqlalchemy.types import ARRAY
+
+# pyarrow is only needed to export tables as Parquet
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
 
 from jwql.database import database_interface as di
-from jwql.database.database_interface import load_connection
 from jwql.edb.engineering_database import get_mnemonic, get_mnemonic_info
 from jwql.instrument_monitors.miri_monitors.data_trending import dashboard as miri_dash
 from jwql.instrument_monitors.nirspec_monitors.data_trending import dashboard as nirspec_dash
@@ -46,7 +55,11 @@ from jwql.utils.utils import ensure_dir_exists
 from jwql.utils.constants import MONITORS
 from jwql.utils.constants import JWST_INSTRUMENT_NAMES_MIXEDCASE
 from jwql.utils.constants import JWST_INSTRUMENT_NAMES_SHORTHAND
-from jwql.utils.preview_image import PreviewImage
+from jwql.utils.filesystem_index import open_filesystem_index
+from jwql.utils.header_cache import get_headers
+from jwql.utils.mast_cache import mast_service_request
+from jwql.utils.query_executor import QueryExecutor
+from jwql.utils.render_queue import RenderQueue
 from jwql.utils.credentials import get_mast_token
 from .forms import MnemonicSearchForm, MnemonicQueryForm, MnemonicExplorationForm
 
@@ -69,6 +82,16 @@ THUMBNAIL_FILESYSTEM = os.path.join(get_config()['jwql_dir'], 'thumbnails')
 PACKAGE_DIR = os.path.dirname(__location__.split('website')[0])
 REPO_DIR = os.path.split(PACKAGE_DIR)[0]
 
+# Number of rows read from the database at a time when a table is
+# exported
+EXPORT_CHUNK_SIZE = 10000
+
+# Default and largest number of rows in a page of the table viewer, and
+# the number of values of array columns shown in each row
+TABLE_PAGE_LENGTH = 25
+TABLE_PAGE_MAX_LENGTH = 1000
+TABLE_ARRAY_PREVIEW_LENGTH = 5
+
 
 def build_table(tablename):
     """Create Pandas dataframe from JWQLDB table.
@@ -83,22 +106,13 @@ def build_table(tablename):
     table_meta_data : pandas.DataFrame
         Pandas data frame version of JWQL database table.
     """
-    # Make dictionary of tablename : class object
-    # This matches what the user selects in the select element
-    # in the webform to the python object on the backend.
-    tables_of_interest = {}
-    for item in di.__dict__.keys():
-        table = getattr(di, item)
-        if hasattr(table, '__tablename__'):
-            tables_of_interest[table.__tablename__] = table
-
-    session, _, _, _ = load_connection(get_config()['connection_string'])
-    table_object = tables_of_interest[tablename]  # Select table object
+    table_object = get_jwqldb_table(tablename)  # Select table object
 
-    result = session.query(table_object)
+    result = di.session.query(table_object)
 
     # Turn query result into list of dicts
     result_dict = [row.__dict__ for row in result.all()]
+    di.session.close()
     column_names = table_object.__table__.columns.keys()
 
     # Build list of column data based on column name.
@@ -191,9 +205,8 @@ def get_all_proposals():
         filesystem
     """
 
-    proposals = glob.glob(os.path.join(FILESYSTEM_DIR, '*'))
-    proposals = [proposal.split('jw')[-1] for proposal in proposals]
-    proposals = [proposal for proposal in proposals if len(proposal) == 5]
+    with open_filesystem_index() as index:
+        proposals = index.programs()
 
     return proposals
 
@@ -215,19 +228,7 @@ def get_current_flagged_anomalies(rootname, instrument):
         (e.g. ``['snowball', 'crosstalk']``)
     """
 
-    table_dict = {}
-    table_dict[instrument.lower()] = getattr(di, '{}Anomaly'.format(JWST_INSTRUMENT_NAMES_MIXEDCASE[instrument.lower()]))
-
-    table = table_dict[instrument.lower()]
-    query = di.session.query(table).filter(table.rootname == rootname).order_by(table.flag_date.desc()).limit(1)
-
-    all_records = query.data_frame
-    if not all_records.empty:
-        current_anomalies = [col for col, val in np.sum(all_records, axis=0).items() if val]
-    else:
-        current_anomalies = []
-
-    return current_anomalies
+    return di.get_current_anomalies([rootname], instrument)[rootname]
 
 
 def get_dashboard_components():
@@ -490,13 +491,8 @@ def get_filenames_by_instrument(instrument):
 
     # Find all of the matching files in filesytem
     # (TEMPORARY WHILE THE MAST STUFF IS BEING WORKED OUT)
-    instrument_match = {'FGS': 'guider',
-                        'MIRI': 'mir',
-                        'NIRCam': 'nrc',
-                        'NIRISS': 'nis',
-                        'NIRSpec': 'nrs'}
-    search_filepath = os.path.join(FILESYSTEM_DIR, '*', '*.fits')
-    filepaths = [f for f in glob.glob(search_filepath) if instrument_match[instrument] in f]
+    with open_filesystem_index() as index:
+        filepaths = index.files('fits', instrument=instrument)
 
     return filepaths
 
@@ -516,9 +512,8 @@ def get_filenames_by_proposal(proposal):
         A list of filenames associated with the given ``proposal``.
     """
 
-    proposal_string = '{:05d}'.format(int(proposal))
-    filenames = sorted(glob.glob(os.path.join(
-        FILESYSTEM_DIR, 'jw{}'.format(proposal_string), '*')))
+    with open_filesystem_index() as index:
+        filenames = index.files('fits', program=proposal)
     filenames = [os.path.basename(filename) for filename in filenames]
 
     return filenames
@@ -540,11 +535,8 @@ def get_filenames_by_rootname(rootname):
         A list of filenames associated with the given ``rootname``.
     """
 
-    proposal = rootname.split('_')[0].split('jw')[-1][0:5]
-    filenames = sorted(glob.glob(os.path.join(
-        FILESYSTEM_DIR,
-        'jw{}'.format(proposal),
-        '{}*'.format(rootname))))
+    with open_filesystem_index() as index:
+        filenames = index.files('fits', prefix=rootname)
     filenames = [os.path.basename(filename) for filename in filenames]
 
     return filenames
@@ -565,45 +557,19 @@ def get_header_info(filename):
         The FITS headers of the extensions in the given ``file``.
     """
 
-    # Initialize dictionary to store header information
-    header_info = {}
-
-    # Open the file
+    # Get the headers of all of the extensions, from the cache if the
+    # file has not changed
     fits_filepath = os.path.join(FILESYSTEM_DIR, filename[:7], '{}.fits'.format(filename))
-    hdulist = fits.open(fits_filepath)
-
-    # Extract header information from file
-    for ext in range(0, len(hdulist)):
-
-        # Initialize dictionary to store header information for particular extension
-        header_info[ext] = {}
-
-        # Get header
-        header = fits.getheader(fits_filepath, ext=ext)
-
-        # Determine the extension name
-        if ext == 0:
-            header_info[ext]['EXTNAME'] = 'PRIMARY'
-        else:
-            header_info[ext]['EXTNAME'] = header['EXTNAME']
-
-        # Get list of keywords and values
-        exclude_list = ['', 'COMMENT']
-        header_info[ext]['keywords'] = [item for item in list(header.keys()) if item not in exclude_list]
-        header_info[ext]['values'] = []
-        for key in header_info[ext]['keywords']:
-            header_info[ext]['values'].append(hdulist[ext].header[key])
-
-    # Close the file
-    hdulist.close()
+    headers = get_headers(fits_filepath)
 
     # Build tables
-    for ext in header_info:
-        table = Table([header_info[ext]['keywords'], header_info[ext]['values']], names=('Key', 'Value'))
-        temp_path_for_html = os.path.join(tempfile.mkdtemp(), '{}_table.html'.format(header_info[ext]['EXTNAME']))
-        with open(temp_path_for_html, 'w') as f:
-            table.write(f, format='jsviewer', jskwargs={'display_length': 20})
-        header_info[ext]['table'] = open(temp_path_for_html, 'r').read()
+    header_info = {}
+    for ext, header in enumerate(headers):
+        header_info[ext] = header
+        table = Table([header['keywords'], header['values']], names=('Key', 'Value'))
+        html = io.StringIO()
+        table.write(html, format='jsviewer', jskwargs={'display_length': 20})
+        header_info[ext]['table'] = html.getvalue()
 
     return header_info
 
@@ -625,7 +591,8 @@ def get_image_info(file_root, rewrite):
     -------
     image_info : dict
         A dictionary containing various information for the given
-        ``file_root``.
+        ``file_root``. ``render_jobs`` gives the identifiers of the
+        render queue jobs of the suffixes whose JPEGs are being made.
     """
 
     # Initialize dictionary to store information
@@ -633,13 +600,17 @@ def get_image_info(file_root, rewrite):
     image_info['all_jpegs'] = []
     image_info['suffixes'] = []
     image_info['num_ints'] = {}
+    image_info['tile_pyramids'] = {}
+    image_info['render_jobs'] = {}
 
     preview_dir = os.path.join(get_config()['jwql_dir'], 'preview_images')
 
-    # Find all of the matching files
+    # Find all of the matching files. Update the index of the preview
+    # images first, in case any have been made since it was last updated
     dirname = file_root[:7]
-    search_filepath = os.path.join(FILESYSTEM_DIR, dirname, file_root + '*.fits')
-    image_info['all_files'] = glob.glob(search_filepath)
+    index = open_filesystem_index()
+    index.update_directory(os.path.join(preview_dir, dirname))
+    image_info['all_files'] = index.files('fits', prefix=file_root)
 
     for file in image_info['all_files']:
 
@@ -657,25 +628,56 @@ def get_image_info(file_root, rewrite):
         if os.path.exists(jpg_filepath) and not rewrite:
             pass
 
-        # If it doesn't, make it using the preview_image module
+        # If it doesn't, queue it to be made by the render workers,
+        # rather than making it during the request
         else:
-            if not os.path.exists(jpg_dir):
-                os.makedirs(jpg_dir)
-            im = PreviewImage(file, 'SCI')
-            im.output_directory = jpg_dir
-            im.make_image()
+            queue = RenderQueue()
+            image_info['render_jobs'][suffix] = queue.submit(file, jpg_dir,
+                                                             os.path.join(THUMBNAIL_FILESYSTEM, dirname))
+            queue.close()
 
         # Record how many integrations there are per filetype
-        search_jpgs = os.path.join(preview_dir, dirname,
-                                   file_root + '_{}_integ*.jpg'.format(suffix))
-        num_jpgs = len(glob.glob(search_jpgs))
-        image_info['num_ints'][suffix] = num_jpgs
+        integration_prefix = file_root + '_{}_integ'.format(suffix)
+        image_info['num_ints'][suffix] = index.count('preview', prefix=integration_prefix)
+
+        # Record the descriptors of any tile pyramids of the integrations
+        image_info['tile_pyramids'][suffix] = index.files('tiles', prefix=integration_prefix)
 
         image_info['all_jpegs'].append(jpg_filepath)
 
+    index.close()
+
     return image_info
 
 
+def get_instrument_query(inst, columns):
+    """Return the MAST service and parameters of a query for all of
+    the files of the given instrument.
+
+    Parameters
+    ----------
+    inst : str
+        The instrument of interest (e.g. ``NIRCam``)
+    columns : str
+        The columns to return (e.g. ``filename``)
+
+    Returns
+    -------
+    service : str
+        Name of the MAST service (e.g. ``Mast.Jwst.Filtered.Nircam``)
+    params : dict
+        Parameters of the query
+    """
+
+    # Make sure the instrument is of the proper format (e.g. "Nircam")
+    instrument = inst[0].upper() + inst[1:].lower()
+    service = "Mast.Jwst.Filtered.{}".format(instrument)
+    params = {"columns": columns,
+              "filters": []}
+
+    return service, params
+
+
 def get_instrument_proposals(instrument):
     """Return a list of proposals for the given instrument
 
@@ -691,19 +693,163 @@ def get_instrument_proposals(instrument):
         List of proposals for the given instrument
     """
 
-    service = "Mast.Jwst.Filtered.{}".format(instrument)
-    params = {"columns": "program",
-              "filters": []}
-    response = Mast.service_request_async(service, params)
-    results = response[0].json()['data']
+    service, params = get_instrument_query(instrument, 'program')
+    results = mast_service_request(service, params)['data']
     proposals = list(set(result['program'] for result in results))
 
     return proposals
 
 
+def get_jwqldb_table(tablename):
+    """Return the ORM of a JWQL database table.
+
+    Parameters
+    ----------
+    tablename : str
+        Name of JWQL database table name.
+
+    Returns
+    -------
+    table_object : obj
+        The ``SQLAlchemy`` ORM of the table
+    """
+    # Make dictionary of tablename : class object
+    # This matches what the user selects in the select element
+    # in the webform to the python object on the backend.
+    tables_of_interest = {}
+    for item in di.__dict__.keys():
+        table = getattr(di, item)
+        if hasattr(table, '__tablename__'):
+            tables_of_interest[table.__tablename__] = table
+
+    return tables_of_interest[tablename]
+
+
+def get_jwqldb_table_page(tablename, start=0, length=TABLE_PAGE_LENGTH, order_column=None,
+                          order_direction='asc', search=None, filters=None):
+    """Return one page of the rows of a JWQL database table, sorted and
+    filtered in the database.
+
+    Only the rows of the page are read from the database. Array columns
+    are truncated in the database to their first
+    ``TABLE_ARRAY_PREVIEW_LENGTH`` values, followed by the number of
+    values if there are more.
+
+    Parameters
+    ----------
+    tablename : str
+        Name of JWQL database table name.
+    start : int
+        Index of the first row of the page
+    length : int
+        Number of rows in the page, at most ``TABLE_PAGE_MAX_LENGTH``
+    order_column : str
+        Name of the column to sort by. Rows are sorted by primary key if
+        ``None``, and by primary key within equal values otherwise.
+    order_direction : str
+        ``asc`` or ``desc``
+    search : str
+        Text that must be found in the value of any column of a row,
+        ignoring case
+    filters : dict
+        Text that must be found in the value of a column, ignoring
+        case, by column name
+
+    Returns
+    -------
+    page : dict
+        The ``columns`` of the table, the ``rows`` of the page as lists
+        of values, the number of rows in the table (``records_total``)
+        and the number of rows that match the search and filters
+        (``records_filtered``)
+
+    Raises
+    ------
+    KeyError
+        If the table does not exist
+    ValueError
+        If a column does not exist or the sort direction is not valid
+    """
+    table = get_jwqldb_table(tablename).__table__
+    column_names = table.columns.keys()
+
+    if order_direction not in ['asc', 'desc']:
+        raise ValueError('Unrecognized sort direction: {}'.format(order_direction))
+    filters = filters or {}
+    for column_name in [order_column] + list(filters):
+        if column_name is not None and column_name not in column_names:
+            raise ValueError('Unrecognized column: {}'.format(column_name))
+    start = max(int(start), 0)
+    length = min(max(int(length), 0), TABLE_PAGE_MAX_LENGTH)
+
+    # Every value is compared as text, so that any column can be
+    # searched and filtered. Wildcards in the values are matched
+    # literally
+    conditions = [cast(table.columns[name], String).ilike(_contains_pattern(value), escape='\\')
+                  for name, value in filters.items() if value]
+    if search:
+        conditions.append(or_(*[cast(column, String).ilike(_contains_pattern(search), escape='\\')
+                                for column in table.columns]))
+
+    order_by = list(table.primary_key.columns)
+    if order_column is not None:
+        column = table.columns[order_column]
+        order_by.insert(0, column.desc() if order_direction == 'desc' else column.asc())
+
+    # Select the previews and lengths of array columns instead of the
+    # whole arrays
+    selected = []
+    array_columns = []
+    for column in table.columns:
+        if isinstance(column.type, ARRAY):
+            array_columns.append(column.name)
+            selected.append(column[1:TABLE_ARRAY_PREVIEW_LENGTH].label(column.name))
+            selected.append(func.cardinality(column).label('{}_length'.format(column.name)))
+        else:
+            selected.append(column)
+
+    query = select(selected).order_by(*order_by).limit(length).offset(start)
+    if conditions:
+        query = query.where(and_(*conditions))
+    with di.engine.connect() as connection:
+        records_total = connection.execute(select([func.count()]).select_from(table)).scalar()
+        if conditions:
+            records_filtered = connection.execute(
+                select([func.count()]).select_from(table).where(and_(*conditions))).scalar()
+        else:
+            records_filtered = records_total
+        result = connection.execute(query)
+
+        rows = []
+        for row in result:
+            values = []
+            for name in column_names:
+                value = row[name]
+                if name in array_columns and value is not None:
+                    value = list(value)
+                    if row['{}_length'.format(name)] > len(value):
+                        value.append('... ({} values)'.format(row['{}_length'.format(name)]))
+                values.append(value)
+            rows.append(values)
+
+    return {'columns': column_names, 'rows': rows,
+            'records_total': records_total, 'records_filtered': records_filtered}
+
+
+def _contains_pattern(value):
+    """Return a ``LIKE`` pattern that matches text containing the given
+    value, with ``\\``, ``%`` and ``_`` escaped by ``\\``."""
+    for character in ('\\', '%', '_'):
+        value = value.replace(character, '\\' + character)
+    return '%{}%'.format(value)
+
+
 def get_jwqldb_table_view_components(request):
     """Renders view for JWQLDB table viewer.
 
+    The rows of the table are not read here; the table viewer loads
+    them a page at a time with ``get_jwqldb_table_page``.
+
     Parameters
     ----------
     request : HttpRequest object
@@ -711,23 +857,21 @@ def get_jwqldb_table_view_components(request):
 
     Returns
     -------
-    table_data : pandas.DataFrame
-        Pandas data frame of JWQL database table
+    table_columns : list
+        Names of the columns of the JWQL database table
     table_name : str
         Name of database table selected by user
     """
 
     if 'make_table_view' in request.POST:
         table_name = request.POST['db_table_select']
-        table_data = build_table(table_name)
-
-        return table_data, table_name
+        table_columns = get_jwqldb_table(table_name).__table__.columns.keys()
     else:
         # When coming from home/monitor views
-        table_data = None
+        table_columns = None
         table_name = None
 
-    return table_data, table_name
+    return table_columns, table_name
 
 
 def get_preview_images_by_instrument(inst):
@@ -746,21 +890,16 @@ def get_preview_images_by_instrument(inst):
         given instrument.
     """
 
-    # Make sure the instrument is of the proper format (e.g. "Nircam")
-    instrument = inst[0].upper() + inst[1:].lower()
-
     # Query MAST for all rootnames for the instrument
-    service = "Mast.Jwst.Filtered.{}".format(instrument)
-    params = {"columns": "filename",
-              "filters": []}
-    response = Mast.service_request_async(service, params)
-    results = response[0].json()['data']
+    service, params = get_instrument_query(inst, 'filename')
+    results = mast_service_request(service, params)['data']
 
     # Parse the results to get the rootnames
     filenames = [result['filename'].split('.')[0] for result in results]
 
     # Get list of all preview_images
-    preview_images = glob.glob(os.path.join(PREVIEW_IMAGE_FILESYSTEM, '*', '*.jpg'))
+    with open_filesystem_index() as index:
+        preview_images = index.files('preview')
 
     # Get subset of preview images that match the filenames
     preview_images = [os.path.basename(item) for item in preview_images if
@@ -787,8 +926,8 @@ def get_preview_images_by_proposal(proposal):
         given ``proposal``.
     """
 
-    proposal_string = '{:05d}'.format(int(proposal))
-    preview_images = glob.glob(os.path.join(PREVIEW_IMAGE_FILESYSTEM, 'jw{}'.format(proposal_string), '*'))
+    with open_filesystem_index() as index:
+        preview_images = index.files('preview', program=proposal)
     preview_images = [os.path.basename(preview_image) for preview_image in preview_images]
 
     return preview_images
@@ -811,11 +950,8 @@ def get_preview_images_by_rootname(rootname):
         given ``rootname``.
     """
 
-    proposal = rootname.split('_')[0].split('jw')[-1][0:5]
-    preview_images = sorted(glob.glob(os.path.join(
-        PREVIEW_IMAGE_FILESYSTEM,
-        'jw{}'.format(proposal),
-        '{}*'.format(rootname))))
+    with open_filesystem_index() as index:
+        preview_images = index.files('preview', prefix=rootname)
     preview_images = [os.path.basename(preview_image) for preview_image in preview_images]
 
     return preview_images
@@ -842,23 +978,18 @@ def get_proposal_info(filepaths):
     """
 
     proposals = list(set([f.split('/')[-1][2:7] for f in filepaths]))
-    thumbnail_dir = os.path.join(get_config()['jwql_dir'], 'thumbnails')
     thumbnail_paths = []
     num_files = []
+    index = open_filesystem_index()
     for proposal in proposals:
-        thumbnail_search_filepath = os.path.join(
-            thumbnail_dir, 'jw{}'.format(proposal), 'jw{}*rate*.thumb'.format(proposal)
-        )
-        thumbnail = glob.glob(thumbnail_search_filepath)
+        thumbnail = index.files('thumbnail', program=proposal, suffixes=['rate', 'rateints'])
         if len(thumbnail) > 0:
             thumbnail = thumbnail[0]
             thumbnail = '/'.join(thumbnail.split('/')[-2:])
         thumbnail_paths.append(thumbnail)
 
-        fits_search_filepath = os.path.join(
-            FILESYSTEM_DIR, 'jw{}'.format(proposal), 'jw{}*.fits'.format(proposal)
-        )
-        num_files.append(len(glob.glob(fits_search_filepath)))
+        num_files.append(index.count('fits', program=proposal))
+    index.close()
 
     # Put the various information into a dictionary of results
     proposal_info = {}
@@ -870,6 +1001,64 @@ def get_proposal_info(filepaths):
     return proposal_info
 
 
+def get_proposal_summaries(instrument):
+    """Return the summaries of the proposals of an instrument, as kept
+    in the filesystem index, in the form returned by
+    ``get_proposal_info``.
+
+    Parameters
+    ----------
+    instrument : str
+        Name of the JWST instrument (e.g. ``NIRCam``)
+
+    Returns
+    -------
+    proposal_info : dict
+        A dictionary containing the number of proposals, and the
+        proposals, paths to their thumbnails, and their numbers of
+        files and observations
+    """
+    with open_filesystem_index() as index:
+        summaries = index.proposals(instrument)
+
+    proposal_info = {}
+    proposal_info['num_proposals'] = len(summaries)
+    proposal_info['proposals'] = [summary['program'] for summary in summaries]
+    proposal_info['thumbnail_paths'] = [summary['thumbnail'] or [] for summary in summaries]
+    proposal_info['num_files'] = [summary['num_files'] for summary in summaries]
+    proposal_info['num_observations'] = [summary['num_observations'] for summary in summaries]
+
+    return proposal_info
+
+
+def get_render_job_status(job_id):
+    """Return the status of a job in the render queue, to be reported
+    to the ``view_image`` page while its preview images are made.
+
+    Parameters
+    ----------
+    job_id : int
+        The job identifier, as returned by ``get_image_info``
+
+    Returns
+    -------
+    status : dict
+        Dictionary with keys ``status`` (``pending``, ``running``,
+        ``done``, ``failed`` or ``unknown``), ``position`` (the number
+        of jobs ahead of this one in the queue), ``num_ints`` (the
+        number of preview images made) and ``error``
+    """
+    queue = RenderQueue()
+    job = queue.job(job_id)
+    queue.close()
+
+    if job is None:
+        return {'status': 'unknown', 'position': None, 'num_ints': 0, 'error': None}
+
+    return {'status': job['status'], 'position': job['position'],
+            'num_ints': len(job['outputs']), 'error': job['error']}
+
+
 def get_thumbnails_all_instruments(parameters):
     """Return a list of thumbnails available in the filesystem for all
     instruments given requested MAST parameters and queried anomalies.
@@ -895,17 +1084,15 @@ def get_thumbnails_all_instruments(parameters):
 
     anomalies = parameters['anomalies']
 
-    thumbnail_list = []
-    filenames = []
+    filenames = set()
 
-    if parameters['instruments'] is None:
-        thumbnails = []
-    for inst in parameters['instruments']:
+    # Query MAST for all rootnames of each instrument, at once
+    requests = []
+    for inst in parameters['instruments'] or []:
         print("Retrieving thumbnails for", inst)
         # Make sure instruments are of the proper format (e.g. "Nircam")
         instrument = inst[0].upper() + inst[1:].lower()
 
-        # Query MAST for all rootnames for the instrument
         service = "Mast.Jwst.Filtered.{}".format(instrument)
 
         params = {"columns": "*",
@@ -925,49 +1112,44 @@ def get_thumbnails_all_instruments(parameters):
                                "values": parameters['read_patterns'][inst.lower()]
                                }
                               ]}
+        requests.append((service, params))
 
-        response = Mast.service_request_async(service, params)
-        results = response[0].json()['data']
-
-        for result in results:
-            filename = result['filename'].split('.')[0]
-            filenames.append(filename)
-
-        # Get list of all thumbnails
-        thumbnails = glob.glob(os.path.join(THUMBNAIL_FILESYSTEM, '*', '*.thumb'))
-        thumbnail_list.extend(thumbnails)
+    for result in QueryExecutor().query_all(requests):
+        filenames.update(row['filename'].split('.')[0] for row in result['data'])
 
-    # Get subset of preview images that match the filenames
-    thumbnails_subset = [os.path.basename(item) for item in thumbnail_list if
-                         os.path.basename(item).split('_integ')[0] in filenames]
+    # Get list of all thumbnails
+    with open_filesystem_index() as index:
+        thumbnails = [os.path.basename(thumbnail) for thumbnail in index.files('thumbnail')]
 
-    # Eliminate any duplicates
-    thumbnails_subset = list(set(thumbnails_subset))
+    # Get subset of thumbnails that match the filenames, without duplicates
+    thumbnails_subset = sorted(set(thumbnail for thumbnail in thumbnails
+                                   if thumbnail.split('_integ')[0] in filenames))
 
-    # Determine whether or not queried anomalies are flagged
-    final_subset = []
+    # Group the thumbnails by instrument and rootname
+    thumbnails_by_instrument = {}
     for thumbnail in thumbnails_subset:
         components = thumbnail.split('_')
-        rootname = '{}_{}_{}_{}'.format(components[0], components[1], components[2], components[3])
+        rootname = '_'.join(components[:4])
         try:
-            instrument = JWST_INSTRUMENT_NAMES_SHORTHAND[thumbnail.split("_")[3][:3]]
-            thumbnail_anomalies = get_current_flagged_anomalies(rootname, instrument)
-            if thumbnail_anomalies:
-                for anomaly in anomalies[instrument.lower()]:
-                    if anomaly.lower() in thumbnail_anomalies:
-                        print(thumbnail, "contains an anomaly selected in the query")
-                        final_subset.append(thumbnail)
-        except KeyError:
+            instrument = JWST_INSTRUMENT_NAMES_SHORTHAND[components[3][:3]]
+        except (IndexError, KeyError):
             try:
-                instrument = JWST_INSTRUMENT_NAMES_SHORTHAND[thumbnail.split("_")[2][:3]]
-                thumbnail_anomalies = get_current_flagged_anomalies(rootname, instrument)
-                if thumbnail_anomalies:
-                    for anomaly in anomalies[instrument.lower()]:
-                        if anomaly.lower() in thumbnail_anomalies:
-                            print(thumbnail, "contains an anomaly selected in the query")
-                            final_subset.append(thumbnail)
-            except KeyError:
+                instrument = JWST_INSTRUMENT_NAMES_SHORTHAND[components[2][:3]]
+            except (IndexError, KeyError):
                 print("Error with thumbnail: ", thumbnail)
+                continue
+        thumbnails_by_instrument.setdefault(instrument, {}).setdefault(rootname, []).append(thumbnail)
+
+    # Determine whether or not queried anomalies are flagged, with one
+    # query of the current anomalies of each instrument
+    final_subset = []
+    for instrument, thumbnails_by_rootname in sorted(thumbnails_by_instrument.items()):
+        queried_anomalies = set(anomaly.lower() for anomaly in anomalies.get(instrument.lower(), []))
+        current_anomalies = di.get_current_anomalies(thumbnails_by_rootname, instrument)
+        for rootname, thumbnail_anomalies in current_anomalies.items():
+            if queried_anomalies.intersection(thumbnail_anomalies):
+                print(rootname, "contains an anomaly selected in the query")
+                final_subset.extend(thumbnails_by_rootname[rootname])
 
     if not final_subset:
         print("No images matched anomaly selection")
@@ -975,7 +1157,7 @@ def get_thumbnails_all_instruments(parameters):
         if not final_subset:
             final_subset = thumbnails[:10]
 
-    return list(set(final_subset))
+    return sorted(set(final_subset))
 
 
 def get_thumbnails_by_instrument(inst):
@@ -994,21 +1176,16 @@ def get_thumbnails_by_instrument(inst):
         given instrument.
     """
 
-    # Make sure the instrument is of the proper format (e.g. "Nircam")
-    instrument = inst[0].upper() + inst[1:].lower()
-
     # Query MAST for all rootnames for the instrument
-    service = "Mast.Jwst.Filtered.{}".format(instrument)
-    params = {"columns": "filename",
-              "filters": []}
-    response = Mast.service_request_async(service, params)
-    results = response[0].json()['data']
+    service, params = get_instrument_query(inst, 'filename')
+    results = mast_service_request(service, params)['data']
 
     # Parse the results to get the rootnames
     filenames = [result['filename'].split('.')[0] for result in results]
 
     # Get list of all thumbnails
-    thumbnails = glob.glob(os.path.join(THUMBNAIL_FILESYSTEM, '*', '*.thumb'))
+    with open_filesystem_index() as index:
+        thumbnails = index.files('thumbnail')
 
     # Get subset of preview images that match the filenames
     thumbnails = [os.path.basename(item) for item in thumbnails if
@@ -1033,8 +1210,8 @@ def get_thumbnails_by_proposal(proposal):
         ``proposal``.
     """
 
-    proposal_string = '{:05d}'.format(int(proposal))
-    thumbnails = glob.glob(os.path.join(THUMBNAIL_FILESYSTEM, 'jw{}'.format(proposal_string), '*'))
+    with open_filesystem_index() as index:
+        thumbnails = index.files('thumbnail', program=proposal)
     thumbnails = [os.path.basename(thumbnail) for thumbnail in thumbnails]
 
     return thumbnails
@@ -1057,17 +1234,52 @@ def get_thumbnails_by_rootname(rootname):
         given ``rootname``.
     """
 
-    proposal = rootname.split('_')[0].split('jw')[-1][0:5]
-    thumbnails = sorted(glob.glob(os.path.join(
-        THUMBNAIL_FILESYSTEM,
-        'jw{}'.format(proposal),
-        '{}*'.format(rootname))))
-
+    with open_filesystem_index() as index:
+        thumbnails = index.files('thumbnail', prefix=rootname)
     thumbnails = [os.path.basename(thumbnail) for thumbnail in thumbnails]
 
     return thumbnails
 
 
+def iter_table_chunks(tablename, chunksize=EXPORT_CHUNK_SIZE):
+    """Read the rows of a JWQL database table in chunks, with a
+    server-side cursor, so that only one chunk is held in memory.
+
+    Parameters
+    ----------
+    tablename : str
+        Name of JWQL database table name.
+    chunksize : int
+        Number of rows in each chunk
+
+    Returns
+    -------
+    column_names : list
+        Names of the columns of the table
+    chunks : generator
+        Generator of lists of rows, each a tuple of column values, in
+        order of primary key. The database connection is closed when
+        the generator is exhausted or closed.
+    """
+    table = get_jwqldb_table(tablename).__table__
+    column_names = table.columns.keys()
+
+    def chunks():
+        connection = di.engine.connect()
+        try:
+            query = table.select().order_by(*table.primary_key.columns)
+            result = connection.execution_options(stream_results=True).execute(query)
+            while True:
+                rows = result.fetchmany(chunksize)
+                if len(rows) == 0:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            connection.close()
+
+    return column_names, chunks()
+
+
 def log_into_mast(request):
     """Login via astroquery.mast if user authenticated in web app.
 
@@ -1091,6 +1303,18 @@ def log_into_mast(request):
         return False
 
 
+def parquet_export_available():
+    """Return whether tables can be exported as Parquet by
+    ``stream_table_parquet``, which requires ``pyarrow``.
+
+    Returns
+    -------
+    available : bool
+        ``True`` if ``pyarrow`` is installed
+    """
+    return pyarrow is not None
+
+
 def random_404_page():
     """Randomly select one of the various 404 templates for JWQL
 
@@ -1106,6 +1330,137 @@ def random_404_page():
     return random_template
 
 
+def stream_table_csv(tablename, chunksize=EXPORT_CHUNK_SIZE):
+    """Yield a JWQL database table as CSV text, one chunk of rows at a
+    time.
+
+    Parameters
+    ----------
+    tablename : str
+        Name of JWQL database table name.
+    chunksize : int
+        Number of rows read from the database at a time
+
+    Yields
+    ------
+    text : str
+        The header line, then the lines of each chunk of rows
+    """
+    column_names, chunks = iter_table_chunks(tablename, chunksize)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(column_names)
+    yield buffer.getvalue()
+
+    for rows in chunks:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def stream_table_parquet(tablename, chunksize=EXPORT_CHUNK_SIZE):
+    """Return a generator of a JWQL database table as a Parquet file,
+    which writes a row group for each chunk of rows. Requires
+    ``pyarrow``.
+
+    Parameters
+    ----------
+    tablename : str
+        Name of JWQL database table name.
+    chunksize : int
+        Number of rows read from the database at a time, and in each
+        row group
+
+    Returns
+    -------
+    data : generator
+        Generator of the bytes of the file written for each chunk
+
+    Raises
+    ------
+    ImportError
+        If ``pyarrow`` is not installed
+    """
+    if pyarrow is None:
+        raise ImportError('pyarrow is required to export tables as Parquet')
+
+    table = get_jwqldb_table(tablename).__table__
+    schema = pyarrow.schema([(column.name, _arrow_type(column.type)) for column in table.columns])
+    _, chunks = iter_table_chunks(tablename, chunksize)
+
+    def data():
+        buffer = _StreamBuffer()
+        writer = pyarrow.parquet.ParquetWriter(buffer, schema)
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema))
+            yield buffer.take()
+
+        writer.close()
+        yield buffer.take()
+
+    return data()
+
+
+def _arrow_type(column_type):
+    """Return the ``pyarrow`` type of a ``SQLAlchemy`` column type,
+    using strings for types that have no equivalent."""
+    if isinstance(column_type, ARRAY):
+        return pyarrow.list_(_arrow_type(column_type.item_type))
+
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:
+        return pyarrow.string()
+
+    # bool is a subclass of int, and datetime of date, so are tested first
+    arrow_types = [(bool, pyarrow.bool_()),
+                   (int, pyarrow.int64()),
+                   (float, pyarrow.float64()),
+                   (datetime.datetime, pyarrow.timestamp('us')),
+                   (datetime.date, pyarrow.date32()),
+                   (datetime.time, pyarrow.time64('us'))]
+    for python_base, arrow_type in arrow_types:
+        if issubclass(python_type, python_base):
+            return arrow_type
+
+    return pyarrow.string()
+
+
+class _StreamBuffer():
+    """A write-only file-like object whose contents are taken as they
+    are written, so that a Parquet file can be streamed."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def flush(self):
+        pass
+
+    def take(self):
+        """Return and remove the bytes written since the last call."""
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+
 def thumbnails_ajax(inst, proposal=None):
     """Generate a page that provides data necessary to render the
     ``thumbnails`` template.
@@ -1126,8 +1481,12 @@ def thumbnails_ajax(inst, proposal=None):
     # Get the available files for the instrument
     filepaths = get_filenames_by_instrument(inst)
 
-    # Get set of unique rootnames
-    rootnames = set(['_'.join(f.split('/')[-1].split('_')[:-1]) for f in filepaths])
+    # Get the available files of each unique rootname
+    files_by_rootname = {}
+    for filepath in filepaths:
+        filename = os.path.basename(filepath)
+        files_by_rootname.setdefault('_'.join(filename.split('_')[:-1]), []).append(filename)
+    rootnames = set(files_by_rootname)
 
     # If the proposal is specified (i.e. if the page being loaded is
     # an archive page), only collect data for given proposal
@@ -1140,6 +1499,9 @@ def thumbnails_ajax(inst, proposal=None):
     data_dict['inst'] = inst
     data_dict['file_data'] = {}
 
+    # Get the current anomalies of all of the rootnames in one query
+    current_anomalies = di.get_current_anomalies(rootnames, inst)
+
     # Gather data for each rootname
     for rootname in rootnames:
 
@@ -1158,13 +1520,14 @@ def thumbnails_ajax(inst, proposal=None):
                              'visit_group': rootname[14:16]}
 
         # Get list of available filenames
-        available_files = get_filenames_by_rootname(rootname)
+        available_files = sorted(files_by_rootname[rootname])
 
         # Add data to dictionary
         data_dict['file_data'][rootname] = {}
         data_dict['file_data'][rootname]['filename_dict'] = filename_dict
         data_dict['file_data'][rootname]['available_files'] = available_files
         data_dict['file_data'][rootname]['expstart'] = get_expstart(rootname)
+        data_dict['file_data'][rootname]['anomalies'] = current_anomalies[rootname]
         data_dict['file_data'][rootname]['suffixes'] = [filename_parser(filename)['suffix'] for
                                                         filename in available_files]
 
@@ -1211,6 +1574,9 @@ def thumbnails_query_ajax(rootnames, insts):
     data_dict['inst'] = "all"
     data_dict['file_data'] = {}
 
+    # Get the current anomalies of all of the rootnames in one query
+    current_anomalies = di.get_current_anomalies('_'.join(rootname.split('_')[:4]) for rootname in rootnames)
+
     # Gather data for each rootname
     for rootname in rootnames:
         # fit expected format for get_filenames_by_rootname()
@@ -1243,6 +1609,7 @@ def thumbnails_query_ajax(rootnames, insts):
         data_dict['file_data'][rootname]['filename_dict'] = filename_dict
         data_dict['file_data'][rootname]['available_files'] = available_files
         data_dict['file_data'][rootname]['expstart'] = get_expstart(rootname)
+        data_dict['file_data'][rootname]['anomalies'] = current_anomalies[rootname]
         data_dict['file_data'][rootname]['suffixes'] = [filename_parser(filename)['suffix'] for
                                                         filename in available_files]
         data_dict['file_data'][rootname]['prop'] = rootname[2:7]
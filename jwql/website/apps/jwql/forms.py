@@ -64,6 +64,7 @@ from jwql.utils.constants import GRATING_PER_INSTRUMENT
 from jwql.utils.constants import JWST_INSTRUMENT_NAMES_MIXEDCASE
 from jwql.utils.constants import JWST_INSTRUMENT_NAMES_SHORTHAND
 from jwql.utils.constants import READPATT_PER_INSTRUMENT
+from jwql.utils.request_profile import profiled
 from jwql.utils.utils import get_config, filename_parser
 from jwql.utils.utils import query_format
 
@@ -270,7 +271,8 @@ class FileSearchForm(forms.Form):
             proposal_string = '{:05d}'.format(int(search))
             search_string = os.path.join(FILESYSTEM_DIR, 'jw{}'.format(proposal_string),
                                          '*{}*.fits'.format(proposal_string))
-            all_files = glob.glob(search_string)
+            with profiled('filesystem', search_string):
+                all_files = glob.glob(search_string)
             if len(all_files) > 0:
                 all_instruments = []
                 for file in all_files:
@@ -289,7 +291,8 @@ class FileSearchForm(forms.Form):
         elif self.search_type == 'fileroot':
             # See if there are any matching fileroots and, if so, what instrument they are for
             search_string = os.path.join(FILESYSTEM_DIR, search[:7], '{}*.fits'.format(search))
-            all_files = glob.glob(search_string)
+            with profiled('filesystem', search_string):
+                all_files = glob.glob(search_string)
 
             if len(all_files) == 0:
                 raise forms.ValidationError('Fileroot {} not in the filesystem.'.format(search))
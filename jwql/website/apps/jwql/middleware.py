@@ -0,0 +1,92 @@
+"""Middleware that profiles the requests of the web application.
+
+The ``RequestProfilingMiddleware`` records the wall time of each
+request, the number of Django and ``SQLAlchemy`` database queries and
+the time spent in them, the number and time of the scans of the
+filesystem, and the time spent in MAST queries, and stores them with
+``jwql.utils.request_profile``. The profiles are shown on the
+``admin/request_profiles/`` page.
+
+Authors
+-------
+
+    - Lauren Chambers
+
+Use
+---
+
+    This middleware is listed under the ``MIDDLEWARE`` setting in
+    ``settings.py``. It is only used if ``profile_requests`` is
+    ``true`` in the config file, e.g.:
+    ::
+
+        "profile_requests": true
+"""
+
+from contextlib import ExitStack
+import logging
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from jwql.utils.request_profile import django_execute_wrapper, open_profile_store, start_profile, stop_profile
+from jwql.utils.utils import get_config
+
+# Views whose requests are not profiled
+UNPROFILED_VIEWS = ['jwql:request_profiles', 'jwql:request_profile']
+
+
+class RequestProfilingMiddleware():
+    """Profile each request and store its profile.
+
+    The time of streaming responses (e.g. table exports) only includes
+    the time until the response starts.
+    """
+
+    def __init__(self, get_response):
+        """Initialize the middleware, if requests are profiled.
+
+        Parameters
+        ----------
+        get_response : function
+            The next middleware or view
+        """
+        if not get_config().get('profile_requests', False):
+            raise MiddlewareNotUsed('Requests are not profiled')
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Handle and profile a request.
+
+        Parameters
+        ----------
+        request : HttpRequest object
+            Incoming request from the webpage
+
+        Returns
+        -------
+        response : HttpResponse object
+            Outgoing response sent to the webpage
+        """
+        profile = start_profile()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(django_execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            stop_profile()
+        wall = time.perf_counter() - profile.start
+
+        view = request.resolver_match.view_name if request.resolver_match is not None else ''
+        if view not in UNPROFILED_VIEWS:
+            # A failure to store the profile should not fail the request
+            try:
+                with open_profile_store() as store:
+                    store.add(request.method, request.path, view, response.status_code, wall, profile)
+            except Exception as error:
+                logging.warning('Could not store the profile of {}: {}'.format(request.path, error))
+
+        return response
@@ -34,6 +34,7 @@ from jwql.database.database_interface import MIRIDarkQueryHistory, MIRIDarkPixel
 from jwql.database.database_interface import NIRSpecDarkQueryHistory, NIRSpecDarkPixelStats, NIRSpecDarkDarkCurrent
 from jwql.database.database_interface import FGSDarkQueryHistory, FGSDarkPixelStats, FGSDarkDarkCurrent
 from jwql.utils.constants import JWST_INSTRUMENT_NAMES_MIXEDCASE
+from jwql.utils.plotting import downsampled_source
 from jwql.utils.utils import get_config
 from jwql.bokeh_templating import BokehTemplate
 
@@ -165,6 +166,7 @@ class DarkMonitor(BokehTemplate):
         # Query database for all data in NIRCamDarkDarkCurrent with a matching aperture
         self.dark_table = session.query(self.stats_table) \
             .filter(self.stats_table.aperture == self._aperture) \
+            .order_by(self.stats_table.obs_mid_time) \
             .all()
 
         self.pixel_table = session.query(self.pixel_table) \
@@ -173,6 +175,12 @@ class DarkMonitor(BokehTemplate):
 
     def _update_dark_v_time(self):
 
+        # Show a downsampled dark current v. time, which is shown at full
+        # resolution when zoomed in
+        downsampled_source(self.refs['dark_current_time_figure'],
+                           {'time': self.timestamps, 'dark_current': np.array(self.dark_current)},
+                           'time', 'dark_current', source=self.refs['dark_current_source'])
+
         # Define y range of dark current v. time plot
         buffer_size = 0.05 * (max(self.dark_current) - min(self.dark_current))
         self.refs['dark_current_yrange'].start = min(self.dark_current) - buffer_size
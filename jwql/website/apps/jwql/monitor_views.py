@@ -57,7 +57,7 @@ def bad_pixel_monitor(request, inst):
     # Ensure the instrument is correctly capitalized
     inst = JWST_INSTRUMENT_NAMES_MIXEDCASE[inst.lower()]
 
-    tabs_components = bokeh_containers.bad_pixel_monitor_tabs(inst)
+    tabs_components = bokeh_containers.cached_monitor_tabs('bad_pixel_monitor', inst)
 
     template = "bad_pixel_monitor.html"
 
@@ -90,7 +90,7 @@ def bias_monitor(request, inst):
     inst = JWST_INSTRUMENT_NAMES_MIXEDCASE[inst.lower()]
 
     # Get the html and JS needed to render the bias tab plots
-    tabs_components = bokeh_containers.bias_monitor_tabs(inst)
+    tabs_components = bokeh_containers.cached_monitor_tabs('bias_monitor', inst)
 
     template = "bias_monitor.html"
 
@@ -124,7 +124,7 @@ def dark_monitor(request, inst):
 
     # Deal with the fact that only the NIRCam database is populated
     if inst == 'NIRCam':
-        tabs_components = bokeh_containers.dark_monitor_tabs(inst)
+        tabs_components = bokeh_containers.cached_monitor_tabs('dark_monitor', inst)
     else:
         tabs_components = None
 
@@ -159,7 +159,7 @@ def readnoise_monitor(request, inst):
     inst = JWST_INSTRUMENT_NAMES_MIXEDCASE[inst.lower()]
 
     # Get the html and JS needed to render the readnoise tab plots
-    tabs_components = bokeh_containers.readnoise_monitor_tabs(inst)
+    tabs_components = bokeh_containers.cached_monitor_tabs('readnoise_monitor', inst)
 
     template = "readnoise_monitor.html"
 
@@ -346,6 +346,7 @@ function update_archive_page(inst, base_url) {
                 prop = data.thumbnails.proposals[i];
                 thumb = data.thumbnails.thumbnail_paths[i];
                 n = data.thumbnails.num_files[i];
+                n_obs = data.thumbnails.num_observations[i];
 
                 // Build div content
                 content = '<div class="proposal text-center">';
@@ -355,7 +356,7 @@ function update_archive_page(inst, base_url) {
                 content += '<div class="proposal-color-fill" ></div>';
                 content += '<div class="proposal-info">';
                 content += '<h3>' + prop + '</h3>';
-                content += '<h6>' + n + ' Files</h6>';
+                content += '<h6>' + n + ' Files, ' + n_obs + ' Observations</h6>';
                 content += '</div></a></div>';
 
                 // Add the content to the div
@@ -487,6 +488,9 @@ function update_thumbnail_array(data) {
         content += 'Visit: ' + filename_dict.visit + '<br>';
         content += 'Detector: ' + filename_dict.detector + '<br>';
         content += 'Exp_Start: ' + file.expstart.toFixed(2) + '<br>';
+        if (file.anomalies.length > 0) {
+            content += 'Anomalies: ' + file.anomalies.join(', ') + '<br>';
+        }
         content += '</div></a></div>';
 
         // Add the content to the div
@@ -549,3 +553,36 @@ function version_url(version_string) {
     a_line += '">JWQL v' + version_string + '</a>';
     return a_line;
 };
+
+/**
+ * Wait for the preview images being made by the render queue, showing
+ * their progress, and reload the page once they have all been made
+ * @param {String} job_ids - Comma-separated render queue job identifiers
+ * @param {String} base_url - The base URL for gathering data from the AJAX view.
+ */
+function wait_for_render_jobs(job_ids, base_url) {
+    var requests = job_ids.split(',').map(function(job_id) {
+        return $.ajax({url: base_url + '/ajax/render_status/' + job_id + '/'});
+    });
+
+    Promise.all(requests).then(function(statuses) {
+        var int_counter = document.getElementById("int_count");
+        var waiting = statuses.filter(function(job) {return job.status == 'pending' || job.status == 'running';});
+        var failed = statuses.filter(function(job) {return job.status == 'failed';});
+
+        if (waiting.length > 0) {
+            var queued = waiting.filter(function(job) {return job.status == 'pending';});
+            if (queued.length > 0) {
+                var ahead = Math.max.apply(null, queued.map(function(job) {return job.position;}));
+                int_counter.innerHTML = 'Preview image queued (' + ahead + ' ahead in the queue)...';
+            } else {
+                int_counter.innerHTML = 'Making preview image...';
+            }
+            setTimeout(function() {wait_for_render_jobs(job_ids, base_url);}, 2000);
+        } else if (failed.length > 0) {
+            int_counter.innerHTML = 'Preview image could not be made: ' + failed[0].error;
+        } else {
+            window.location.reload();
+        }
+    });
+};
@@ -76,6 +76,8 @@ urlpatterns = [
 
     # Main site views
     path('about/', views.about, name='about'),
+    path('admin/request_profiles/', views.request_profiles, name='request_profiles'),
+    path('admin/request_profiles/<int:profile_id>/', views.request_profile, name='request_profile'),
     path('anomaly_query/', views.anomaly_query, name='anomaly_query'),
     path('api/', views.api_landing, name='api'),
     path('dashboard/', views.dashboard, name='dashboard'),
@@ -95,6 +97,8 @@ urlpatterns = [
     re_path('ajax/query_submit/', views.archive_thumbnails_query_ajax, name='archive_thumb_query_ajax'),
     re_path(r'^ajax/(?P<inst>({}))/archive/$'.format(instruments), views.archived_proposals_ajax, name='archive_ajax'),
     re_path(r'^ajax/(?P<inst>({}))/archive/(?P<proposal>[\d]{{1,5}})/$'.format(instruments), views.archive_thumbnails_ajax, name='archive_thumb_ajax'),
+    path('ajax/jwqldb/<str:tablename>/', views.jwqldb_table_data, name='jwqldb_table_data'),
+    re_path(r'^ajax/render_status/(?P<job_id>[\d]+)/$', views.render_status, name='render_status'),
 
     # REST API views
     path('api/proposals/', api_views.all_proposals, name='all_proposals'),
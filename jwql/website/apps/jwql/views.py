@@ -37,21 +37,24 @@ Dependencies
     placed in the ``jwql/utils/`` directory.
 """
 
-import csv
 import os
 
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404
 from django.http import JsonResponse
 from django.http import HttpRequest as request
 from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from django.shortcuts import redirect
 import pandas as pd
 
-from jwql.database.database_interface import load_connection
+from jwql.database.database_interface import engine
 from jwql.utils import anomaly_query_config
 from jwql.utils.constants import MONITORS
 from jwql.utils.constants import JWST_INSTRUMENT_NAMES_MIXEDCASE
 from jwql.utils.constants import JWST_INSTRUMENT_NAMES_SHORTHAND
+from jwql.utils.request_profile import open_profile_store
 from jwql.utils.utils import get_base_url
 from jwql.utils.utils import get_config
 from jwql.utils.utils import query_unformat
@@ -62,19 +65,25 @@ from .data_containers import get_acknowledgements
 from .data_containers import get_current_flagged_anomalies
 from .data_containers import get_dashboard_components
 from .data_containers import get_edb_components
-from .data_containers import get_filenames_by_instrument
 from .data_containers import get_header_info
 from .data_containers import get_image_info
 from .data_containers import get_proposal_info
+from .data_containers import get_proposal_summaries
+from .data_containers import get_render_job_status
 from .data_containers import get_thumbnails_all_instruments
 from .data_containers import nirspec_trending
+from .data_containers import parquet_export_available
 from .data_containers import random_404_page
+from .data_containers import stream_table_csv
+from .data_containers import stream_table_parquet
+from .data_containers import get_jwqldb_table
+from .data_containers import get_jwqldb_table_page
 from .data_containers import get_jwqldb_table_view_components
+from .data_containers import TABLE_PAGE_LENGTH
 from .data_containers import thumbnails_ajax
 from .data_containers import thumbnails_query_ajax
 from .forms import InstrumentAnomalySubmitForm
 from .forms import AnomalyQueryForm
-from .data_containers import build_table
 from .forms import FileSearchForm
 from .oauth import auth_info, auth_required
 
@@ -282,18 +291,16 @@ def archived_proposals_ajax(request, user, inst):
     # Ensure the instrument is correctly capitalized
     inst = JWST_INSTRUMENT_NAMES_MIXEDCASE[inst.lower()]
 
-    # For each proposal, get the first available thumbnail and determine
-    # how many files there are
-    filepaths = get_filenames_by_instrument(inst)
-    all_filenames = [os.path.basename(f) for f in filepaths]
-    proposal_info = get_proposal_info(filepaths)
+    # Get the first available thumbnail and the number of files and
+    # observations of each proposal from their summaries
+    proposal_info = get_proposal_summaries(inst)
 
     context = {'inst': inst,
-               'all_filenames': all_filenames,
                'num_proposals': proposal_info['num_proposals'],
                'thumbnails': {'proposals': proposal_info['proposals'],
                               'thumbnail_paths': proposal_info['thumbnail_paths'],
-                              'num_files': proposal_info['num_files']}}
+                              'num_files': proposal_info['num_files'],
+                              'num_observations': proposal_info['num_observations']}}
 
     return JsonResponse(context, json_dumps_params={'indent': 2})
 
@@ -456,18 +463,24 @@ def export(request, tablename):
 
     Returns
     -------
-    response : HttpResponse object
-        Outgoing response sent to the webpage
+    response : StreamingHttpResponse object
+        Outgoing response sent to the webpage. The table is read from
+        the database and sent in chunks, as CSV, or as Parquet if the
+        ``format`` parameter of the request is ``parquet``.
     """
-    table_meta = build_table(tablename)
-
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="{}.csv"'.format(tablename)
+    export_format = request.GET.get('format', 'csv')
+
+    if export_format == 'parquet':
+        try:
+            data = stream_table_parquet(tablename)
+        except ImportError as error:
+            return HttpResponse(str(error), status=501)
+        response = StreamingHttpResponse(data, content_type='application/octet-stream')
+    else:
+        export_format = 'csv'
+        response = StreamingHttpResponse(stream_table_csv(tablename), content_type='text/csv')
 
-    writer = csv.writer(response)
-    writer.writerow(table_meta.columns.values)
-    for _, row in table_meta.iterrows():
-        writer.writerow(row.values)
+    response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(tablename, export_format)
 
     return response
 
@@ -537,6 +550,55 @@ def instrument(request, inst):
     return render(request, template, context)
 
 
+def jwqldb_table_data(request, tablename):
+    """Return a page of the rows of a JWQL database table as JSON, in
+    the form used by the server-side processing of ``DataTables``.
+
+    The page is chosen with the ``start`` and ``length`` parameters of
+    the request, sorted with ``order[0][column]`` (the index of the
+    column) and ``order[0][dir]``, and filtered with ``search[value]``
+    and ``columns[<index>][search][value]``.
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        Incoming request from the webpage
+    tablename : str
+        Name of the table
+
+    Returns
+    -------
+    JsonResponse object
+        Outgoing response sent to the webpage
+    """
+    try:
+        column_names = get_jwqldb_table(tablename).__table__.columns.keys()
+    except KeyError:
+        return JsonResponse({'error': 'Unrecognized table: {}'.format(tablename)}, status=404)
+
+    try:
+        order_column = request.GET.get('order[0][column]')
+        if order_column is not None:
+            order_column = column_names[int(order_column)]
+        filters = {name: request.GET.get('columns[{}][search][value]'.format(index))
+                   for index, name in enumerate(column_names)
+                   if request.GET.get('columns[{}][search][value]'.format(index))}
+        page = get_jwqldb_table_page(tablename,
+                                     start=int(request.GET.get('start', 0)),
+                                     length=int(request.GET.get('length', TABLE_PAGE_LENGTH)),
+                                     order_column=order_column,
+                                     order_direction=request.GET.get('order[0][dir]', 'asc'),
+                                     search=request.GET.get('search[value]'),
+                                     filters=filters)
+    except (IndexError, ValueError) as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return JsonResponse({'draw': int(request.GET.get('draw', 0)),
+                         'recordsTotal': page['records_total'],
+                         'recordsFiltered': page['records_filtered'],
+                         'data': page['rows']})
+
+
 def jwqldb_table_viewer(request, tablename_param=None):
     """Generate the JWQL Table Viewer view.
 
@@ -555,12 +617,11 @@ def jwqldb_table_viewer(request, tablename_param=None):
     """
 
     if tablename_param is None:
-        table_meta, tablename = get_jwqldb_table_view_components(request)
+        table_columns, tablename = get_jwqldb_table_view_components(request)
     else:
-        table_meta = build_table(tablename_param)
+        table_columns = get_jwqldb_table(tablename_param).__table__.columns.keys()
         tablename = tablename_param
 
-    _, _, engine, _ = load_connection(get_config()['connection_string'])
     all_jwql_tables = engine.table_names()
 
     if 'django_migrations' in all_jwql_tables:
@@ -578,26 +639,20 @@ def jwqldb_table_viewer(request, tablename_param=None):
 
     template = 'jwqldb_table_viewer.html'
 
-    # If value of table_meta is None (when coming from home page)
-    if table_meta is None:
+    # If value of table_columns is None (when coming from home page)
+    if table_columns is None:
         context = {
             'inst': '',
             'all_jwql_tables': jwql_tables_by_instrument}
-    # If table_meta is empty, just render table with no data.
-    elif table_meta.empty:
-        context = {
-            'inst': '',
-            'all_jwql_tables': jwql_tables_by_instrument,
-            'table_columns': table_meta.columns.values,
-            'table_name': tablename}
-    # Else, everything is good to go, render the table.
+    # Else, render the table. Its rows are loaded by the page with
+    # ``jwqldb_table_data``
     else:
         context = {
             'inst': '',
             'all_jwql_tables': jwql_tables_by_instrument,
-            'table_columns': table_meta.columns.values,
-            'table_rows': table_meta.values,
-            'table_name': tablename}
+            'table_columns': table_columns,
+            'table_name': tablename,
+            'parquet_export': parquet_export_available()}
 
     return render(request, template, context)
 
@@ -675,6 +730,88 @@ def query_submit(request):
     return render(request, template, context)
 
 
+@auth_required
+def render_status(request, user, job_id):
+    """Report the status of a job in the render queue, so that the
+    image view page can wait for its preview images to be made
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        Incoming request from the webpage
+    job_id : int
+        The render queue job identifier
+
+    Returns
+    -------
+    JsonResponse object
+        Outgoing response sent to the webpage
+    """
+
+    return JsonResponse(get_render_job_status(int(job_id)), json_dumps_params={'indent': 2})
+
+
+@staff_member_required
+def request_profile(request, profile_id):
+    """Generate the page of the breakdown of a profiled request
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        Incoming request from the webpage
+    profile_id : int
+        The identifier of the request profile
+
+    Returns
+    -------
+    HttpResponse object
+        Outgoing response sent to the webpage
+    """
+
+    with open_profile_store() as store:
+        profile = store.get(profile_id)
+    if profile is None:
+        raise Http404('No request profile {}'.format(profile_id))
+
+    template = 'request_profile.html'
+    context = {'inst': '',
+               'profile': profile}
+
+    return render(request, template, context)
+
+
+@staff_member_required
+def request_profiles(request):
+    """Generate the page listing the views with the slowest profiled
+    requests, and the slowest requests of a view if the ``view``
+    parameter of the request is given
+
+    Parameters
+    ----------
+    request : HttpRequest object
+        Incoming request from the webpage
+
+    Returns
+    -------
+    HttpResponse object
+        Outgoing response sent to the webpage
+    """
+
+    view = request.GET.get('view')
+    with open_profile_store() as store:
+        views = store.slowest_views()
+        slowest_requests = store.slowest_requests(view=view)
+
+    template = 'request_profiles.html'
+    context = {'inst': '',
+               'profiling': get_config().get('profile_requests', False),
+               'view': view,
+               'views': views,
+               'requests': slowest_requests}
+
+    return render(request, template, context)
+
+
 def unlooked_images(request, inst):
     """Generate the page listing all unlooked images in the database
 
@@ -780,6 +917,9 @@ def view_image(request, user, inst, file_root, rewrite=False):
                'fits_files': image_info['all_files'],
                'suffixes': image_info['suffixes'],
                'num_ints': image_info['num_ints'],
+               'tile_pyramids': image_info['tile_pyramids'],
+               'render_jobs': image_info['render_jobs'],
+               'base_url': get_base_url(),
                'form': form}
 
     return render(request, template, context)
@@ -61,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'jwql.website.apps.jwql.middleware.RequestProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'jwql.website.jwql_proj.urls'
@@ -33,6 +33,7 @@ REQUIRES = [
     'numpy',
     'numpydoc',
     'pandas',
+    'pillow',
     'psycopg2',
     'pysiaf',
     'pytest',